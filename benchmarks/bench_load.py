@@ -0,0 +1,203 @@
+"""
+Load test of the bulk fetchers against the local NDBC stand in.
+
+Writes a network of synthetic stations, starts ndbc_server.py in the
+background, points buoypy at it and times the bulk paths:
+
+historic    historic_data.get_all_stand_meteo
+write_data  write_data.write_all_stand_meteo into a SQLite file
+makecall    get_data.makecall.get_all_stand_meteo (needs sqlalchemy)
+get_months  get_data.get_months.get_stand_meteo (needs sqlalchemy)
+months      months_many, the monthly files of every station at once
+realtime    realtime_many
+
+Each is reported as stations per minute and files (years or months) per
+minute, for every number of workers asked for.
+
+Example:
+python benchmarks/bench_load.py --stations 20 --years 2000 2015 \\
+    --workers 1 4 8 --latency 0.05 --bandwidth 2e6 --missing 0.05
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import buoypy as bp
+import buoypy.index
+from fixtures import write_network
+from ndbc_server import ndbc_server
+
+try:
+    from buoypy.get_data import makecall, get_months
+except ImportError:
+    makecall = get_months = None
+
+
+def stations(n):
+
+    return ['{}'.format(41000 + i) for i in range(n)]
+
+
+def scenarios(buoys, years, tmp):
+    """
+    name -> function(buoy, workers, index) giving the number of files it
+    read. None for scenarios that work on all the buoys in one call.
+    """
+
+    def historic(buoy, workers, index):
+        H = bp.historic_data(buoy, years[0], years)
+        return len(list(H.iter_stand_meteo(workers, index)))
+
+    def write(buoy, workers, index):
+        W = bp.write_data(buoy, years[0], years,
+            db_name=os.path.join(tmp, 'load.db'))
+        W.write_all_stand_meteo(workers, index)
+        return len(W.plan_stand_meteo(index)[0])
+
+    def legacy(buoy, workers, index):
+        return len(list(makecall(buoy, years).iter_all_stand_meteo(index)))
+
+    def months(buoy, workers, index):
+        return len(list(get_months(buoy).iter_stand_meteo(index)))
+
+    out = {'historic': historic, 'write_data': write}
+    if makecall is not None:
+        out['makecall'] = legacy
+        out['get_months'] = months
+
+    return out
+
+
+def run_stations(func, buoys, workers, index):
+    """
+    Run func for every buoy. Gives seconds, files read and stations that
+    failed.
+    """
+
+    files = 0
+    failed = 0
+
+    t0 = time.perf_counter()
+    for buoy in buoys:
+        try:
+            files += func(buoy, workers, index)
+        except Exception:
+            failed += 1
+
+    return time.perf_counter() - t0, files, failed
+
+
+def run_months(buoys, workers, index):
+
+    t0 = time.perf_counter()
+    data, failures = bp.months_many(buoys, workers=workers, index=index)
+    seconds = time.perf_counter() - t0
+
+    files = sum(len(bp.resolve_months(buoy, index)) for buoy in data)
+
+    return seconds, files, len(failures)
+
+
+def run_realtime(buoys, workers):
+
+    t0 = time.perf_counter()
+    data, failures = bp.realtime_many(buoys, products=('txt', 'spec'),
+        workers=workers, per_host=workers)
+    seconds = time.perf_counter() - t0
+
+    files = sum(len(products) for products in data.values())
+
+    return seconds, files, len(failures)
+
+
+def main(args):
+
+    tmp = tempfile.mkdtemp(prefix='buoypy-load-')
+    root = args.root or os.path.join(tmp, 'ndbc')
+
+    try:
+        buoys = stations(args.stations)
+        years = tuple(args.years)
+
+        if not args.root:
+            count = write_network(root, buoys, years, months=args.months,
+                year_rows=args.year_rows)
+            print('wrote {years} yearly, {months} monthly and {realtime} '
+                'realtime files'.format(**count))
+
+        server = ndbc_server(root, latency=args.latency,
+            bandwidth=args.bandwidth, missing=args.missing,
+            max_active=args.max_active).start()
+
+        #links made from here on go to the stand in
+        buoypy.index.NDBC = server.url
+
+        index = bp.availability(path=os.path.join(tmp, 'availability.json'))
+        index.refresh()
+
+        print('{:12s} {:>7s} {:>10s} {:>10s} {:>7s} {:>8s}'.format('scenario',
+            'workers', 'stations/m', 'files/m', 'failed', 'MB/s'))
+
+        names = scenarios(buoys, years, tmp)
+        for name in args.scenarios:
+            for workers in args.workers:
+
+                before = server.stats['bytes']
+
+                #the fetchers print every link they read
+                with open(os.devnull, 'w') as null, \
+                        contextlib.redirect_stdout(null):
+
+                    if name == 'realtime':
+                        seconds, files, failed = run_realtime(buoys, workers)
+                    elif name == 'months':
+                        seconds, files, failed = run_months(buoys, workers,
+                            index)
+                    elif name in names:
+                        seconds, files, failed = run_stations(names[name],
+                            buoys, workers, index)
+                    else:
+                        continue
+
+                mb = (server.stats['bytes'] - before) / 2.**20
+
+                print('{:12s} {:7d} {:10.1f} {:10.1f} {:7d} {:8.2f}'.format(
+                    name, workers, 60 * len(buoys) / seconds,
+                    60 * files / seconds, failed, mb / seconds))
+
+        print('server: {requests} requests, status {status}'.format(
+            **server.stats))
+        server.stop()
+
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--root', help='existing write_network folder to '
+        'serve instead of writing a new one')
+    parser.add_argument('--stations', type=int, default=10)
+    parser.add_argument('--years', type=int, nargs=2, default=[2005, 2015])
+    parser.add_argument('--months', type=int, default=3,
+        help='monthly files of this year for each station')
+    parser.add_argument('--year-rows', type=int, default=8760,
+        help='rows in each yearly file')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--scenarios', nargs='+', default=['historic',
+        'write_data', 'makecall', 'get_months', 'months', 'realtime'])
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--bandwidth', type=float, default=None)
+    parser.add_argument('--missing', type=float, default=0.)
+    parser.add_argument('--max-active', type=int, default=None)
+
+    main(parser.parse_args())
@@ -0,0 +1,162 @@
+"""
+Parser benchmarks on synthetic NDBC files. No network is used.
+
+Every realtime product and both historical stdmet formats are parsed
+through the public buoypy calls. For each one the best of a few runs is
+reported as rows per second, together with the peak memory the parse
+allocated.
+
+Example:
+python benchmarks/bench_parsers.py --save baseline.json
+python benchmarks/bench_parsers.py --compare baseline.json
+
+With --compare, a product is flagged when it is slower, or needs more
+memory, than the baseline by more than --tolerance, and the exit status
+is 1.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import buoypy as bp
+from fixtures import write_all, REALTIME
+
+
+def cases(files, buoy):
+    """
+    name -> function that parses that file and gives the data frame.
+    """
+
+    rt = bp.realtime(buoy)
+    rt.link = files['txt'][:-len('.txt')]
+
+    out = {}
+    for ext in REALTIME:
+        out[ext] = getattr(rt, ext)
+
+    hist = bp.historic_data(buoy, 2015)
+    for era in ('stdmet_2007', 'stdmet_2000'):
+        out[era] = lambda fname=files[era]: hist.get_stand_meteo(link=fname)
+
+    #the same file parsed a piece at a time
+    chunked = bp.historic_data(buoy, 2015, max_memory=2**21)
+    out['stdmet_2007_chunked'] = lambda fname=files['stdmet_2007']: \
+        chunked.get_stand_meteo(link=fname)
+
+    return out
+
+
+def measure(func, repeat=5):
+    """
+    Best time of repeat runs and the peak memory of one more run.
+
+    Returns
+    -------
+    seconds : float
+    peak : int
+        Bytes.
+    rows : int
+    """
+
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        df = func()
+        best = min(best, time.perf_counter() - t0)
+
+    #tracemalloc slows the parse down, so it gets a run of its own
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return best, peak, len(df)
+
+
+def run(rows, hist_rows, repeat, buoy='41013'):
+
+    root = tempfile.mkdtemp(prefix='buoypy-bench-')
+    try:
+        files = write_all(root, buoy, rows, hist_rows)
+
+        results = {}
+        for name, func in sorted(cases(files, buoy).items()):
+            seconds, peak, n = measure(func, repeat)
+            results[name] = {'rows': n, 'seconds': seconds,
+                'rows_per_s': n / seconds, 'peak_bytes': peak,
+                'file_bytes': os.path.getsize(files[name.split('_chunked')[0]])}
+    finally:
+        shutil.rmtree(root)
+
+    return results
+
+
+def report(results, baseline=None, tolerance=0.2):
+    """
+    Print a table of the results. Gives the names of the products that
+    regressed against the baseline.
+    """
+
+    print('{:20s} {:>8s} {:>12s} {:>10s} {:>10s}'.format('product', 'rows',
+        'rows/s', 'peak MB', 'file MB'))
+
+    slow = []
+    for name, r in sorted(results.items()):
+
+        line = '{:20s} {:8d} {:12.0f} {:10.1f} {:10.1f}'.format(name,
+            r['rows'], r['rows_per_s'], r['peak_bytes'] / 2.**20,
+            r['file_bytes'] / 2.**20)
+
+        if baseline and name in baseline:
+            old = baseline[name]
+            speed = r['rows_per_s'] / old['rows_per_s'] - 1
+            memory = r['peak_bytes'] / float(old['peak_bytes']) - 1
+            line += '  speed {:+.0%} memory {:+.0%}'.format(speed, memory)
+
+            if speed < -tolerance or memory > tolerance:
+                line += '  REGRESSION'
+                slow.append(name)
+
+        print(line)
+
+    return slow
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=6480,
+        help='rows in each realtime file')
+    parser.add_argument('--hist-rows', type=int, default=52560,
+        help='rows in each historical file')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--save', help='write the results to this json file')
+    parser.add_argument('--compare', help='baseline json file to compare to')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+        help='allowed slow down or memory growth, 0.2 is 20%%')
+    args = parser.parse_args()
+
+    results = run(args.rows, args.hist_rows, args.repeat)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    slow = report(results, baseline, args.tolerance)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if slow:
+        sys.exit(1)
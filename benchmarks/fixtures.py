@@ -0,0 +1,392 @@
+"""
+Synthetic NDBC files for benchmarking without network access.
+
+The files follow the NDBC layouts column for column, including the units
+rows, the MM and 99/999 missing values and the newest-first order of the
+realtime files. They are written under the same paths the NDBC uses:
+
+root/
+    data/
+        realtime2/41013.txt, 41013.spec, ...
+        historical/stdmet/41013h2015.txt, 41013h2005.txt
+
+Example:
+python benchmarks/fixtures.py /tmp/ndbc --rows 6480
+"""
+
+import os
+import argparse
+import datetime
+
+import numpy as np
+import pandas as pd
+
+
+#the 47 NDBC spectral bands (Hz)
+FREQS = np.r_[0.02, np.arange(0.0325, 0.0926, 0.005),
+    np.arange(0.10, 0.3501, 0.01), np.arange(0.365, 0.4851, 0.02)]
+
+COMPASS = ['N', 'NNE', 'NE', 'ENE', 'E', 'ESE', 'SE', 'SSE',
+    'S', 'SSW', 'SW', 'WSW', 'W', 'WNW', 'NW', 'NNW']
+
+STEEPNESS = ['SWELL', 'AVERAGE', 'STEEP', 'VERY_STEEP']
+
+REALTIME = ['txt', 'spec', 'supl', 'ocean', 'data_spec', 'swdir', 'swdir2',
+    'swr1', 'swr2']
+
+
+def times(rows, freq='10min', end='2016-02-04 17:40', newest_first=True):
+    """
+    Evenly spaced times ending at end.
+    """
+
+    t = pd.date_range(end=end, periods=rows, freq=freq)
+
+    return t[::-1] if newest_first else t
+
+
+def _dates(t, minutes=True, year_digits=4):
+    """
+    Date columns of each row as text.
+    """
+
+    year = t.year if year_digits == 4 else t.year % 100
+    cols = [year, t.month, t.day, t.hour]
+    widths = [year_digits, 2, 2, 2]
+    if minutes:
+        cols.append(t.minute)
+        widths.append(2)
+
+    rows = zip(*cols)
+    return [' '.join('{:0{}d}'.format(v, w) for v, w in zip(r, widths))
+        for r in rows]
+
+
+def _fmt(values, fmt, missing, rng, missing_rate):
+    """
+    Format a column, blanking out a share of it as missing.
+    """
+
+    out = np.array([fmt.format(v) for v in values], dtype=object)
+    out[rng.random(len(out)) < missing_rate] = missing
+
+    return out
+
+
+def _write(fname, header, dates, columns):
+
+    folder = os.path.dirname(fname)
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+
+    with open(fname, 'w') as f:
+        for line in header:
+            f.write(line + '\n')
+        for row in zip(dates, *columns):
+            f.write(' '.join(row) + '\n')
+
+
+#how the historical files write a missing value of each stdmet column
+HISTORIC_MISSING = ['999', '99.0', '99.0', '99.00', '99.00', '99.00', '999',
+    '9999.0', '999.0', '999.0', '999.0', '99.0', '99.00']
+
+
+def stdmet_columns(n, rng, missing, missing_rate):
+    """
+    The 13 standard meteorological variables. missing is the text of a
+    missing value, one for all columns or a list with one per column.
+    """
+
+    if isinstance(missing, str):
+        missing = [missing] * 13
+
+    wvht = np.abs(rng.normal(1.2, 0.5, n))
+
+    return [
+        _fmt(rng.integers(0, 360, n), '{:3d}', missing[0], rng, missing_rate),
+        _fmt(np.abs(rng.normal(6, 3, n)), '{:4.1f}', missing[1], rng, missing_rate),
+        _fmt(np.abs(rng.normal(8, 3, n)), '{:4.1f}', missing[2], rng, missing_rate),
+        _fmt(wvht, '{:5.2f}', missing[3], rng, missing_rate),
+        _fmt(rng.uniform(3, 14, n), '{:5.2f}', missing[4], rng, missing_rate),
+        _fmt(rng.uniform(3, 9, n), '{:5.2f}', missing[5], rng, missing_rate),
+        _fmt(rng.integers(0, 360, n), '{:3d}', missing[6], rng, missing_rate),
+        _fmt(rng.normal(1015, 6, n), '{:6.1f}', missing[7], rng, missing_rate),
+        _fmt(rng.normal(20, 5, n), '{:5.1f}', missing[8], rng, missing_rate),
+        _fmt(rng.normal(22, 3, n), '{:5.1f}', missing[9], rng, missing_rate),
+        _fmt(rng.normal(15, 5, n), '{:5.1f}', missing[10], rng, missing_rate),
+        _fmt(rng.uniform(0, 11, n), '{:4.1f}', missing[11], rng, 0.9),
+        _fmt(rng.normal(0, 1, n), '{:5.2f}', missing[12], rng, 0.95),
+    ]
+
+
+def write_txt(fname, t, rng):
+
+    header = ['#YY  MM DD hh mm WDIR WSPD GST  WVHT   DPD   APD MWD   PRES  ATMP  WTMP  DEWP  VIS PTDY  TIDE',
+        '#yr  mo dy hr mn degT m/s  m/s     m   sec   sec degT   hPa  degC  degC  degC  nmi  hPa    ft']
+
+    cols = stdmet_columns(len(t), rng, 'MM', 0.05)
+    ptdy = _fmt(rng.normal(0, 1, len(t)), '{:+5.1f}', 'MM', rng, 0.1)
+    cols.insert(12, ptdy)
+
+    _write(fname, header, _dates(t), cols)
+
+
+def write_spec(fname, t, rng):
+
+    n = len(t)
+    header = ['#YY  MM DD hh mm WVHT  SwH  SwP  WWH  WWP SwD WWD  STEEPNESS  APD MWD',
+        '#yr  mo dy hr mn    m    m  sec    m  sec  -  degT     -      sec degT']
+
+    cols = [
+        _fmt(np.abs(rng.normal(1.2, 0.5, n)), '{:4.1f}', 'MM', rng, 0.02),
+        _fmt(np.abs(rng.normal(0.9, 0.4, n)), '{:4.1f}', 'MM', rng, 0.02),
+        _fmt(rng.uniform(6, 14, n), '{:4.1f}', 'MM', rng, 0.02),
+        _fmt(np.abs(rng.normal(0.6, 0.3, n)), '{:4.1f}', 'MM', rng, 0.02),
+        _fmt(rng.uniform(3, 6, n), '{:4.1f}', 'MM', rng, 0.02),
+        _fmt(rng.choice(COMPASS, n), '{:>3s}', 'MM', rng, 0.02),
+        _fmt(rng.choice(COMPASS, n), '{:>3s}', 'MM', rng, 0.02),
+        _fmt(rng.choice(STEEPNESS, n), '{:>10s}', 'MM', rng, 0.02),
+        _fmt(rng.uniform(3, 9, n), '{:4.1f}', 'MM', rng, 0.02),
+        _fmt(rng.integers(0, 360, n), '{:3d}', 'MM', rng, 0.02),
+    ]
+
+    _write(fname, header, _dates(t), cols)
+
+
+def write_supl(fname, t, rng):
+
+    n = len(t)
+    header = ['#YY  MM DD hh mm PRES  PTIME WSPD  WDIR WTIME',
+        '#yr  mo dy hr mn  hPa   hhmm  m/s  degT  hhmm']
+
+    hhmm = (t.hour * 100 + t.minute).values
+    cols = [
+        _fmt(rng.normal(1015, 6, n), '{:6.1f}', 'MM', rng, 0.3),
+        _fmt(hhmm, '{:04d}', 'MM', rng, 0.3),
+        _fmt(np.abs(rng.normal(8, 3, n)), '{:4.1f}', 'MM', rng, 0.1),
+        _fmt(rng.integers(0, 360, n), '{:3d}', 'MM', rng, 0.1),
+        _fmt(hhmm, '{:04d}', 'MM', rng, 0.1),
+    ]
+
+    _write(fname, header, _dates(t), cols)
+
+
+def write_ocean(fname, t, rng):
+
+    n = len(t)
+    header = ['#YY  MM DD hh mm   DEPTH  OTMP   COND   SAL   O2%  O2PPM  CLCON  TURB    PH    EH',
+        '#yr  mo dy hr mn       m  degC  mS/cm   psu     %    ppm   ug/l   FTU     -    mV']
+
+    cols = [
+        _fmt(np.full(n, 1.0), '{:5.1f}', 'MM', rng, 0.0),
+        _fmt(rng.normal(20, 3, n), '{:5.2f}', 'MM', rng, 0.05),
+        _fmt(rng.normal(50, 2, n), '{:5.2f}', 'MM', rng, 0.05),
+        _fmt(rng.normal(35, 1, n), '{:5.2f}', 'MM', rng, 0.05),
+    ] + [np.full(n, 'MM', dtype=object) for _ in range(6)]
+
+    _write(fname, header, _dates(t), cols)
+
+
+def write_spectral(fname, t, rng, name):
+    """
+    One of the spectral files. name is data_spec, alpha1, alpha2, r1 or
+    r2.
+    """
+
+    n = len(t)
+    nf = len(FREQS)
+    labels = ['({:.3f})'.format(f) for f in FREQS]
+
+    if name == 'data_spec':
+        header = ['#YY  MM DD hh mm Sep_Freq  < spec_1 (freq_1) spec_2 (freq_2) spec_3 (freq_3) ... >']
+        peak = rng.uniform(0.06, 0.2, (n, 1))
+        values = rng.uniform(0, 5, (n, 1)) * np.exp(
+            -((FREQS[None, :] - peak) / 0.03) ** 2)
+        fmt = '{:.3f}'
+        lead = [_fmt(rng.uniform(0.1, 0.3, n), '{:.3f}', '9.999', rng, 0.05)]
+    else:
+        header = ['#YY  MM DD hh mm {0}_1 (freq_1) {0}_2 (freq_2) {0}_3 (freq_3) ... >'.format(name)]
+        if name.startswith('alpha'):
+            values = rng.uniform(0, 360, (n, nf))
+            fmt = '{:.1f}'
+        else:
+            values = rng.uniform(0, 1, (n, nf))
+            fmt = '{:.3f}'
+        lead = []
+
+    #the lowest band is often missing
+    text = np.array([[fmt.format(v) for v in row] for row in values],
+        dtype=object)
+    text[:, 0] = '999.0' if fmt == '{:.1f}' else '999.00'
+
+    cols = list(lead)
+    for j in range(nf):
+        cols.append(text[:, j])
+        cols.append(np.full(n, labels[j], dtype=object))
+
+    _write(fname, header, _dates(t), cols)
+
+
+def write_historic(fname, t, rng, era='2007'):
+    """
+    Historical stdmet file. era '2007' is the #YY format with units and a
+    minute column, era '2000' has four digit years and no minutes, era
+    '1990' has two digit years and no TIDE column.
+    """
+
+    if era == '2007':
+        header = ['#YY  MM DD hh mm WDIR WSPD GST  WVHT   DPD   APD MWD   PRES  ATMP  WTMP  DEWP  VIS  TIDE',
+            '#yr  mo dy hr mn degT m/s  m/s     m   sec   sec degT   hPa  degC  degC  degC  mi    ft']
+        dates = _dates(t)
+    elif era == '2000':
+        header = ['YYYY MM DD hh WD   WSPD GST  WVHT  DPD   APD  MWD  BAR    ATMP  WTMP  DEWP  VIS  TIDE']
+        dates = _dates(t, minutes=False)
+    else:
+        header = ['YY MM DD hh WD   WSPD GST  WVHT  DPD   APD  MWD  BAR    ATMP  WTMP  DEWP  VIS']
+        dates = _dates(t, minutes=False, year_digits=2)
+
+    cols = stdmet_columns(len(t), rng, HISTORIC_MISSING, 0.05)
+    if era == '1990':
+        cols = cols[:-1]
+
+    _write(fname, header, dates, cols)
+
+
+def write_all(root, buoy='41013', rows=6480, hist_rows=52560, seed=0):
+    """
+    Write a full set of realtime and historical files.
+
+    Parameters
+    ----------
+    root : string
+        Folder to write into.
+    rows : int
+        Rows in each realtime file. 6480 is 45 days of 10 minute data.
+    hist_rows : int
+        Rows in each historical file. 52560 is a year of 10 minute data.
+
+    Returns
+    -------
+    files : dict
+        name -> path of every file written.
+    """
+
+    rng = np.random.default_rng(seed)
+    files = {}
+
+    rt = os.path.join(root, 'data', 'realtime2', str(buoy))
+    t = times(rows)
+    hourly = times(max(rows // 6, 1), freq='h')
+
+    write_txt(rt + '.txt', t, rng)
+    write_spec(rt + '.spec', hourly, rng)
+    write_supl(rt + '.supl', t, rng)
+    write_ocean(rt + '.ocean', hourly, rng)
+    write_spectral(rt + '.data_spec', hourly, rng, 'data_spec')
+    write_spectral(rt + '.swdir', hourly, rng, 'alpha1')
+    write_spectral(rt + '.swdir2', hourly, rng, 'alpha2')
+    write_spectral(rt + '.swr1', hourly, rng, 'r1')
+    write_spectral(rt + '.swr2', hourly, rng, 'r2')
+
+    for ext in REALTIME:
+        files[ext] = rt + '.' + ext
+
+    hist = os.path.join(root, 'data', 'historical', 'stdmet')
+
+    fname = os.path.join(hist, '{}h2015.txt'.format(buoy))
+    write_historic(fname, times(hist_rows, end='2015-12-31 23:50',
+        newest_first=False), rng, '2007')
+    files['stdmet_2007'] = fname
+
+    fname = os.path.join(hist, '{}h2005.txt'.format(buoy))
+    write_historic(fname, times(max(hist_rows // 6, 1), freq='h',
+        end='2005-12-31 23:00', newest_first=False), rng, '2000')
+    files['stdmet_2000'] = fname
+
+    return files
+
+
+#the monthly files use one character for the month
+MONTH_CODES = dict(zip(['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul',
+    'Aug', 'Sep', 'Oct', 'Nov', 'Dec'], '123456789abc'))
+
+
+def write_network(root, buoys, years, month_year=None, months=3,
+        year_rows=8760, rows=1080, seed=0):
+    """
+    Write the files of many stations the way the NDBC lays them out, for
+    the stand in server in ndbc_server.py. The historical and monthly files
+    are written as plain text, the server gzips them when asked for the
+    .gz name.
+
+    Parameters
+    ----------
+    buoys : list
+        Station names.
+    years : tuple
+        (start, stop) inclusive years of historical files.
+    month_year : int
+        Year of the monthly files. Defaults to this year.
+    months : int
+        Number of monthly files, from January on.
+    year_rows : int
+        Rows in each historical file. 8760 is a year of hourly data.
+    rows : int
+        Rows in each realtime file.
+
+    Returns
+    -------
+    count : dict
+        Number of files written of each kind.
+    """
+
+    rng = np.random.default_rng(seed)
+    if month_year is None:
+        month_year = datetime.date.today().year
+
+    count = {'realtime': 0, 'years': 0, 'months': 0}
+    step = '{}min'.format(max(int(525600 // year_rows), 1))
+
+    for buoy in buoys:
+
+        rt = os.path.join(root, 'data', 'realtime2', str(buoy))
+        t = times(rows)
+        write_txt(rt + '.txt', t, rng)
+        write_spec(rt + '.spec', t, rng)
+        write_spectral(rt + '.data_spec', t, rng, 'data_spec')
+        count['realtime'] += 3
+
+        for year in range(years[0], years[1] + 1):
+            fname = os.path.join(root, 'data', 'historical', 'stdmet',
+                '{}h{}.txt'.format(buoy, year))
+            t = times(year_rows, freq=step, newest_first=False,
+                end='{}-12-31 23:00'.format(year))
+            write_historic(fname, t, rng, '2007' if year >= 2007 else '2000')
+            count['years'] += 1
+
+        for mon in list(MONTH_CODES)[:months]:
+            fname = os.path.join(root, 'data', 'stdmet', mon,
+                '{}{}{}.txt'.format(buoy, MONTH_CODES[mon], month_year))
+            first = pd.Timestamp(month_year, list(MONTH_CODES).index(mon) + 1, 1)
+            t = pd.date_range(first, first + pd.offsets.MonthBegin(),
+                freq=step, inclusive='left')
+            write_historic(fname, t, rng, '2007')
+            count['months'] += 1
+
+    return count
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('root', help='folder to write the files to')
+    parser.add_argument('--buoy', default='41013')
+    parser.add_argument('--rows', type=int, default=6480,
+        help='rows in each realtime file')
+    parser.add_argument('--hist-rows', type=int, default=52560,
+        help='rows in each historical file')
+    args = parser.parse_args()
+
+    for name, fname in sorted(write_all(args.root, args.buoy, args.rows,
+            args.hist_rows).items()):
+        print('{:12s} {}'.format(name, fname))
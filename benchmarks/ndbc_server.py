@@ -0,0 +1,318 @@
+"""
+Local stand in for the NDBC web site.
+
+Serves a folder written by fixtures.write_network under the same links the
+NDBC uses:
+
+/data/realtime2/41013.txt
+/data/historical/stdmet/                      directory listing
+/data/historical/stdmet/41013h2015.txt.gz     gzipped on the fly
+/data/stdmet/Jan/                             directory listing
+/view_text_file.php?filename=41013h2015.txt.gz&dir=data/historical/stdmet/
+
+The server can be made slow and unreliable: a fixed latency per request,
+a bandwidth cap per response, a share of files that are missing (404) and
+a limit on requests in flight past which it answers 503, like the NDBC
+does when it is busy.
+
+Example:
+python benchmarks/ndbc_server.py /tmp/ndbc --port 8000 --latency 0.05
+
+BUOYPY_NDBC=http://127.0.0.1:8000/ python -c "import buoypy as bp; ..."
+"""
+
+import os
+import sys
+import gzip
+import time
+import zlib
+import argparse
+import threading
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlsplit, parse_qs, unquote
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlsplit, parse_qs
+    from urllib import unquote
+
+
+class _server(ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    #the default backlog of 5 drops connections when many workers connect
+    #at once, and each dropped one waits a second for the retry
+    request_queue_size = 128
+
+
+class ndbc_server:
+    """
+    NDBC stand in running in a background thread.
+
+    Parameters
+    ----------
+    root : string
+        Folder with a data/ tree, see fixtures.write_network.
+    port : int
+        0 picks a free port.
+    latency : float
+        Seconds to wait before answering each request.
+    bandwidth : float
+        Bytes per second of each response. None is unlimited.
+    missing : float
+        Share of the files that answer 404. The same links are always the
+        missing ones, so a retry does not help, just like on the NDBC.
+    max_active : int
+        Requests in flight past which the server answers 503. None is
+        unlimited.
+    """
+
+    def __init__(self, root, host='127.0.0.1', port=0, latency=0.,
+            bandwidth=None, missing=0., max_active=None):
+
+        self.root = os.path.abspath(root)
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.missing = missing
+        self.max_active = max_active
+
+        self.active = 0
+        self.stats = {'requests': 0, 'bytes': 0, 'status': {}}
+        self._lock = threading.Lock()
+        self._gz = {}
+
+        handler = type('handler', (_handler,), {'ndbc': self})
+        self.httpd = _server((host, port), handler)
+        self._thread = None
+
+    @property
+    def url(self):
+
+        host, port = self.httpd.server_address[:2]
+        return 'http://{}:{}/'.format(host, port)
+
+    def start(self):
+
+        self._thread = threading.Thread(target=self.httpd.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+
+        return self
+
+    def stop(self):
+
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+
+        return self.start()
+
+    def __exit__(self, *exc):
+
+        self.stop()
+
+    def _count(self, status, nbytes):
+
+        with self._lock:
+            self.stats['requests'] += 1
+            self.stats['bytes'] += nbytes
+            self.stats['status'][status] = \
+                self.stats['status'].get(status, 0) + 1
+
+    def _is_missing(self, path):
+
+        if not self.missing:
+            return False
+
+        return zlib.crc32(path.encode()) / 2.**32 < self.missing
+
+    def _path(self, rel):
+        """
+        File on disk for a link, None if it is outside the root.
+        """
+
+        fname = os.path.abspath(os.path.join(self.root, unquote(rel).lstrip('/')))
+        if not fname.startswith(self.root):
+            return None
+
+        return fname
+
+    def resolve(self, link):
+        """
+        (status, content type, body) for a link.
+        """
+
+        parts = urlsplit(link)
+
+        if parts.path == '/view_text_file.php':
+            query = parse_qs(parts.query)
+            fname = query.get('filename', [''])[0]
+            folder = query.get('dir', [''])[0]
+            return self._text(folder + fname)
+
+        if parts.path.endswith('/'):
+            return self._listing(parts.path)
+
+        return self._file(parts.path)
+
+    def _text(self, rel):
+
+        if self._is_missing(rel.replace('.gz', '')):
+            return 404, 'text/plain', b'not found'
+
+        fname = self._path(rel)
+        if fname is None:
+            return 404, 'text/plain', b'not found'
+
+        if fname.endswith('.gz') and os.path.isfile(fname[:-3]):
+            with open(fname[:-3], 'rb') as f:
+                return 200, 'text/plain', f.read()
+
+        if os.path.isfile(fname):
+            with open(fname, 'rb') as f:
+                body = f.read()
+            if fname.endswith('.gz'):
+                body = gzip.decompress(body)
+            return 200, 'text/plain', body
+
+        return 404, 'text/plain', b'not found'
+
+    def _file(self, rel):
+
+        if self._is_missing(rel.replace('.gz', '')):
+            return 404, 'text/plain', b'not found'
+
+        fname = self._path(rel)
+        if fname is None:
+            return 404, 'text/plain', b'not found'
+
+        if os.path.isfile(fname):
+            with open(fname, 'rb') as f:
+                return 200, 'text/plain', f.read()
+
+        #the files are kept as plain text, gzip them the first time they
+        #are asked for
+        if fname.endswith('.gz') and os.path.isfile(fname[:-3]):
+            with self._lock:
+                body = self._gz.get(fname)
+            if body is None:
+                with open(fname[:-3], 'rb') as f:
+                    body = gzip.compress(f.read())
+                with self._lock:
+                    self._gz[fname] = body
+            return 200, 'application/x-gzip', body
+
+        return 404, 'text/plain', b'not found'
+
+    def _listing(self, rel):
+
+        folder = self._path(rel)
+        if folder is None or not os.path.isdir(folder):
+            return 404, 'text/plain', b'not found'
+
+        #the historical and monthly files are gzipped on the NDBC
+        gz = '/realtime2/' not in rel
+
+        rows = []
+        for name in sorted(os.listdir(folder)):
+            if gz and name.endswith('.txt'):
+                name += '.gz'
+            rows.append('<a href="{0}">{0}</a>'.format(name))
+
+        body = '<html><body><pre>\n{}\n</pre></body></html>'.format(
+            '\n'.join(rows))
+
+        return 200, 'text/html', body.encode()
+
+
+class _handler(BaseHTTPRequestHandler):
+
+    #keep-alive, so connection_pool can reuse its connections
+    protocol_version = 'HTTP/1.1'
+
+    ndbc = None
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+
+        ndbc = self.ndbc
+
+        with ndbc._lock:
+            busy = ndbc.max_active is not None and \
+                ndbc.active >= ndbc.max_active
+            if not busy:
+                ndbc.active += 1
+
+        if busy:
+            self._send(503, 'text/plain', b'busy', {'Retry-After': '1'})
+            ndbc._count(503, 0)
+            return
+
+        try:
+            if ndbc.latency:
+                time.sleep(ndbc.latency)
+
+            status, kind, body = ndbc.resolve(self.path)
+            self._send(status, kind, body)
+            ndbc._count(status, len(body))
+
+        finally:
+            with ndbc._lock:
+                ndbc.active -= 1
+
+    def _send(self, status, kind, body, headers={}):
+
+        self.send_response(status)
+        self.send_header('Content-Type', kind)
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+
+        bandwidth = self.ndbc.bandwidth
+        if not bandwidth:
+            self.wfile.write(body)
+            return
+
+        #send in pieces and sleep so the response takes len/bandwidth
+        chunk = max(int(bandwidth // 20), 1024)
+        for i in range(0, len(body), chunk):
+            piece = body[i:i + chunk]
+            self.wfile.write(piece)
+            time.sleep(len(piece) / float(bandwidth))
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('root', help='folder written by fixtures.write_network')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0.,
+        help='seconds before each answer')
+    parser.add_argument('--bandwidth', type=float, default=None,
+        help='bytes per second of each response')
+    parser.add_argument('--missing', type=float, default=0.,
+        help='share of the files that answer 404')
+    parser.add_argument('--max-active', type=int, default=None,
+        help='requests in flight past which the server answers 503')
+    args = parser.parse_args()
+
+    server = ndbc_server(args.root, args.host, args.port, args.latency,
+        args.bandwidth, args.missing, args.max_active)
+
+    print('serving {} at {}'.format(server.root, server.url))
+    sys.stdout.flush()
+
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.httpd.server_close()
@@ -1 +1,54 @@
-from .buoypy import *
\ No newline at end of file
+import sys
+
+#names that buoypy exports, `from buoypy import *` gives these
+__all__ = ['realtime', 'realtime_refresher', 'realtime_many',
+    'historic_data', 'write_data', 'read_data', 'merge_months', 'months_many',
+    'availability', 'resolve_months', 'file_link', 'viewer_link', 'ndbc',
+    'http_cache', 'connection_pool', 'archive', 'mapped_archive',
+    'climatology', 'database', 'panel', 'build_panel', 'read_ndbc',
+    'iter_ndbc', 'read_spectral', 'apply_dtype_policy', 'sniff_format',
+    'spectral_cube', 'load_cube', 'PRODUCTS', 'directional_spectrum',
+    'iter_directional_spectrum', 'spectral_moments', 'schedule', 'scheduler',
+    'classify', 'outcome', 'phase', 'enabled', 'timed_reader', 'recording',
+    'phase_stats', 'add_hook', 'remove_hook', 'logging_hook']
+
+if sys.version_info < (3, 7):
+    from .buoypy import *
+
+else:
+    import types
+    from importlib import import_module
+
+    class _package(types.ModuleType):
+
+        #importing a submodule sets it on the package. archive,
+        #climatology, database and panel are also the names of classes,
+        #so names in __all__ are left to __getattr__.
+        def __setattr__(self, name, value):
+
+            if name in __all__ and isinstance(value, types.ModuleType):
+                return
+
+            types.ModuleType.__setattr__(self, name, value)
+
+    sys.modules[__name__].__class__ = _package
+
+    #the names are loaded from buoypy.buoypy the first time one is used,
+    #so `import buoypy.cli` and `buoypy --help` do not import pandas
+    def __getattr__(name):
+
+        core = import_module('.buoypy', __name__)
+
+        globals().update((n, getattr(core, n)) for n in __all__)
+
+        #submodules, ex: buoypy.index, are set on the package by importing
+        #core
+        if name not in globals():
+            raise AttributeError(
+                "module 'buoypy' has no attribute {!r}".format(name))
+
+        return globals()[name]
+
+    def __dir__():
+
+        return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,544 @@
+"""
+Columnar archive of station histories, partitioned by buoy and year.
+
+root/
+    41013/
+        2014.parquet
+        2015.parquet
+
+Each partition holds the time as int64 nanoseconds plus one column per
+variable. Parquet is used when pyarrow is installed. Without it every
+partition is a folder with one .npy file per column and the order of the
+columns:
+
+root/
+    41013/
+        2014/
+            columns.json
+            time.npy
+            WVHT.npy
+            ...
+
+Readers only open the partitions in year_range and only the columns they
+ask for.
+
+Example:
+import buoypy as bp
+
+A = bp.archive('buoyarchive')
+A.write(41013, df)
+A.read(41013, columns=['WVHT'], year_range=(2000, 2009))
+
+mapped_archive keeps a whole station history in fixed dtype column files
+that are memory mapped when read. Many processes reading the same station
+share one copy of the data in the page cache.
+
+root/
+    41013/
+        meta.json
+        time.i8
+        WVHT.f8
+        ...
+"""
+
+import os
+import json
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+
+class archive:
+    """
+    Station histories stored by buoy and year.
+
+    Parameters
+    ----------
+    root : string
+        Folder the archive lives in. Made if it does not exist.
+    engine : string
+        'parquet' or 'numpy'. Defaults to parquet when pyarrow is
+        installed.
+    """
+
+    def __init__(self, root='buoyarchive', engine=None):
+
+        if engine is None:
+            engine = 'numpy' if pq is None else 'parquet'
+
+        if engine == 'parquet' and pq is None:
+            raise ImportError('the parquet engine needs pyarrow')
+
+        self.root = root
+        self.engine = engine
+
+    def _partition(self, buoy, year):
+
+        name = str(year)
+        if self.engine == 'parquet':
+            name += '.parquet'
+
+        return os.path.join(self.root, str(buoy), name)
+
+    def years(self, buoy):
+        """
+        Sorted list of the years that are stored for buoy.
+        """
+
+        folder = os.path.join(self.root, str(buoy))
+        if not os.path.isdir(folder):
+            return []
+
+        years = []
+        for name in os.listdir(folder):
+            name = name.replace('.parquet', '')
+            if name.isdigit():
+                years.append(int(name))
+
+        return sorted(years)
+
+    def write(self, buoy, df):
+        """
+        Add the rows of df to the archive. Rows for a time that is already
+        stored replace the old ones.
+
+        Parameters
+        ----------
+        buoy : string
+            Buoy number ex: '41013' is off wilmington, nc
+        df : pandas dataframe
+            Index is the date, columns are the variables.
+        """
+
+        if not len(df):
+            return
+
+        years = df.index.year
+        for year in np.unique(years):
+
+            part = df[years == year]
+
+            if year in self.years(buoy):
+                old = self._read_partition(buoy, year, None)
+                part = pd.concat([old, part])
+
+            #keep the newest copy of each time
+            part = part[~part.index.duplicated(keep='last')].sort_index()
+
+            self._write_partition(buoy, year, part)
+
+    def read(self, buoy, columns=None, year_range=None, start=None,
+            end=None):
+        """
+        Read a station history.
+
+        Parameters
+        ----------
+        buoy : string
+            Buoy number ex: '41013' is off wilmington, nc
+        columns : list
+            Variables to read. None reads all of them.
+        year_range : tuple
+            (start, stop) inclusive. Other years are not opened.
+        start, end : datetime
+            Only rows with start <= time < end. Years outside them are not
+            opened either.
+
+        Returns
+        -------
+        df : pandas dataframe
+            Index is the date.
+        """
+
+        if start is not None:
+            start = pd.Timestamp(start)
+        if end is not None:
+            end = pd.Timestamp(end)
+
+        years = self.years(buoy)
+        if year_range:
+            first, last = year_range
+            years = [y for y in years if first <= y <= last]
+        if start is not None:
+            years = [y for y in years if y >= start.year]
+        if end is not None:
+            years = [y for y in years if pd.Timestamp(y, 1, 1) < end]
+
+        dfs = [self._read_partition(buoy, y, columns) for y in years]
+
+        if not dfs:
+            return pd.DataFrame(columns=columns)
+
+        df = pd.concat(dfs)
+
+        if start is not None or end is not None:
+            keep = np.ones(len(df), dtype=bool)
+            if start is not None:
+                keep &= df.index >= start
+            if end is not None:
+                keep &= df.index < end
+            df = df[keep]
+
+        return df
+
+    def _write_partition(self, buoy, year, df):
+
+        fname = self._partition(buoy, year)
+        folder = os.path.dirname(fname)
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+
+        time = df.index.values.astype('datetime64[ns]').view(np.int64)
+
+        if self.engine == 'parquet':
+            cols = dict((str(c), df[c].values) for c in df.columns)
+            cols['time'] = time
+
+            #a crash while writing leaves the temp file, not half a
+            #partition
+            fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=folder)
+            os.close(fd)
+            try:
+                pq.write_table(pa.table(cols), tmp)
+                os.replace(tmp, fname)
+            except BaseException:
+                os.remove(tmp)
+                raise
+            return
+
+        #write to a temp folder and swap it in so readers never see half
+        #a partition
+        tmp = fname + '.tmp'
+        if os.path.isdir(tmp):
+            shutil.rmtree(tmp)
+        os.makedirs(tmp)
+
+        np.save(os.path.join(tmp, 'time.npy'), time)
+        for c in df.columns:
+            np.save(os.path.join(tmp, str(c) + '.npy'), _plain(df[c]))
+
+        #the files of a folder have no order, the columns come back in
+        #the order they were written
+        with open(os.path.join(tmp, 'columns.json'), 'w') as f:
+            json.dump([str(c) for c in df.columns], f)
+
+        if os.path.isdir(fname):
+            shutil.rmtree(fname)
+        os.rename(tmp, fname)
+
+    def _read_partition(self, buoy, year, columns):
+
+        fname = self._partition(buoy, year)
+
+        if self.engine == 'parquet':
+            wanted = None if columns is None else list(columns) + ['time']
+            table = pq.read_table(fname, columns=wanted)
+            cols = dict((name, table.column(name).to_numpy())
+                for name in table.column_names)
+
+        else:
+            if columns is None:
+                columns = _column_order(fname)
+
+            #no pickles, so a file dropped in the folder can not run code
+            cols = dict((c, _unplain(np.load(os.path.join(fname, c + '.npy'),
+                allow_pickle=False))) for c in list(columns) + ['time'])
+
+        time = cols.pop('time')
+        index = pd.DatetimeIndex(time.view('datetime64[ns]'))
+
+        order = columns if columns is not None else list(cols)
+
+        return pd.DataFrame(dict((c, cols[c]) for c in order), index=index)
+
+
+def _plain(col):
+    """
+    Values of a column in a dtype np.save writes without pickle. Text and
+    categories are stored as fixed width strings, with '' for missing
+    values, and nullable integers as floats.
+    """
+
+    if col.dtype.kind in 'iufbM' and isinstance(col.dtype, np.dtype):
+        return col.values
+
+    if col.dtype.kind in 'iufb':
+        return col.to_numpy(dtype=np.float64, na_value=np.nan)
+
+    return np.array(['' if pd.isna(v) else str(v) for v in col], dtype=str)
+
+
+def _unplain(values):
+    """
+    Text stored by _plain back as an object column with NaN for missing
+    values.
+    """
+
+    if values.dtype.kind != 'U':
+        return values
+
+    out = values.astype(object)
+    out[values == ''] = np.nan
+
+    return out
+
+
+def _column_order(folder):
+    """
+    Columns of a numpy partition in the order they were written.
+    Partitions written before the order was kept are read in name order.
+    """
+
+    try:
+        with open(os.path.join(folder, 'columns.json')) as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return [n[:-4] for n in sorted(os.listdir(folder))
+            if n.endswith('.npy') and n != 'time.npy']
+
+
+class mapped_archive:
+    """
+    Station histories as memory mapped column files. One file holds the
+    times as int64 nanoseconds, and there is one float file per variable.
+    Reads return frames whose columns are views of the mapped files, so
+    no data is copied into the process.
+
+    Parameters
+    ----------
+    root : string
+        Folder the archive lives in.
+    dtype : string
+        dtype of the variable files, ex: 'f8' or 'f4'.
+    """
+
+    def __init__(self, root='buoymaps', dtype='f8'):
+
+        self.root = root
+        self.dtype = np.dtype(dtype)
+
+    def _folder(self, buoy):
+
+        return os.path.join(self.root, str(buoy))
+
+    def meta(self, buoy):
+        """
+        {'length': rows, 'columns': [...], 'dtype': ...} of a station.
+        None if it is not stored.
+        """
+
+        try:
+            with open(os.path.join(self._folder(buoy), 'meta.json')) as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return None
+
+    def _save_meta(self, folder, meta):
+
+        tmp = os.path.join(folder, 'meta.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(folder, 'meta.json'))
+
+    def arrays(self, buoy, columns=None, year_range=None, start=None,
+            end=None):
+        """
+        Memory mapped views of a station history.
+
+        Parameters
+        ----------
+        buoy : string
+            Buoy number ex: '41013' is off wilmington, nc
+        columns : list
+            Variables to map. None maps all of them.
+        year_range : tuple
+            (start, stop) inclusive.
+        start, end : datetime
+            Only rows with start <= time < end.
+
+        Returns
+        -------
+        time : numpy array
+            datetime64[ns] view of the time file.
+        values : dict
+            variable -> view of its file.
+        """
+
+        meta = self.meta(buoy)
+        if meta is None:
+            raise IOError('{} is not in {}'.format(buoy, self.root))
+
+        folder = self._folder(buoy)
+        n = meta['length']
+        dtype = np.dtype(meta['dtype'])
+
+        if columns is None:
+            columns = meta['columns']
+
+        time = _map(os.path.join(folder, 'time.i8'), np.int64, n)
+
+        #the times are sorted, so a year range or start and end is a
+        #slice of the files
+        bounds = []
+        if year_range:
+            first, last = year_range
+            bounds.append((pd.Timestamp(first, 1, 1),
+                pd.Timestamp(last + 1, 1, 1)))
+        bounds.append((start, end))
+
+        lo, hi = 0, n
+        for first, last in bounds:
+            if first is not None:
+                lo = max(lo, np.searchsorted(time, _ns(first)))
+            if last is not None:
+                hi = min(hi, np.searchsorted(time, _ns(last)))
+        rows = slice(lo, max(lo, hi))
+
+        values = dict((c, _map(os.path.join(folder, c + '.' + dtype.str[1:]),
+            dtype, n)[rows]) for c in columns)
+
+        return time[rows].view('datetime64[ns]'), values
+
+    def read(self, buoy, columns=None, year_range=None, start=None,
+            end=None):
+        """
+        Read a station history without copying it. See arrays.
+
+        Returns
+        -------
+        df : pandas dataframe
+            Index is the date. The columns are backed by the mapped
+            files and are read only.
+        """
+
+        if self.meta(buoy) is None:
+            return pd.DataFrame(columns=columns)
+
+        time, values = self.arrays(buoy, columns, year_range, start, end)
+        order = columns if columns is not None else list(values)
+
+        return pd.DataFrame(dict((c, values[c]) for c in order),
+            index=pd.DatetimeIndex(time), copy=False)
+
+    def write(self, buoy, df):
+        """
+        Add the rows of df to a station. Rows that are all newer than the
+        stored ones are appended to the end of the files. Anything else
+        rewrites the station, with new rows replacing stored rows at the
+        same time.
+
+        Parameters
+        ----------
+        buoy : string
+            Buoy number ex: '41013' is off wilmington, nc
+        df : pandas dataframe
+            Index is the date, columns are numeric variables.
+        """
+
+        if not len(df):
+            return
+
+        text = [c for c in df.columns if df[c].dtype.kind not in 'iufb']
+        if text:
+            raise ValueError('only numeric columns can be mapped, not '
+                '{}'.format(text))
+
+        df = df.sort_index()
+        df = df[~df.index.duplicated(keep='last')]
+
+        meta = self.meta(buoy)
+        folder = self._folder(buoy)
+
+        if meta is not None and meta['length'] and \
+                set(df.columns) <= set(meta['columns']):
+
+            time, _ = self.arrays(buoy, [])
+            if df.index[0].to_datetime64() > time[-1]:
+                self._append(folder, meta, df)
+                return
+
+        if meta is not None:
+            old = self.read(buoy).copy()
+            df = pd.concat([old, df])
+            df = df[~df.index.duplicated(keep='last')].sort_index()
+
+        self._rewrite(folder, df)
+
+    def _append(self, folder, meta, df):
+
+        dtype = np.dtype(meta['dtype'])
+        ext = dtype.str[1:]
+
+        times = df.index.values.astype('datetime64[ns]').view(np.int64)
+        with open(os.path.join(folder, 'time.i8'), 'ab') as f:
+            f.write(times.astype('<i8').tobytes())
+
+        for c in meta['columns']:
+            if c in df.columns:
+                col = df[c].values.astype(dtype)
+            else:
+                col = np.full(len(df), np.nan, dtype=dtype)
+
+            with open(os.path.join(folder, c + '.' + ext), 'ab') as f:
+                f.write(col.tobytes())
+
+        #readers go by the length in meta, so it is bumped last
+        meta['length'] += len(df)
+        self._save_meta(folder, meta)
+
+    def _rewrite(self, folder, df):
+
+        ext = self.dtype.str[1:]
+
+        #build the new files next to the old ones and swap the folders
+        tmp = folder + '.tmp'
+        if os.path.isdir(tmp):
+            shutil.rmtree(tmp)
+        os.makedirs(tmp)
+
+        times = df.index.values.astype('datetime64[ns]').view(np.int64)
+        times.astype('<i8').tofile(os.path.join(tmp, 'time.i8'))
+
+        columns = [str(c) for c in df.columns]
+        for c in columns:
+            df[c].values.astype(self.dtype).tofile(
+                os.path.join(tmp, c + '.' + ext))
+
+        self._save_meta(tmp, {'length': len(df), 'columns': columns,
+            'dtype': self.dtype.str})
+
+        if os.path.isdir(folder):
+            old = folder + '.old'
+            os.rename(folder, old)
+            os.rename(tmp, folder)
+            shutil.rmtree(old)
+        else:
+            os.rename(tmp, folder)
+
+
+def _ns(t):
+    """
+    A date as int64 nanoseconds.
+    """
+
+    return pd.Timestamp(t).to_datetime64().astype('datetime64[ns]').view(
+        np.int64)
+
+
+def _map(fname, dtype, n):
+    """
+    Read only memory map of the first n values of a file.
+    """
+
+    if n == 0:
+        return np.zeros(0, dtype=dtype)
+
+    return np.memmap(fname, dtype=dtype, mode='r', shape=(n,))
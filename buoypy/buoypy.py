@@ -56,23 +56,154 @@ column headings.
 
 import pandas as pd
 import numpy as np
+import io
+import zlib
 import datetime
 
+try:
+    from urllib.request import urlopen
+    from urllib.error import HTTPError
+except ImportError:
+    from urllib2 import urlopen, HTTPError
+
+from .index import availability, file_link, viewer_link, ndbc, \
+    resolve_months
+from .cache import http_cache
+from .pool import connection_pool
+from .archive import archive, mapped_archive
+from .climatology import climatology
+from .database import database
+from .panel import panel, build_panel
+from .parse import read_ndbc, iter_ndbc, read_spectral, apply_dtype_policy, \
+    sniff_format
+from .spectra import spectral_cube, load_cube, PRODUCTS, directional_spectrum, \
+    iter_directional_spectrum, spectral_moments
+from . import schedule
+from .schedule import scheduler, classify, outcome
+from .instrument import phase, enabled, timed_reader, recording, \
+    phase_stats, add_hook, remove_hook, logging_hook
+
+#names that buoypy exports, kept in the package so it can load them lazily
+from . import __all__
+
+#http status codes of a .gz download that the text viewer may get around
+VIEWER_CODES = (403,)
+
+
 class realtime:
+    """
+    Retrieves the last 45 days worth of data for a specific buoy.
+
+    Parameters
+    ----------
+    buoy : string
+        Buoy number ex: '41013' is off wilmington, nc
+    cache : http_cache
+        Keeps the downloaded files on disk and only downloads them again
+        when the NDBC has a newer version. None downloads every time.
+    pool : connection_pool
+        Shared keep-alive connections to download through. With a cache,
+        its conditional requests go through the pool.
+    dtype_policy : string
+        None keeps float64 columns. 'compact' stores measurements as
+        float32, text columns as categoricals and hhmm times as Int16.
+    """
+
+    def __init__(self, buoy, cache=None, pool=None, dtype_policy=None):
+
+        self.buoy = buoy
+        self.link = ndbc('data/realtime2/{}'.format(buoy))
+        self.cache = cache
+        self.pool = pool
+        self.dtype_policy = dtype_policy
+
+    def _fetch(self, link):
+        """
+        Bytes of link from the cache or the pool. None when neither is
+        set, then the caller streams the link itself.
+        """
+
+        if self.cache is None and self.pool is None:
+            return None
+
+        with phase('network', link) as r:
+            if self.cache is not None:
+                #conditional requests go over the pool when there is one
+                body = self.cache.get(link, pool=self.pool)
+            else:
+                body = self.pool.get(link)
+            r.bytes = len(body)
+
+        return body
+
+    def _source(self, ext, since=None):
+        """
+        Something pd.read_csv can read the file with the extension ext from.
+
+        Parameters
+        ----------
+        ext : string
+            File extension, ex: 'txt'
+        since : datetime
+            Only keep the header and the rows newer than this. Gives None
+            if there are no newer rows.
+        """
+
+        link = "{}.{}".format(self.link, ext)
+        body = self._fetch(link)
+
+        if since is None:
+            if body is None:
+                return link
+            return _named(body, link)
+
+        since = pd.Timestamp(since).to_pydatetime()
+
+        if body is None:
+            response = urlopen(link)
+            if enabled():
+                response = io.BufferedReader(timed_reader(response, link))
+            lines = iter(response)
+        else:
+            response = None
+            lines = iter(io.BytesIO(body))
+
+        keep = []
+        new_rows = 0
+        try:
+            for line in lines:
+
+                #the header lines all start with a hash
+                if line.startswith(b'#'):
+                    keep.append(line)
+                    continue
+
+                t = [int(x) for x in line.split()[:5]]
+                if datetime.datetime(*t) <= since:
+                    break
+
+                keep.append(line)
+                new_rows += 1
+        finally:
+            #stop downloading once we hit rows we already have
+            if response is not None:
+                response.close()
 
-    def __init__(self, buoy):
+        if not new_rows:
+            return None
 
-        self.link = 'http://www.ndbc.noaa.gov/data/realtime2/{}'.format(buoy)
+        return _named(b''.join(keep), link)
 
-    def data_spec(self):
+    def data_spec(self, since=None):
         """
         Get the raw spectral wave data from the buoy. The seperation
         frequency is dropped to keep the data clean.
 
         Parameters
         ----------
-        buoy : string
-            Buoy number ex: '41013' is off wilmington, nc
+        since : datetime
+            Only return rows newer than this. The newest rows come first,
+            so reading stops at the first row that is not newer.
 
         Returns
         -------
@@ -82,34 +213,27 @@ class realtime:
 
         """
         
-        link = "{}.{}".format(self.link, 'data_spec')
-
-        #combine the first five date columns YY MM DD hh mm and make index
-        df = pd.read_csv(link, delim_whitespace=True, skiprows=1, header=None,
-            parse_dates=[[0,1,2,3,4]], index_col=0)
-
-
-        #convert the dates to datetimes
-        df.index = pd.to_datetime(df.index,format="%Y %m %d %H %M")
+        link = self._source('data_spec', since)
+        if link is None:
+            return pd.DataFrame()
 
-        specs = df.iloc[:,1::2]
-        freqs = df.iloc[0,2::2]
+        specs = read_spectral(link)
 
-        specs.columns=freqs
+        return apply_dtype_policy(specs, self.dtype_policy)
 
-        #remove the parenthesis from the column index
-        specs.columns = [cname.replace('(','').replace(')','')
-            for cname in specs.columns]
 
-        return specs
-
-
-    def ocean(self):
+    def ocean(self, since=None):
         """
         Retrieve oceanic data. For the buoys explored,
         O2%, O2PPM, CLCON, TURB, PH, EH were always NaNs
 
 
+        Parameters
+        ----------
+        since : datetime
+            Only return rows newer than this. The newest rows come first,
+            so reading stops at the first row that is not newer.
+
         Returns
         -------
         df : pandas dataframe
@@ -127,37 +251,28 @@ class realtime:
 
         """
 
-        link = "{}.{}".format(self.link, 'ocean')
-
-        #combine the first five date columns YY MM DD hh mm and make index
-        df = pd.read_csv(link, delim_whitespace=True, na_values='MM',
-            parse_dates=[[0,1,2,3,4]], index_col=0)
+        link = self._source('ocean', since)
+        if link is None:
+            return pd.DataFrame()
 
-        #units are in the second row drop them
-        df.drop(df.index[0], inplace=True)
+        #units are in the second row, read_ndbc drops them
+        df = read_ndbc(link, na_values=['MM'])
 
-        #convert the dates to datetimes
-        df.index = pd.to_datetime(df.index,format="%Y %m %d %H %M")
+        return apply_dtype_policy(df, self.dtype_policy)
 
-        #convert to floats
-        cols = ['DEPTH','OTMP','COND','SAL']
-        df[cols] = df[cols].astype(float)
 
-
-        return df
-
-
-    def spec(self):
+    def spec(self, since=None):
         """
         Get the spectral wave data from the ndbc. Something is wrong with
         the data for this parameter. The columns seem to change randomly.
         Refreshing the data page will yield different column names from
         minute to minute.
 
-        parameters
+        Parameters
         ----------
-        buoy : string
-            Buoy number ex: '41013' is off wilmington, nc
+        since : datetime
+            Only return rows newer than this. The newest rows come first,
+            so reading stops at the first row that is not newer.
 
         Returns
         -------
@@ -165,50 +280,32 @@ class realtime:
             data frame containing the spectral data. index is the date
             and the columns are:
 
-            HO, SwH, SwP, WWH, WWP, SwD, WWD, STEEPNESS, AVP, MWD
-
-            OR
-
             WVHT  SwH  SwP  WWH  WWP SwD WWD  STEEPNESS  APD MWD
 
-
+            Files that still use H0 and AVP come out with WVHT and APD.
         """
 
-        link = "{}.{}".format(self.link, 'spec')
-
-        #combine the first five date columns YY MM DD hh mm and make index
-        df = pd.read_csv(link, delim_whitespace=True, na_values='MM',
-            parse_dates=[[0,1,2,3,4]], index_col=0)
-
-        try:
-            #units are in the second row drop them
-            #df.columns = df.columns + '('+ df.iloc[0] + ')'
-            df.drop(df.index[0], inplace=True)
-
-            #convert the dates to datetimes
-            df.index = pd.to_datetime(df.index,format="%Y %m %d %H %M")
-
-            #convert to floats
-            cols = ['WVHT','SwH','SwP','WWH','WWP','APD','MWD']
-            df[cols] = df[cols].astype(float)
-        except:
+        link = self._source('spec', since)
+        if link is None:
+            return pd.DataFrame()
 
-            #convert the dates to datetimes
-            df.index = pd.to_datetime(df.index,format="%Y %m %d %H %M")
+        #read_ndbc looks the format up from the header and gives the old
+        #names their current ones
+        df = read_ndbc(link, na_values=['MM'])
 
-            #convert to floats
-            cols = ['H0','SwH','SwP','WWH','WWP','AVP','MWD']
-            df[cols] = df[cols].astype(float)
+        return apply_dtype_policy(df, self.dtype_policy)
 
 
-        return df
-
-
-
-    def supl(self):
+    def supl(self, since=None):
         """
         Get supplemental data
 
+        Parameters
+        ----------
+        since : datetime
+            Only return rows newer than this. The newest rows come first,
+            so reading stops at the first row that is not newer.
+
         Returns
         -------
         data frame containing the spectral data. index is the date
@@ -223,29 +320,26 @@ class realtime:
 
         """
 
-        link = "{}.{}".format(self.link, 'supl')
+        link = self._source('supl', since)
+        if link is None:
+            return pd.DataFrame()
 
-        #combine the first five date columns YY MM DD hh mm and make index
-        df = pd.read_csv(link, delim_whitespace=True, na_values='MM',
-            parse_dates=[[0,1,2,3,4]], index_col=0)
+        #units are in the second row, read_ndbc drops them
+        df = read_ndbc(link, na_values=['MM'])
 
-        #units are in the second row drop them
-        df.drop(df.index[0], inplace=True)
+        return apply_dtype_policy(df, self.dtype_policy)
 
-        #convert the dates to datetimes
-        df.index = pd.to_datetime(df.index,format="%Y %m %d %H %M")
 
-        #convert to floats
-        cols = ['PRES','PTIME','WSPD','WDIR','WTIME']
-        df[cols] = df[cols].astype(float)
-
-        return df
-
-
-    def swdir(self):
+    def swdir(self, since=None):
         """
         Spectral wave data for alpha 1.
 
+        Parameters
+        ----------
+        since : datetime
+            Only return rows newer than this. The newest rows come first,
+            so reading stops at the first row that is not newer.
+
         Returns
         -------
 
@@ -255,30 +349,25 @@ class realtime:
         """
 
 
-        link = "{}.{}".format(self.link, 'swdir')
-
-        #combine the first five date columns YY MM DD hh mm and make index
-        df = pd.read_csv(link,delim_whitespace=True,skiprows=1,na_values=999,
-            header=None, parse_dates=[[0,1,2,3,4]], index_col=0)
-
-        #convert the dates to datetimes
-        df.index = pd.to_datetime(df.index,format="%Y %m %d %H %M")
-
-        specs = df.iloc[:,0::2]
-        freqs = df.iloc[0,1::2]
+        link = self._source('swdir', since)
+        if link is None:
+            return pd.DataFrame()
 
-        specs.columns=freqs
+        specs = read_spectral(link, na_values=[999])
 
-        #remove the parenthesis from the column index
-        specs.columns = [cname.replace('(','').replace(')','')
-            for cname in specs.columns]
+        return apply_dtype_policy(specs, self.dtype_policy)
 
-        return specs
 
-    def swdir2(self):
+    def swdir2(self, since=None):
         """
         Spectral wave data for alpha 2.
 
+        Parameters
+        ----------
+        since : datetime
+            Only return rows newer than this. The newest rows come first,
+            so reading stops at the first row that is not newer.
+
         Returns
         -------
 
@@ -287,30 +376,25 @@ class realtime:
             the table indicate how much energy is at each spectrum.
         """
 
-        link = "{}.{}".format(self.link, 'swdir2')
+        link = self._source('swdir2', since)
+        if link is None:
+            return pd.DataFrame()
 
-        #combine the first five date columns YY MM DD hh mm and make index
-        df = pd.read_csv(link,delim_whitespace=True,skiprows=1,
-            header=None, parse_dates=[[0,1,2,3,4]], index_col=0)
+        specs = read_spectral(link)
 
-        #convert the dates to datetimes
-        df.index = pd.to_datetime(df.index,format="%Y %m %d %H %M")
+        return apply_dtype_policy(specs, self.dtype_policy)
 
-        specs = df.iloc[:,0::2]
-        freqs = df.iloc[0,1::2]
 
-        specs.columns=freqs
-
-        #remove the parenthesis from the column index
-        specs.columns = [cname.replace('(','').replace(')','')
-            for cname in specs.columns]
-
-        return specs
-
-    def swr1(self):
+    def swr1(self, since=None):
         """
         Spectral wave data for r1.
 
+        Parameters
+        ----------
+        since : datetime
+            Only return rows newer than this. The newest rows come first,
+            so reading stops at the first row that is not newer.
+
         Returns
         -------
 
@@ -321,29 +405,25 @@ class realtime:
 
 
 
-        link = "{}.{}".format(self.link, 'swr1')
-        #combine the first five date columns YY MM DD hh mm and make index
-        df = pd.read_csv(link,delim_whitespace=True,skiprows=1,
-            header=None, parse_dates=[[0,1,2,3,4]], index_col=0)
+        link = self._source('swr1', since)
+        if link is None:
+            return pd.DataFrame()
 
-        #convert the dates to datetimes
-        df.index = pd.to_datetime(df.index,format="%Y %m %d %H %M")
+        specs = read_spectral(link)
 
-        specs = df.iloc[:,0::2]
-        freqs = df.iloc[0,1::2]
+        return apply_dtype_policy(specs, self.dtype_policy)
 
-        specs.columns=freqs
 
-        #remove the parenthesis from the column index
-        specs.columns = [cname.replace('(','').replace(')','')
-            for cname in specs.columns]
-
-        return specs
-
-    def swr2(self):
+    def swr2(self, since=None):
         """
         Spectral wave data for r2.
 
+        Parameters
+        ----------
+        since : datetime
+            Only return rows newer than this. The newest rows come first,
+            so reading stops at the first row that is not newer.
+
         Returns
         -------
 
@@ -353,85 +433,227 @@ class realtime:
         """
 
 
-        link = "{}.{}".format(self.link, 'swr2')
-
-        #combine the first five date columns YY MM DD hh mm and make index
-        df = pd.read_csv(link,delim_whitespace=True,skiprows=1,
-            header=None, parse_dates=[[0,1,2,3,4]], index_col=0)
-
-        #convert the dates to datetimes
-        df.index = pd.to_datetime(df.index,format="%Y %m %d %H %M")
+        link = self._source('swr2', since)
+        if link is None:
+            return pd.DataFrame()
 
-        specs = df.iloc[:,0::2]
-        freqs = df.iloc[0,1::2]
+        specs = read_spectral(link)
 
-        specs.columns=freqs
+        return apply_dtype_policy(specs, self.dtype_policy)
 
-        #remove the parenthesis from the column index
-        specs.columns = [cname.replace('(','').replace(')','')
-            for cname in specs.columns]
 
-        return specs
-
-    def txt(self):
+    def txt(self, since=None):
         """
-        Retrieve standard Meteorological data. NDBC seems to be updating
-        the data with different column names, so this metric can return
-        two possible data frames with different column names:
+        Retrieve standard Meteorological data. NDBC has used different
+        column names over the years, the old ones are renamed to the
+        current ones.
+
+        Parameters
+        ----------
+        since : datetime
+            Only return rows newer than this. The newest rows come first,
+            so reading stops at the first row that is not newer.
 
         Returns
         -------
 
         df : pandas dataframe
-            Index is the date and the columns can be:
+            Index is the date and the columns are:
 
             ['WDIR','WSPD','GST','WVHT','DPD','APD','MWD',
             'PRES','ATMP','WTMP','DEWP','VIS','PTDY','TIDE']
 
-            or
+            Files that still use WD and BARO come out with WDIR and PRES.
+        """
+
+        link = self._source('txt', since)
+        if link is None:
+            return pd.DataFrame()
 
-            ['WD','WSPD','GST','WVHT','DPD','APD','MWD','BARO',
-            'ATMP','WTMP','DEWP','VIS','PTDY','TIDE']
+        #read_ndbc looks the format up from the header and gives the old
+        #names their current ones
+        df = read_ndbc(link, na_values=['MM'])
 
+        df.index.name='Date'
+        return apply_dtype_policy(df, self.dtype_policy)
+
+    def spectral_cube(self):
         """
+        Load data_spec, swdir, swdir2, swr1 and swr2 into one array shaped
+        (time, frequency, variable) with a shared numeric frequency axis.
+        See buoypy.spectra.
 
-        link = "{}.{}".format(self.link, 'txt')
-        #combine the first five date columns YY MM DD hh mm and make index
-        df = pd.read_csv(link, delim_whitespace=True, na_values='MM',
-            parse_dates=[[0,1,2,3,4]], index_col=0)
+        Returns
+        -------
+        cube : spectral_cube
+            cube.data is float32 and the dates run oldest first.
+        """
 
-        try:
-            #first column is units, so drop it
-            df.drop(df.index[0], inplace=True)
-            #convert the dates to datetimes
-            df.index = pd.to_datetime(df.index,format="%Y %m %d %H %M")
+        sources = dict((ext, self._source(ext)) for ext, _ in PRODUCTS)
 
-            #convert to floats
-            cols = ['WDIR','WSPD','GST','WVHT','DPD','APD','MWD',
-            'PRES','ATMP','WTMP','DEWP','VIS','PTDY','TIDE']
-            df[cols] = df[cols].astype(float)
-        except:
+        return load_cube(sources)
 
-            #convert the dates to datetimes
-            df.index = pd.to_datetime(df.index,format="%Y %m %d %H %M")
 
-            #convert to floats
-            cols = ['WD','WSPD','GST','WVHT','DPD','APD','MWD','BARO',
-            'ATMP','WTMP','DEWP','VIS','PTDY','TIDE']
-            df[cols] = df[cols].astype(float)
-        df.index.name='Date'
+class realtime_refresher:
+    """
+    Keeps track of the newest row seen for each realtime product, so that
+    polling a buoy only parses the rows that arrived since the last poll.
+
+    Parameters
+    ----------
+    buoy : string
+        Buoy number ex: '41013' is off wilmington, nc
+    cache : http_cache
+        Passed on to realtime.
+    dtype_policy : string
+        Passed on to realtime.
+
+    Example:
+    R = realtime_refresher(41013)
+    df = R.update('txt') #everything in the file
+    df = R.update('txt') #only the rows that are new since the last call
+    """
+
+    def __init__(self, buoy, cache=None, dtype_policy=None):
+
+        self.rt = realtime(buoy, cache=cache, dtype_policy=dtype_policy)
+        self.last = {}
+
+    def update(self, product='txt'):
+        """
+        Rows of product newer than the last call.
+
+        Parameters
+        ----------
+        product : string
+            Name of the realtime method, ex: 'txt' or 'spec'
+
+        Returns
+        -------
+        df : pandas dataframe
+            Same columns as the realtime method. Empty when nothing is new.
+        """
+
+        df = getattr(self.rt, product)(since=self.last.get(product))
+
+        if len(df):
+            self.last[product] = df.index.max()
+
         return df
 
+
+def realtime_many(buoys, products=('txt',), workers=8, per_host=4,
+        cache=None, pool=None, dtype_policy=None, scheduler=None):
+    """
+    Fetch realtime products for many buoys at once over shared keep-alive
+    connections. A buoy that fails does not stop the others.
+
+    Parameters
+    ----------
+    buoys : list
+        Buoy numbers ex: ['41013', '41108']
+    products : list
+        Names of realtime methods, ex: ['txt', 'spec']
+    workers : int
+        Number of files to work on at the same time.
+    per_host : int
+        Most requests that run against the NDBC at the same time.
+    cache : http_cache
+        Passed on to realtime.
+    pool : connection_pool
+        Connections to reuse. A new pool is made and closed if None.
+    dtype_policy : string
+        Passed on to realtime.
+    scheduler : scheduler
+        Retries throttled and dropped requests and adapts the number of
+        workers. Defaults to one that stays at most at workers. Its ledger
+        is keyed by (buoy, product).
+
+    Returns
+    -------
+    data : dict
+        {buoy: {product: df}} for everything that worked.
+    failures : dict
+        {buoy: {product: error}} for everything that did not.
+    """
+
+    own_pool = pool is None
+    if own_pool:
+        pool = connection_pool(per_host=per_host)
+
+    jobs = [(buoy, product) for buoy in buoys for product in products]
+    stations = dict((buoy, realtime(buoy, cache=cache, pool=pool,
+        dtype_policy=dtype_policy)) for buoy in buoys)
+
+    def fetch(job):
+        buoy, product = job
+        return getattr(stations[buoy], product)()
+
+    if scheduler is None:
+        scheduler = schedule.scheduler(workers=workers)
+
+    data = {}
+    failures = {}
+    try:
+        for (buoy, product), df in zip(jobs, scheduler.map(fetch, jobs)):
+
+            if df is not None:
+                data.setdefault(buoy, {})[product] = df
+            else:
+                error = scheduler.ledger[(buoy, product)].error
+                failures.setdefault(buoy, {})[product] = error
+    finally:
+        if own_pool:
+            pool.close()
+
+    return data, failures
+
+
+def _named(body, link):
+    """
+    File object of body that remembers the link it came from.
+    """
+
+    f = io.BytesIO(body)
+    f.name = link
+
+    return f
+
+
 ################################################
 ################################################
 
 class historic_data:
+    """
+    Retrieves the historical data for a specific buoy.
+
+    Parameters
+    ----------
+    buoy : string
+        Buoy number ex: '41013' is off wilmington, nc
+    year : int
+        Year get_stand_meteo downloads.
+    year_range : tuple
+        (start, stop) years get_all_stand_meteo downloads, inclusive.
+    dtype_policy : string
+        None keeps float64 columns. 'compact' stores the measurements as
+        float32. See buoypy.parse.apply_dtype_policy.
+    max_memory : int
+        Bytes the parser may use at once. Each file is then parsed a piece
+        at a time into arrays of its final dtype. None parses whole files.
+    """
+
+    def __init__(self, buoy, year, year_range=None, dtype_policy=None,
+            max_memory=None):
 
-    def __init__(self, buoy, year, year_range=None):
+        self.buoy = buoy
+        self.year = year
+        self.year_range = year_range
+        self.dtype_policy = dtype_policy
+        self.max_memory = max_memory
 
-        link = 'http://www.ndbc.noaa.gov/view_text_file.php?filename='
-        link += '{}h{}.txt.gz&dir=data/historical/'.format(buoy, year)
-        self.link = link
+        self.link = file_link('{}h{}.txt.gz'.format(buoy, year),
+            'data/historical/stdmet/')
 
     def get_stand_meteo(self,link = None):
         '''
@@ -459,132 +681,312 @@ class historic_data:
         TIDE    The water level in feet above or below Mean Lower Low Water (MLLW).
         '''
 
-        link = self.link + 'stdmet/'
+        if link is None:
+            link = self.link
+
+        if isinstance(link, tuple):
+            #the same month under more than one name, the first that
+            #exists is used
+            for alternative in link[:-1]:
+                try:
+                    return self.get_stand_meteo(alternative)
+                except IOError as e:
+                    if classify(e) != 'missing':
+                        raise
+            link = link[-1]
+
+        #the 2007 and on format has a units row and a minute column, the
+        #older ones may not. read_ndbc looks the format up from the header,
+        #which also gives the missing data values of each column (999 for
+        #WDIR, 99 for WVHT, ...) and renames WD and BAR to WDIR and PRES.
+        #the .gz files are unzipped as they are read.
+        options = {'max_memory': self.max_memory}
+        if self.dtype_policy == 'compact':
+            options['float_dtype'] = np.float32
 
-        #combine the first five date columns YY MM DD hh and make index
-        df = pd.read_csv(link, header=0, delim_whitespace=True, dtype=object,
-            na_values=[99,999,9999,99.,999.,9999.])
+        try:
+            df = read_ndbc(link, **options)
+        except (HTTPError, EOFError, zlib.error) as e:
+            #a .gz that comes broken, or that the server will not send as
+            #binary, can still come through the text viewer. a missing
+            #file is missing there as well, and throttling or timeouts go
+            #back to the scheduler so a busy server is not asked twice.
+            if isinstance(e, HTTPError) and e.code not in VIEWER_CODES or \
+                    viewer_link(link) == link:
+                raise
+            df = read_ndbc(viewer_link(link), **options)
+
+        return apply_dtype_policy(df, self.dtype_policy)
+
+    def plan_stand_meteo(self, index=None):
+        """
+        Work out which files get_all_stand_meteo needs to download.
 
+        Parameters
+        ----------
+        index : availability or False
+            Index of the files on the NDBC. None uses the index kept in
+            ~/.buoypy. False skips the index and tries every year in
+            year_range, which costs a request for every missing year.
 
-        #2007 and on format
-        if df.iloc[0,0] =='#yr':
+        Returns
+        -------
+        names : list
+            Label for each file, ex: '2015' or 'Jan2016'
+        links : list
+            Link for each file. A month the NDBC may not have zipped yet
+            gets a tuple of links, see get_stand_meteo.
+        """
 
+        start,stop = self.year_range
 
-            df = df.rename(columns={'#YY': 'YY'}) #get rid of hash
+        if index is None:
+            index = availability()
 
-            #make the indices
-            
-            df.drop(0, inplace=True) #first row is units, so drop them
-            
-            d = df.YY + ' ' + df.MM+ ' ' + df.DD + ' ' + df.hh + ' ' + df.mm
-            ind = pd.to_datetime(d, format="%Y %m %d %H %M")
+        names = []
+        links = []
 
-            df.index = ind
+        if index is not False:
+            for year in index.years(self.buoy, year_range=(start, stop)):
+                fname = index.station(self.buoy)['years'][str(year)]
+                names.append(str(year))
+                links.append(file_link(fname, 'data/historical/stdmet/'))
+        else:
+            #a missing year fails on the download itself, so no need to probe
+            for ii in range(start,stop+1):
 
-            #drop useless columns and rename the ones we want
-            df.drop(['YY','MM','DD','hh','mm'], axis=1, inplace=True)
-            df.columns = ['WDIR', 'WSPD', 'GST', 'WVHT', 'DPD', 'APD', 'MWD',
-                'PRES', 'ATMP', 'WTMP', 'DEWP', 'VIS', 'TIDE']
+                fname = str(self.buoy) + 'h' + str(ii) + '.txt.gz'
+                link = file_link(fname, 'data/historical/stdmet/')
 
+                names.append(str(ii))
+                links.append(link)
 
-        #before 2006 to 2000
-        else:
-            date_str = df.YYYY + ' ' + df.MM + ' ' + df.DD + ' ' + df.hh
+        #need to also retrieve jan, feb, march, etc. of the years that are
+        #not in the yearly files yet
+        for name, alternatives in resolve_months(self.buoy, index):
 
-            ind = pd.to_datetime(date_str,format="%Y %m %d %H")
+            if not start <= int(name[3:]) <= stop:
+                continue
 
-            df.index = ind
+            names.append(name)
+            links.append(alternatives[0] if len(alternatives) == 1 else
+                alternatives)
 
-            #some data has a minute column. Some doesn't.
+        return names, links
 
-            if 'mm' in df.columns:
-                df.drop(['YYYY','MM','DD','hh','mm'], axis=1, inplace=True)
-            else:
-                df.drop(['YYYY','MM','DD','hh'], axis=1, inplace=True)
+    def iter_stand_meteo(self, workers=1, index=None, scheduler=None):
+        """
+        Yield the standard meteorological data one file at a time, oldest
+        first. Only one parsed file per worker is in memory at once, so
+        decades of data can be processed piece by piece.
 
+        Parameters
+        ----------
+        workers : int
+            Number of files to download and parse at the same time.
+        index : availability or False
+            See plan_stand_meteo.
+        scheduler : scheduler
+            Retries, adapts the number of workers and keeps a ledger of
+            every file. Defaults to one that starts and stays at most at
+            workers.
+
+        Yields
+        ------
+        df : pandas dataframe
+            Data from a single year or month file.
+        """
 
-            df.columns = ['WDIR', 'WSPD', 'GST', 'WVHT', 'DPD', 'APD',
-                'MWD', 'PRES', 'ATMP', 'WTMP', 'DEWP', 'VIS', 'TIDE']
+        for name, df in self._iter_named(workers, index, scheduler):
+            yield df
 
+    def _iter_named(self, workers=1, index=None, scheduler=None, plan=None):
+        """
+        iter_stand_meteo with the label of each file, ex: ('2015', df) or
+        ('Jan2016', df). plan is (names, links) to fetch instead of the
+        ones of plan_stand_meteo.
+        """
 
-        # all data should be floats
-        df = df.astype('float')
+        names, links = plan if plan is not None else \
+            self.plan_stand_meteo(index)
 
-        return df
+        if scheduler is None:
+            scheduler = schedule.scheduler(workers=workers)
+
+        frames = scheduler.map(self.get_stand_meteo, links)
+
+        for name, L, new_df in zip(names, links, frames):
 
-    def get_all_stand_meteo(self):
+            if new_df is None:
+                entry = scheduler.ledger.get(L)
+                if entry is not None and entry.status == 'failed':
+                    print(name + ' failed : ' + repr(entry.error))
+                else:
+                    print(name + ' not in records')
+                continue
+
+            print('Link : ' + (L if isinstance(L, str) else ' or '.join(L)))
+            yield name, new_df
+
+    def get_all_stand_meteo(self, workers=1, index=None, scheduler=None):
         """
         Retrieves all the standard meterological data. Calls get_stand_meteo.
-        It also checks to make sure that the years that were requested are
-        available. Data is not available for the same years at all the buoys.
+        Only the files that the availability index lists for this buoy are
+        downloaded. Data is not available for the same years at all the
+        buoys.
+
+        Parameters
+        ----------
+        workers : int
+            Number of files to download and parse at the same time. The
+            default of 1 fetches the files one after another.
+        index : availability or False
+            See plan_stand_meteo.
+        scheduler : scheduler
+            See iter_stand_meteo.
 
         Returns
         -------
         df : pandas dataframe
             Contains all the data from all the years that were specified
-            in year_range.
+            in year_range. Years are in the same order for any number of
+            workers.
         """
 
-        start,stop = self.year_range
+        dfs = list(self.iter_stand_meteo(workers, index, scheduler))
 
-        #see what is on the NDBC so we only pull the years that are available
-        links = []
-        for ii in range(start,stop+1):
+        if not dfs:
+            return pd.DataFrame()
 
-            base = 'http://www.ndbc.noaa.gov/view_text_file.php?filename='
-            end = '.txt.gz&dir=data/historical/stdmet/'
-            link = base + str(self.buoy) + 'h' + str(ii) + end
+        #one copy at the end instead of one per file
+        return merge_months(dfs)
 
-            try:
-                urllib2.urlopen(link)
-                links.append(link)
 
-            except:
-                print(str(ii) + ' not in records')
+def merge_months(dfs):
+    """
+    Concatenate yearly and monthly frames, oldest first. Monthly files
+    overlap each other and the yearly files at their edges, so a time
+    that shows up twice keeps the row of the first frame it is in.
+    """
 
-        #need to also retrieve jan, feb, march, etc.
-        month = ['Jan','Feb','Mar','Apr','May','Jun',
-            'Jul','Aug','Sep','Oct','Nov','Dec']
-        k = [1,2,3,4,5,6,7,8,9,'a','b','c'] #for the links
+    df = pd.concat(dfs)
 
-        for ii in range(len(month)):
-            mid = '.txt.gz&dir=data/stdmet/'
-            link = base + str(self.buoy) + str(k[ii]) + '2016' + mid + str(month[ii]) +'/'
+    if not df.index.is_unique:
+        df = df[~df.index.duplicated(keep='first')]
+
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index(kind='stable')
+
+    return df
 
-            try:
-                urllib2.urlopen(link)
-                links.append(link)
 
-            except:
-                print(str(month[ii]) + '2016' + ' not in records')
-                print(link)
+def months_many(buoys, workers=8, index=None, scheduler=None,
+        dtype_policy=None, max_memory=None):
+    """
+    Fill in the months that are not in the yearly files yet for many
+    buoys at once. The monthly files of every buoy share one scheduler,
+    so they are all downloaded at the same time. See resolve_months.
+
+    Parameters
+    ----------
+    buoys : list
+        Buoy numbers ex: ['41013', '41108']
+    workers : int
+        Number of files to work on at the same time.
+    index : availability or False
+        See resolve_months.
+    scheduler : scheduler
+        Defaults to one that stays at most at workers. Its ledger is
+        keyed by (buoy, month, link).
+    dtype_policy, max_memory
+        Passed on to historic_data.
+
+    Returns
+    -------
+    data : dict
+        {buoy: df} of the months found, oldest first without repeated
+        times. Buoys with no monthly files are left out.
+    failures : dict
+        {buoy: {month: error}} for the files that were lost.
+    """
 
+    if index is None:
+        index = availability()
 
-        # start grabbing some data
-        df=pd.DataFrame() #initialize empty df
+    if scheduler is None:
+        scheduler = schedule.scheduler(workers=workers)
 
-        for L in links:
+    stations = dict((buoy, historic_data(buoy, None,
+        dtype_policy=dtype_policy, max_memory=max_memory)) for buoy in buoys)
 
-            new_df = self.get_stand_meteo(link=L)
-            print('Link : ' + L)
-            df = df.append(new_df)
+    jobs = []
+    for buoy in buoys:
+        for name, alternatives in resolve_months(buoy, index):
+            link = alternatives[0] if len(alternatives) == 1 else alternatives
+            jobs.append((buoy, name, link))
 
-        return df
+    def fetch(job):
+        buoy, name, link = job
+        return stations[buoy].get_stand_meteo(link)
+
+    found = {}
+    failures = {}
+    for job, df in zip(jobs, scheduler.map(fetch, jobs)):
+
+        buoy, name, link = job
+        if df is not None:
+            found.setdefault(buoy, []).append(df)
+            continue
+
+        entry = scheduler.ledger[job]
+        if entry.status == 'failed':
+            failures.setdefault(buoy, {})[name] = entry.error
+
+    data = dict((buoy, merge_months(dfs)) for buoy, dfs in found.items())
+
+    return data, failures
 
 
 class write_data(historic_data):
+    """
+    Writes the historic data to disk.
+
+    Parameters
+    ----------
+    db_name : string
+        SQLite database to write to.
+    archive : archive
+        Columnar archive to write to instead of the database.
+    climatology : climatology
+        Day of year rollups to add every file to as it is written.
+    """
 
-    def __init__(self, buoy, year, year_range,db_name = 'buoydata.db'):
+    def __init__(self, buoy, year, year_range,db_name = 'buoydata.db',
+            archive=None, dtype_policy=None, max_memory=None,
+            climatology=None):
         self.buoy = buoy
         self.year = year
         self.year_range=year_range
+        self.dtype_policy = dtype_policy
+        self.max_memory = max_memory
         self.db_name = db_name
+        self.archive = archive
+        self.climatology = climatology
 
-    def write_all_stand_meteo(self):
+    def write_all_stand_meteo(self, workers=1, index=None, scheduler=None):
         """
         Write the standard meteological data to the database. See get_all_stand_meteo
         for a discription of the data. Which is in the historic data class.
 
+        Parameters
+        ----------
+        workers : int
+            Number of files to download and parse at the same time.
+        index : availability or False
+            See plan_stand_meteo.
+        scheduler : scheduler
+            See iter_stand_meteo.
+
         Returns
         -------
         df : pandas dataframe (date, frequency)
@@ -593,19 +995,29 @@ class write_data(historic_data):
 
         """
 
-        #hist = self.historic_data(self.buoy,self.year,year_range=self.year_range)
-        df = self.get_all_stand_meteo()
+        if self.climatology is not None:
+            #the rollups drop the rows of a file that belong to another
+            frames = self.climatology.ingest(self.buoy,
+                self._iter_named(workers, index, scheduler))
+        else:
+            frames = self.iter_stand_meteo(workers, index, scheduler)
+
+        if self.archive is not None:
+
+            #one file at a time, each lands in its own year partition
+            for df in frames:
+                self.archive.write(self.buoy, df)
 
-        #write the df to disk
-        disk_engine = create_engine('sqlite:///' + self.db_name)
+            print(str(self.buoy) + ' written to archive : ' + str(self.archive.root))
 
-        table_name = str(self.buoy) + '_buoy'
-        df.to_sql(table_name,disk_engine,if_exists='append')
-        sql = disk_engine.execute("""DELETE FROM wave_data
-            WHERE rowid not in
-            (SELECT max(rowid) FROM wave_data GROUP BY date)""")
+            return True
 
-        print(str(self.buoy) + 'written to database : ' + str(self.db_name))
+        #every file goes in one transaction, rows that are already in
+        #the table are updated in place
+        db = database(self.db_name)
+        db.write(self.buoy, frames)
+
+        print(str(self.buoy) + ' written to database : ' + str(self.db_name))
 
 
         return True
@@ -614,35 +1026,45 @@ class write_data(historic_data):
 class read_data:
     """
     Reads the data from the setup database
+
+    Parameters
+    ----------
+    archive : archive or mapped_archive
+        Columnar archive to read from instead of the database.
+    db_name : string
+        SQLite database to read from.
     """
 
-    def __init__(self, buoy, year_range=None):
+    def __init__(self, buoy, year_range=None, archive=None,
+            db_name='buoydata.db'):
         self.buoy = buoy
         self.year_range = year_range
-        self.disk_eng = 'sqlite:///buoydata.db'
-
-
-    def get_stand_meteo(self):
-
-        disk_engine = create_engine(self.disk_eng)
-
+        self.db_name = db_name
+        self.archive = archive
 
-        df = pd.read_sql_query(" SELECT * FROM " + "'" + str(self.buoy) + '_buoy' + "'", disk_engine)
 
-        #give it a datetime index since it was stripped by sqllite
-        df.index = pd.to_datetime(df['index'])
-        df.index.name='date'
-        df.drop('index',axis=1,inplace=True)
+    def get_stand_meteo(self, columns=None, start=None, end=None):
+        """
+        Read the standard meteorological data back. The year_range and
+        time filters are done by the database, so only the rows asked for
+        are read.
 
-        if self.year_range:
-            print("""this is not implemented in SQL. Could be slow.
-                    Get out while you can!!!""" )
+        Parameters
+        ----------
+        columns : list
+            Variables to read, ex: ['WVHT', 'DPD']. Every other column is
+            skipped.
+        start, end : datetime
+            Only rows with start <= time < end. With an archive only the
+            years they cover are opened.
+        """
 
-            start,stop = (self.year_range)
-            begin = df.index.searchsorted(datetime.datetime(start, 1, 1))
-            end = df.index.searchsorted(datetime.datetime(stop, 12, 31))
-            df = df.ix[begin:end]
+        if self.archive is not None:
+            return self.archive.read(self.buoy, columns=columns,
+                year_range=self.year_range, start=start, end=end)
 
+        db = database(self.db_name)
 
+        return db.read(self.buoy, year_range=self.year_range, start=start,
+            end=end, columns=columns)
 
-        return df
@@ -0,0 +1,275 @@
+"""
+On disk cache for NDBC downloads.
+
+The realtime2 files are rewritten by the NDBC every few minutes, but most
+polls still return the same bytes. The cache keeps each response with its
+ETag and Last-Modified headers and asks the NDBC for the file only if it
+changed. A 304 answer is served from disk.
+
+Example:
+import buoypy as bp
+
+cache = bp.http_cache(max_bytes=200 * 2**20)
+rt = bp.realtime(41013, cache=cache)
+df = rt.txt() #downloads the file
+df = rt.txt() #304 from the NDBC, parsed from disk
+
+cache.close() #write out when each response was last used
+cache.purge() #remove everything
+"""
+
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+
+try:
+    from urllib.request import urlopen, Request
+    from urllib.error import HTTPError
+except ImportError:
+    from urllib2 import urlopen, Request, HTTPError
+
+
+class http_cache:
+    """
+    Persistent response cache keyed by url.
+
+    Parameters
+    ----------
+    path : string
+        Folder to keep the responses in. Defaults to ~/.buoypy/http
+    max_bytes : int
+        Size limit of the cached bodies. The least recently used
+        responses are removed once it is exceeded. A response bigger than
+        max_bytes on its own is not cached.
+
+    The last use of each response is kept in memory and written out with
+    the next stored response, or by flush.
+    """
+
+    def __init__(self, path=None, max_bytes=500 * 2**20):
+
+        if path is None:
+            path = os.path.join(os.path.expanduser('~'), '.buoypy', 'http')
+
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._meta_file = os.path.join(path, 'entries.json')
+        self._dirty = False
+        self.entries = self._load()
+
+    def _load(self):
+
+        try:
+            with open(self._meta_file) as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return {}
+
+    def _save(self):
+
+        tmp = self._meta_file + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.entries, f)
+
+        os.replace(tmp, self._meta_file)
+        self._dirty = False
+
+    def flush(self):
+        """
+        Write out the last use of the responses that were read from disk
+        since the last store.
+        """
+
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    def close(self):
+
+        self.flush()
+
+    def _body_file(self, url):
+
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+        return os.path.join(self.path, key)
+
+    def get(self, url, timeout=60, pool=None):
+        """
+        Bytes of url. Sends a conditional request when the url is cached
+        and reads the body from disk if the NDBC says it has not changed.
+
+        Parameters
+        ----------
+        url : string
+            Link to download.
+        timeout : float
+            Seconds to wait for the NDBC.
+        pool : connection_pool
+            Send the request over its keep-alive connections, within its
+            per host limit. The pool's own timeout is used then.
+
+        Returns
+        -------
+        body : bytes
+        """
+
+        with self._lock:
+            entry = self.entries.get(url)
+
+        headers = {}
+        if entry is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        status, response_headers, body = self._open(url, headers, timeout,
+            pool)
+
+        if status == 304 and entry is not None:
+
+            body = self._read_body(url)
+            if body is not None:
+                with self._lock:
+                    self.hits += 1
+                return body
+
+            #body was removed from disk behind our back, so fetch it again
+            with self._lock:
+                self.entries.pop(url, None)
+            return self.get(url, timeout, pool)
+
+        with self._lock:
+            self.misses += 1
+
+        etag = response_headers.get('ETag')
+        last_modified = response_headers.get('Last-Modified')
+        if etag or last_modified:
+            self._store(url, body, etag, last_modified)
+
+        return body
+
+    def _open(self, url, headers, timeout, pool):
+        """
+        Status, headers and body of a GET. A 304 has an empty body.
+        """
+
+        if pool is not None:
+            return pool.open(url, headers)
+
+        try:
+            response = urlopen(Request(url, headers=headers), timeout=timeout)
+        except HTTPError as e:
+            if e.code != 304:
+                raise
+            return 304, e.headers, b''
+
+        try:
+            return response.getcode(), response.headers, response.read()
+        finally:
+            response.close()
+
+    def _read_body(self, url):
+
+        try:
+            with open(self._body_file(url), 'rb') as f:
+                body = f.read()
+        except IOError:
+            return None
+
+        #only in memory, a hit should not cost a rewrite of the index
+        with self._lock:
+            if url in self.entries:
+                self.entries[url]['used'] = time.time()
+                self._dirty = True
+
+        return body
+
+    def _store(self, url, body, etag, last_modified):
+
+        #it would push out every other response and then itself
+        if len(body) > self.max_bytes:
+            with self._lock:
+                if self.entries.pop(url, None) is not None:
+                    self._remove_body(url)
+                    self._save()
+            return
+
+        #a file of its own, another thread may be storing the same url
+        fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=self.path)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(body)
+            os.replace(tmp, self._body_file(url))
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+        with self._lock:
+            self.entries[url] = {'etag': etag, 'last_modified': last_modified,
+                'size': len(body), 'used': time.time()}
+            self._evict()
+            self._save()
+
+    def _evict(self):
+        """
+        Drop the least recently used bodies until the cache fits in
+        max_bytes. Caller holds the lock.
+        """
+
+        total = sum(e['size'] for e in self.entries.values())
+        if total <= self.max_bytes:
+            return
+
+        for url in sorted(self.entries, key=lambda u: self.entries[u]['used']):
+
+            total -= self.entries.pop(url)['size']
+            self._remove_body(url)
+
+            if total <= self.max_bytes:
+                break
+
+    def _remove_body(self, url):
+
+        try:
+            os.remove(self._body_file(url))
+        except OSError:
+            pass
+
+    def size(self):
+        """
+        Number of bytes in the cache.
+        """
+
+        with self._lock:
+            return sum(e['size'] for e in self.entries.values())
+
+    def purge(self, url=None):
+        """
+        Remove cached responses.
+
+        Parameters
+        ----------
+        url : string
+            Only remove this url. Everything is removed if it is None.
+        """
+
+        with self._lock:
+            urls = list(self.entries) if url is None else [url]
+
+            for u in urls:
+                self.entries.pop(u, None)
+                self._remove_body(u)
+
+            self._save()
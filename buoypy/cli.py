@@ -0,0 +1,272 @@
+"""
+buoypy command line tool.
+
+buoypy fetch-realtime 41013 41108 --product txt spec --out '{buoy}.{product}.csv'
+buoypy backfill 41013 --years 1990 2015 --out 41013.parquet
+buoypy sync-db 41013 41108 --years 1990 2015 --db buoydata.db
+buoypy export 41013 --db buoydata.db --years 2000 2009 --out 41013.csv
+
+The output format comes from --format, or from the extension of --out:
+.csv, .parquet, or .db/.sqlite for a SQLite file. '-' writes csv to
+stdout. --out can hold {buoy} and {product}, which is needed when csv or
+parquet output covers more than one buoy.
+
+Only argparse is loaded before a command runs, so --help and argument
+errors return without importing pandas.
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import argparse
+
+
+FORMATS = {'.csv': 'csv', '.parquet': 'parquet', '.db': 'sqlite',
+    '.sqlite': 'sqlite'}
+
+
+def output_format(out, fmt=None):
+    """
+    'csv', 'parquet' or 'sqlite' for an output path.
+    """
+
+    if fmt is not None:
+        return fmt
+
+    if out == '-':
+        return 'csv'
+
+    ext = os.path.splitext(out)[1].lower()
+    if ext not in FORMATS:
+        raise ValueError('can not tell the format of {}, use --format'.format(
+            out))
+
+    return FORMATS[ext]
+
+
+def write_output(df, out, fmt, key):
+    """
+    Write one frame.
+
+    Parameters
+    ----------
+    df : pandas dataframe
+    out : string
+        Path, with {buoy} and {product} filled in for csv and parquet.
+    fmt : string
+        'csv', 'parquet' or 'sqlite'
+    key : dict
+        {'buoy': ..., 'product': ...} of this frame.
+    """
+
+    if fmt == 'sqlite':
+        from .database import database
+
+        #one table per buoy and product
+        name = key['buoy'] if key['product'] == 'stdmet' else \
+            '{buoy}_{product}'.format(**key)
+        database(out).write(name, df)
+        return
+
+    path = out.format(**key)
+
+    if fmt == 'csv':
+        df.to_csv(sys.stdout if path == '-' else path)
+    else:
+        df.to_parquet(path)
+
+
+def check_output(parser, args, keys):
+    """
+    Make sure several frames do not go to the same csv or parquet file.
+    """
+
+    try:
+        fmt = output_format(args.out, args.format)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if fmt != 'sqlite' and len(keys) > 1:
+        names = set(args.out.format(**key) for key in keys)
+        if len(names) < len(keys):
+            parser.error('--out needs {buoy} and {product} in it for '
+                'more than one buoy or product')
+
+    return fmt
+
+
+def fetch_realtime(parser, args):
+
+    keys = [{'buoy': b, 'product': p} for b in args.buoys for p in args.product]
+    fmt = check_output(parser, args, keys)
+
+    from .buoypy import realtime_many, scheduler, http_cache
+
+    cache = http_cache() if args.cache else None
+    S = scheduler(workers=args.workers, max_workers=args.max_workers)
+
+    data, failures = realtime_many(args.buoys, args.product, cache=cache,
+        dtype_policy=args.dtype_policy, scheduler=S)
+    if cache is not None:
+        cache.close()
+
+    for key in keys:
+        df = data.get(key['buoy'], {}).get(key['product'])
+        if df is not None:
+            write_output(df, args.out, fmt, key)
+
+    for buoy, products in sorted(failures.items()):
+        for product, error in sorted(products.items()):
+            print('{} {} : {!r}'.format(buoy, product, error), file=sys.stderr)
+
+    return 1 if failures else 0
+
+
+def backfill(parser, args):
+
+    keys = [{'buoy': b, 'product': 'stdmet'} for b in args.buoys]
+    fmt = check_output(parser, args, keys)
+
+    from .buoypy import historic_data, scheduler
+
+    S = scheduler(workers=args.workers, max_workers=args.max_workers)
+
+    for key in keys:
+        H = historic_data(key['buoy'], args.years[1], tuple(args.years),
+            dtype_policy=args.dtype_policy)
+        df = H.get_all_stand_meteo(scheduler=S)
+        if len(df):
+            write_output(df, args.out, fmt, key)
+
+    return report(S)
+
+
+def sync_db(parser, args):
+
+    from .buoypy import write_data, scheduler
+
+    S = scheduler(workers=args.workers, max_workers=args.max_workers)
+
+    for buoy in args.buoys:
+        W = write_data(buoy, args.years[1], tuple(args.years),
+            db_name=args.db, dtype_policy=args.dtype_policy)
+        W.write_all_stand_meteo(scheduler=S)
+
+    return report(S)
+
+
+def export(parser, args):
+
+    keys = [{'buoy': b, 'product': 'stdmet'} for b in args.buoys]
+    fmt = check_output(parser, args, keys)
+
+    from .buoypy import read_data, archive
+
+    A = archive(args.archive) if args.archive else None
+    year_range = tuple(args.years) if args.years else None
+
+    for key in keys:
+        R = read_data(key['buoy'], year_range, archive=A, db_name=args.db)
+        df = R.get_stand_meteo(columns=args.columns, start=args.start,
+            end=args.end)
+        write_output(df, args.out, fmt, key)
+
+    return 0
+
+
+def report(S):
+    """
+    Print the files that were lost. 1 if there were any.
+    """
+
+    for link in S.failed():
+        print('failed : {} : {!r}'.format(link, S.ledger[link].error),
+            file=sys.stderr)
+
+    return 1 if S.failed() else 0
+
+
+def make_parser():
+
+    parser = argparse.ArgumentParser(prog='buoypy',
+        description='Download National Data Buoy Center data.')
+    parser.add_argument('--ndbc', help='base link of the NDBC or a mirror, '
+        'ex: http://127.0.0.1:8000/')
+
+    commands = parser.add_subparsers(dest='command', metavar='command')
+    commands.required = True
+
+    def fetching(p):
+        p.add_argument('buoys', nargs='+', help='buoy numbers, ex: 41013')
+        p.add_argument('--workers', type=int, default=4,
+            help='requests in flight to start with')
+        p.add_argument('--max-workers', type=int, default=None,
+            help='let the number of requests grow up to this')
+        p.add_argument('--dtype-policy', choices=['float64', 'compact'],
+            default=None)
+
+    def output(p, default):
+        p.add_argument('--out', default=default,
+            help='output path, can hold {buoy} and {product}')
+        p.add_argument('--format', choices=['csv', 'parquet', 'sqlite'],
+            help='defaults to the extension of --out')
+
+    p = commands.add_parser('fetch-realtime',
+        help='last 45 days of realtime data')
+    fetching(p)
+    p.add_argument('--product', nargs='+', default=['txt'],
+        choices=['txt', 'spec', 'supl', 'ocean', 'data_spec', 'swdir',
+            'swdir2', 'swr1', 'swr2'])
+    p.add_argument('--cache', action='store_true',
+        help='only download files that changed, see http_cache')
+    output(p, '{buoy}.{product}.csv')
+    p.set_defaults(func=fetch_realtime)
+
+    p = commands.add_parser('backfill',
+        help='historical standard meteorological data')
+    fetching(p)
+    p.add_argument('--years', type=int, nargs=2, required=True,
+        metavar=('START', 'STOP'))
+    output(p, '{buoy}.stdmet.csv')
+    p.set_defaults(func=backfill)
+
+    p = commands.add_parser('sync-db',
+        help='write the historical data to a SQLite database')
+    fetching(p)
+    p.add_argument('--years', type=int, nargs=2, required=True,
+        metavar=('START', 'STOP'))
+    p.add_argument('--db', default='buoydata.db')
+    p.set_defaults(func=sync_db)
+
+    p = commands.add_parser('export',
+        help='read stored data back out')
+    p.add_argument('buoys', nargs='+')
+    p.add_argument('--db', default='buoydata.db')
+    p.add_argument('--archive', help='read from this archive folder instead '
+        'of the database')
+    p.add_argument('--years', type=int, nargs=2, metavar=('START', 'STOP'))
+    p.add_argument('--start', help='first date, ex: 2015-03-01')
+    p.add_argument('--end', help='date after the last one')
+    p.add_argument('--columns', nargs='+')
+    output(p, '{buoy}.stdmet.csv')
+    p.set_defaults(func=export)
+
+    return parser
+
+
+def main(argv=None):
+
+    parser = make_parser()
+    args = parser.parse_args(argv)
+
+    if args.ndbc:
+        from . import index
+        index.NDBC = args.ndbc if args.ndbc.endswith('/') else args.ndbc + '/'
+
+    return args.func(parser, args)
+
+
+if __name__ == '__main__':
+
+    sys.exit(main())
@@ -0,0 +1,490 @@
+"""
+Day of year climatologies that are built up as the data comes in.
+
+For every station, variable and day of the year the store keeps the
+count, mean, variance, min and max of the values, and a t-digest of
+them. A t-digest is a few dozen weighted centroids that are dense near
+the tails, so any percentile can be read off it, and two of them merge
+into one. Adding a year of data only touches the rows of that year, and
+percentile bands come from the stored digests without reading the raw
+rows again.
+
+root/
+    41013.npz   every variable of one station
+
+Days are numbered 1 to 366 with February 29th as day 60, so March 1st is
+day 61 in every year.
+
+Example:
+import buoypy as bp
+
+C = bp.climatology('buoyclimate')
+W = bp.write_data(41013, 2015, (1990, 2015), climatology=C)
+W.write_all_stand_meteo()
+
+C.bands(41013, 'WVHT')  #day of year x [0.05, 0.25, 0.5, 0.75, 0.95]
+C.stats(41013, 'WVHT')  #day of year x [count, mean, std, min, max]
+"""
+
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+DAYS = 366
+
+#the per day arrays kept for each variable
+FIELDS = ('count', 'mean', 'm2', 'min', 'max', 'centroids', 'weights')
+
+
+class climatology:
+    """
+    Per station, per variable, per day of year rollups.
+
+    Parameters
+    ----------
+    root : string
+        Folder the rollups are kept in. Made if it does not exist.
+    delta : int
+        Most centroids each t-digest keeps. More give sharper percentiles
+        and bigger files.
+    """
+
+    def __init__(self, root='buoyclimate', delta=100):
+
+        self.root = root
+        self.delta = delta
+        self._loaded = {}
+        self._lock = threading.Lock()
+
+    def _fname(self, buoy):
+
+        return os.path.join(self.root, str(buoy) + '.npz')
+
+    def load(self, buoy):
+        """
+        Rollups of a station as {'months': set, 'variables': {name:
+        {field: array}}}. Empty if nothing was added yet.
+        """
+
+        with self._lock:
+            state = self._loaded.get(str(buoy))
+            if state is not None:
+                return state
+
+        state = {'months': set(), 'variables': {}}
+
+        try:
+            saved = np.load(self._fname(buoy))
+        except IOError:
+            saved = None
+
+        if saved is not None:
+            with saved:
+                state['months'] = set(saved['months'].tolist())
+                if saved['delta'] != self.delta:
+                    raise ValueError('{} was built with delta {}, not {}'.format(
+                        self._fname(buoy), int(saved['delta']), self.delta))
+
+                for key in saved.files:
+                    if '.' not in key:
+                        continue
+                    name, field = key.rsplit('.', 1)
+                    state['variables'].setdefault(name, {})[field] = saved[key]
+
+        with self._lock:
+            return self._loaded.setdefault(str(buoy), state)
+
+    def save(self, buoy):
+        """
+        Write the rollups of a station to disk.
+        """
+
+        state = self.load(buoy)
+
+        arrays = {'months': np.array(sorted(state['months']), dtype='U7'),
+            'delta': np.array(self.delta)}
+        for name, fields in state['variables'].items():
+            for field in FIELDS:
+                arrays['{}.{}'.format(name, field)] = fields[field]
+
+        if not os.path.isdir(self.root):
+            os.makedirs(self.root)
+
+        #write to a temp file first so readers never see half a station
+        fname = self._fname(buoy)
+        with open(fname + '.tmp', 'wb') as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(fname + '.tmp', fname)
+
+    def months(self, buoy):
+        """
+        Sorted list of the months that were added, ex: ['2015-01', ...]
+        """
+
+        return sorted(self.load(buoy)['months'])
+
+    def add(self, buoy, df, period=None, save=True):
+        """
+        Add the rows of df to the rollups of a station.
+
+        Rows of a month that was added before are skipped, so the same
+        yearly or monthly file can be added again without counting it
+        twice. The NDBC files often hold a few rows of the next or the
+        previous month. Give the period the file was fetched for and the
+        rows outside it are left for the file they belong to.
+
+        Parameters
+        ----------
+        buoy : string
+            Buoy number ex: '41013' is off wilmington, nc
+        df : pandas dataframe
+            Index is the date. Every numeric column is rolled up.
+        period : string
+            Year or month of the file, ex: '2015', 'Jan2016' or '2016-01'.
+            None keeps every row.
+        save : bool
+            Write the station to disk afterwards.
+
+        Returns
+        -------
+        rows : int
+            Number of rows that were added.
+        """
+
+        if not len(df):
+            return 0
+
+        state = self.load(buoy)
+
+        index = pd.DatetimeIndex(df.index)
+        month = index.strftime('%Y-%m')
+
+        keep = np.ones(len(index), dtype=bool)
+        if period is not None:
+            start, stop = file_span(period)
+            keep = np.asarray((index >= start) & (index < stop))
+
+        new = set(month[keep]) - state['months']
+        if not new:
+            return 0
+
+        keep &= np.asarray(month.isin(list(new)))
+        index = index[keep]
+        slots = day_slots(index)
+
+        for name in df.columns:
+
+            col = df[name]
+            if col.dtype.kind not in 'iuf':
+                continue
+
+            x = col.values[keep].astype(np.float64)
+            ok = ~np.isnan(x)
+            if not ok.any():
+                continue
+
+            fields = state['variables'].get(str(name))
+            if fields is None:
+                fields = state['variables'][str(name)] = empty(self.delta)
+
+            update(fields, slots[ok], x[ok], self.delta)
+
+        state['months'] |= new
+
+        if save:
+            self.save(buoy)
+
+        return int(keep.sum())
+
+    def ingest(self, buoy, frames):
+        """
+        Add every file of an iterable while passing it on, then save.
+        Used by write_data to roll up the files as they are written.
+
+        Parameters
+        ----------
+        frames : iterable
+            (period, df) of each file, see add.
+
+        Yields
+        ------
+        df : pandas dataframe
+            The frames of frames, unchanged.
+        """
+
+        try:
+            for period, df in frames:
+                self.add(buoy, df, period, save=False)
+                yield df
+        finally:
+            self.save(buoy)
+
+    def merge(self, buoy, other):
+        """
+        Add the rollups of buoy from another climatology, ex: one built
+        on another machine. The two must not share any months.
+        """
+
+        state = self.load(buoy)
+        theirs = other.load(buoy)
+
+        shared = state['months'] & theirs['months']
+        if shared:
+            raise ValueError('both climatologies hold {}'.format(
+                sorted(shared)))
+
+        for name, fields in theirs['variables'].items():
+
+            mine = state['variables'].get(name)
+            if mine is None:
+                mine = state['variables'][name] = empty(self.delta)
+
+            slots, x, w = _points(fields['centroids'], fields['weights'])
+            n = fields['count']
+
+            _moments(mine, n, fields['mean'], fields['m2'])
+            np.fmin(mine['min'], fields['min'], out=mine['min'])
+            np.fmax(mine['max'], fields['max'], out=mine['max'])
+            _digest(mine, slots, x, w, self.delta)
+
+        state['months'] |= theirs['months']
+
+    def stats(self, buoy, column):
+        """
+        Count, mean, standard deviation, min and max of each day of the
+        year.
+
+        Returns
+        -------
+        df : pandas dataframe
+            Index is the day of the year, 1 to 366.
+        """
+
+        fields = self._fields(buoy, column)
+        n = fields['count']
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            std = np.sqrt(fields['m2'] / (n - 1))
+
+        df = pd.DataFrame({'count': n, 'mean': fields['mean'], 'std': std,
+            'min': fields['min'], 'max': fields['max']},
+            index=pd.RangeIndex(1, DAYS + 1, name='day'))
+
+        df.loc[n == 0, ['mean', 'std']] = np.nan
+
+        return df
+
+    def bands(self, buoy, column, q=(0.05, 0.25, 0.5, 0.75, 0.95)):
+        """
+        Percentiles of each day of the year from the t-digests.
+
+        Parameters
+        ----------
+        q : list
+            Quantiles between 0 and 1.
+
+        Returns
+        -------
+        df : pandas dataframe
+            Index is the day of the year, 1 to 366, and there is a column
+            for each quantile. Days without data are NaN.
+        """
+
+        fields = self._fields(buoy, column)
+
+        return pd.DataFrame(quantiles(fields, q), columns=list(q),
+            index=pd.RangeIndex(1, DAYS + 1, name='day'))
+
+    def _fields(self, buoy, column):
+
+        fields = self.load(buoy)['variables'].get(str(column))
+        if fields is None:
+            raise KeyError('no rollups of {} for {}'.format(column, buoy))
+
+        return fields
+
+
+def file_span(period):
+    """
+    First time in a yearly or monthly file and the first time after it.
+
+    Parameters
+    ----------
+    period : string
+        ex: '2015', 'Jan2016' or '2016-01'
+
+    Returns
+    -------
+    start, stop : pd.Timestamp
+    """
+
+    period = str(period)
+
+    if len(period) == 4:
+        start = pd.Timestamp(period + '-01-01')
+        return start, start + pd.DateOffset(years=1)
+
+    if period[:3].isalpha():
+        start = pd.to_datetime(period, format='%b%Y')
+    else:
+        start = pd.Timestamp(period + '-01')
+
+    return start, start + pd.DateOffset(months=1)
+
+
+def day_slots(index):
+    """
+    Row of each time in the per day arrays, 0 to 365. February 29th has a
+    row of its own, so the later days line up in every year.
+    """
+
+    day = np.asarray(index.dayofyear) - 1
+    late = ~np.asarray(index.is_leap_year) & (day >= 59)
+
+    return day + late
+
+
+def empty(delta):
+
+    return {'count': np.zeros(DAYS, dtype=np.int64),
+        'mean': np.zeros(DAYS),
+        'm2': np.zeros(DAYS),
+        'min': np.full(DAYS, np.nan),
+        'max': np.full(DAYS, np.nan),
+        'centroids': np.zeros((DAYS, delta)),
+        'weights': np.zeros((DAYS, delta))}
+
+
+def update(fields, slots, x, delta):
+    """
+    Add values to the per day arrays of one variable.
+
+    Parameters
+    ----------
+    fields : dict
+        Arrays of the variable, see empty.
+    slots : numpy array
+        Day row of each value, see day_slots.
+    x : numpy array
+        The values, without NaNs.
+    """
+
+    n = np.bincount(slots, minlength=DAYS)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.bincount(slots, x, DAYS) / n
+    m2 = np.bincount(slots, (x - mean[slots]) ** 2, DAYS)
+
+    _moments(fields, n, np.nan_to_num(mean), m2)
+
+    np.fmin.at(fields['min'], slots, x)
+    np.fmax.at(fields['max'], slots, x)
+
+    _digest(fields, slots, x, np.ones(len(x)), delta)
+
+
+def _moments(fields, n, mean, m2):
+    """
+    Combine counts, means and sums of squared deviations, see Chan et al.
+    """
+
+    na = fields['count']
+    total = na + n
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        d = mean - fields['mean']
+        fields['mean'] = np.where(total > 0,
+            fields['mean'] + d * n / total, 0.)
+        fields['m2'] = np.where(total > 0,
+            fields['m2'] + m2 + d ** 2 * na * n / total, 0.)
+
+    fields['count'] = total
+
+
+def _points(centroids, weights):
+    """
+    Day row, mean and weight of every centroid that is in use.
+    """
+
+    slots, k = np.nonzero(weights)
+
+    return slots, centroids[slots, k], weights[slots, k]
+
+
+def _digest(fields, slots, x, w, delta):
+    """
+    Merge weighted points into the t-digest of every day at once.
+
+    The old centroids and the new points of all days are sorted together
+    by day and value. Each gets the quantile of its middle within its day,
+    and the ones that fall in the same step of the scale function
+    k = delta * (asin(2q - 1) / pi + 1/2) are merged. The steps are
+    narrow near q = 0 and q = 1, which keeps the tails sharp.
+    """
+
+    old_slots, old_x, old_w = _points(fields['centroids'], fields['weights'])
+
+    g = np.concatenate([old_slots, slots])
+    x = np.concatenate([old_x, x])
+    w = np.concatenate([old_w, w])
+
+    order = np.lexsort((x, g))
+    g, x, w = g[order], x[order], w[order]
+
+    total = np.bincount(g, w, DAYS)
+    before = np.concatenate([[0.], np.cumsum(total)[:-1]])
+    q = (np.cumsum(w) - before[g] - w / 2.) / total[g]
+
+    k = np.floor(delta * (np.arcsin(np.clip(2 * q - 1, -1, 1)) / np.pi + .5))
+    k = np.clip(k.astype(np.intp), 0, delta - 1)
+
+    flat = g * delta + k
+    weights = np.bincount(flat, w, DAYS * delta)
+    sums = np.bincount(flat, w * x, DAYS * delta)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        centroids = np.where(weights > 0, sums / weights, 0.)
+
+    fields['centroids'] = centroids.reshape(DAYS, delta)
+    fields['weights'] = weights.reshape(DAYS, delta)
+
+
+def quantiles(fields, q):
+    """
+    Quantiles of every day from its t-digest.
+
+    Each centroid stands for the values around the middle of its weight.
+    The quantiles in between are interpolated, with the min and max of
+    the day as the ends.
+
+    Returns
+    -------
+    values : numpy array
+        (366, len(q)). NaN for days without data.
+    """
+
+    q = np.asarray(q, dtype=np.float64)
+    out = np.full((DAYS, len(q)), np.nan)
+
+    weights = fields['weights']
+    centroids = fields['centroids']
+
+    for day in np.flatnonzero(weights.sum(axis=1)):
+
+        used = weights[day] > 0
+        w = weights[day, used]
+        total = w.sum()
+
+        #position of each centroid among the sorted values, counted
+        #from 0 like pandas' linear quantiles, so days with few values
+        #(every centroid a single value) come out exact
+        ranks = np.concatenate([[0.], np.cumsum(w) - w / 2. - .5,
+            [total - 1]])
+        values = np.concatenate([[fields['min'][day]], centroids[day, used],
+            [fields['max'][day]]])
+
+        out[day] = np.interp(q * (total - 1), ranks, values)
+
+    return out
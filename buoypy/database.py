@@ -0,0 +1,221 @@
+"""
+SQLite storage for station histories.
+
+Each buoy gets its own table keyed by the time in seconds since 1970:
+
+CREATE TABLE "41013_buoy" (time INTEGER PRIMARY KEY, WDIR REAL, ...)
+
+The integer primary key is the table's b-tree key, so writes of a time
+that is already stored update that row in place and time ranges are
+answered from the key without scanning the table.
+
+Example:
+import buoypy as bp
+
+db = bp.database('buoydata.db')
+db.write(41013, df)
+db.read(41013, year_range=(2000, 2009), columns=['WVHT'])
+"""
+
+import sqlite3
+import datetime
+
+import numpy as np
+import pandas as pd
+
+
+#ON CONFLICT ... DO UPDATE came with sqlite 3.24
+UPSERT = sqlite3.sqlite_version_info >= (3, 24, 0)
+
+
+class database:
+    """
+    One table per buoy in a SQLite file.
+
+    Parameters
+    ----------
+    path : string
+        SQLite database file.
+    """
+
+    def __init__(self, path='buoydata.db'):
+
+        self.path = path
+
+    def connect(self):
+
+        return sqlite3.connect(self.path)
+
+    def table(self, buoy):
+
+        return '"{}_buoy"'.format(buoy)
+
+    def columns(self, conn, buoy):
+        """
+        Columns of the buoy table other than time. Empty if there is no
+        table.
+        """
+
+        info = conn.execute('PRAGMA table_info({})'.format(
+            self.table(buoy))).fetchall()
+
+        names = [row[1] for row in info]
+        if names and 'time' not in names:
+            raise ValueError('{} was written by an older buoypy and has '
+                'no time key. Write it to a new database.'.format(
+                self.table(buoy)))
+
+        return [n for n in names if n != 'time']
+
+    def _prepare(self, conn, buoy, df):
+        """
+        Make the table if needed and add any columns it is missing.
+        """
+
+        have = self.columns(conn, buoy)
+
+        if not have:
+            cols = ''.join(', "{}" {}'.format(c, _sql_type(df[c]))
+                for c in df.columns)
+            conn.execute('CREATE TABLE {} (time INTEGER PRIMARY KEY{})'.format(
+                self.table(buoy), cols))
+            return
+
+        for c in df.columns:
+            if c not in have:
+                conn.execute('ALTER TABLE {} ADD COLUMN "{}" {}'.format(
+                    self.table(buoy), c, _sql_type(df[c])))
+
+    def write(self, buoy, frames):
+        """
+        Insert or update rows in one transaction. The cost grows with the
+        number of new rows, not with the size of the table.
+
+        Parameters
+        ----------
+        buoy : string
+            Buoy number ex: '41013' is off wilmington, nc
+        frames : pandas dataframe or list of them
+            Index is the date. Rows for a time that is already stored
+            replace the stored values.
+        """
+
+        if isinstance(frames, pd.DataFrame):
+            frames = [frames]
+
+        conn = self.connect()
+        try:
+            with conn:
+                for df in frames:
+                    if len(df):
+                        self._write(conn, buoy, df)
+        finally:
+            conn.close()
+
+    def _write(self, conn, buoy, df):
+
+        self._prepare(conn, buoy, df)
+
+        cols = ['"{}"'.format(c) for c in df.columns]
+        marks = ', '.join(['?'] * (len(cols) + 1))
+
+        if UPSERT:
+            update = ', '.join('{0}=excluded.{0}'.format(c) for c in cols)
+            sql = 'INSERT INTO {} (time, {}) VALUES ({}) ' \
+                'ON CONFLICT(time) DO UPDATE SET {}'.format(
+                self.table(buoy), ', '.join(cols), marks, update)
+        else:
+            sql = 'INSERT OR REPLACE INTO {} (time, {}) VALUES ({})'.format(
+                self.table(buoy), ', '.join(cols), marks)
+
+        #sqlite wants python objects, with None for missing values
+        values = df.astype(object).where(df.notna(), None)
+        values.insert(0, 'time', _epoch(df.index).tolist())
+
+        conn.executemany(sql, values.itertuples(index=False, name=None))
+
+    def read(self, buoy, year_range=None, start=None, end=None, columns=None):
+        """
+        Read rows back. The time filters are answered by SQLite from the
+        table key.
+
+        Parameters
+        ----------
+        buoy : string
+            Buoy number ex: '41013' is off wilmington, nc
+        year_range : tuple
+            (start, stop) inclusive.
+        start, end : datetime
+            Only rows with start <= time < end.
+        columns : list
+            Variables to read. None reads all of them.
+
+        Returns
+        -------
+        df : pandas dataframe
+            Index is the date.
+        """
+
+        if year_range:
+            first, last = year_range
+            start = _later(start, datetime.datetime(first, 1, 1))
+            end = _earlier(end, datetime.datetime(last + 1, 1, 1))
+
+        where = []
+        params = []
+        if start is not None:
+            where.append('time >= ?')
+            params.append(int(_epoch([start])[0]))
+        if end is not None:
+            where.append('time < ?')
+            params.append(int(_epoch([end])[0]))
+
+        cols = '*' if columns is None else \
+            ', '.join(['time'] + ['"{}"'.format(c) for c in columns])
+
+        sql = 'SELECT {} FROM {}'.format(cols, self.table(buoy))
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY time'
+
+        conn = self.connect()
+        try:
+            df = pd.read_sql_query(sql, conn, params=params)
+            info = conn.execute('PRAGMA table_info({})'.format(
+                self.table(buoy))).fetchall()
+        finally:
+            conn.close()
+
+        #columns that are all NULL come back as objects
+        real = [row[1] for row in info if row[2] == 'REAL' and row[1] in df]
+        df[real] = df[real].astype(float)
+
+        df.index = pd.to_datetime(df.pop('time').values, unit='s')
+        df.index.name = 'date'
+
+        return df
+
+
+def _sql_type(col):
+
+    return 'REAL' if col.dtype.kind in 'iuf' else 'TEXT'
+
+
+def _epoch(times):
+    """
+    Seconds since 1970 for each time.
+    """
+
+    times = pd.DatetimeIndex(times).values.astype('datetime64[s]')
+
+    return times.view(np.int64)
+
+
+def _later(a, b):
+
+    return b if a is None else max(pd.Timestamp(a), pd.Timestamp(b))
+
+
+def _earlier(a, b):
+
+    return b if a is None else min(pd.Timestamp(a), pd.Timestamp(b))
@@ -56,10 +56,13 @@ column headings.
 
 import pandas as pd
 import numpy as np
-import urllib2
 from sqlalchemy import create_engine # database connection
 import datetime
 
+from .index import availability, file_link, ndbc, resolve_months
+from .parse import read_ndbc, read_spectral
+from .buoypy import historic_data, merge_months
+
 class formatter:
 	"""
 	Correctly formats the data contained in the link into a 
@@ -74,59 +77,9 @@ class formatter:
 		Format the standard Meteorological data.
 		"""
 
-		df = pd.read_csv(self.link,delim_whitespace=True,
-			na_values=[99,999,9999,99.,999.,9999.])
-
-		#2007 and on format
-		if df.iloc[0,0] =='#yr':
-
-
-			df = df.rename(columns={'#YY': 'YY'}) #get rid of hash
-
-			#make the indices
-			date_str = df.YY + ' ' + df.MM+ ' ' + df.DD + ' ' + df.hh + ' ' + df.mm
-			df.drop(0,inplace=True) #first row is units, so drop them
-			ind = pd.to_datetime(date_str.drop(0),format="%Y %m %d %H %M")
-
-			df.index = ind
-
-			#drop useless columns and rename the ones we want
-			df.drop(['YY','MM','DD','hh','mm'],axis=1,inplace=True)
-			df.columns = ['WDIR', 'WSPD', 'GST', 'WVHT', 'DPD', 'APD', 'MWD', 'PRES',
-				'ATMP', 'WTMP', 'DEWP', 'VIS', 'TIDE']
-
-
-		#before 2006 to 2000
-		else:
-			date_str = df.YYYY.astype('str') + ' ' + df.MM.astype('str') + \
-				' ' + df.DD.astype('str') + ' ' + df.hh.astype('str')
-
-			ind = pd.to_datetime(date_str,format="%Y %m %d %H")
-
-			df.index = ind
-
-			#drop useless columns and rename the ones we want
-			#######################
-			'''FIX MEEEEE!!!!!!!
-			Get rid of the try except
-			some have minute column'''
-
-			#this is hacky and bad
-			try:
-				df.drop(['YYYY','MM','DD','hh','mm'],axis=1,inplace=True)
-				df.columns = ['WDIR', 'WSPD', 'GST', 'WVHT', 'DPD', 'APD', 'MWD', 'PRES',
-				'ATMP', 'WTMP', 'DEWP', 'VIS', 'TIDE']
-
-			except:
-				df.drop(['YYYY','MM','DD','hh'],axis=1,inplace=True)
-				df.columns = ['WDIR', 'WSPD', 'GST', 'WVHT', 'DPD', 'APD', 'MWD', 'PRES',
-				'ATMP', 'WTMP', 'DEWP', 'VIS', 'TIDE']
-
-
-		# all data should be floats
-		df = df.astype('float')
-		nvals = [99,999,9999,99.0,999.0,9999.0]
-		df.replace(nvals,np.nan,inplace=True)
+		#read_ndbc looks the format up from the header, which gives the
+		#missing data values of each column and renames WD and BAR
+		df = read_ndbc(self.link)
 
 		return df
 
@@ -163,25 +116,12 @@ class realtime:
 		"""
 
 		params = 'data_spec'
-		base = 'http://www.ndbc.noaa.gov/data/realtime2/'
+		base = ndbc('data/realtime2/')
 		link = base + str(self.buoy) + '.' + params
 
-		#combine the first five date columns YY MM DD hh mm and make index
-		df = pd.read_csv(link,delim_whitespace=True,skiprows=1,header=None,
-			parse_dates=[[0,1,2,3,4]], index_col=0)
-
-
-		#convert the dates to datetimes
-		df.index = pd.to_datetime(df.index,format="%Y %m %d %H %M")
-
-		specs = df.iloc[:,1::2]
-		freqs = df.iloc[0,2::2]
-
-		specs.columns=freqs
-
-		#remove the parenthesis from the column index
-		specs.columns = [cname.replace('(','').replace(')','') 
-			for cname in specs.columns]
+		#read_spectral takes the frequencies out of the rows and drops
+		#the separation frequency
+		specs = read_spectral(link)
 
 		return specs
 
@@ -210,24 +150,12 @@ class realtime:
 		"""
 
 		params = 'ocean'
-		base = 'http://www.ndbc.noaa.gov/data/realtime2/'
+		base = ndbc('data/realtime2/')
 		link = base + str(self.buoy) + '.' + params
 
-		#combine the first five date columns YY MM DD hh mm and make index
-		df = pd.read_csv(link, delim_whitespace=True, na_values='MM', 
-			parse_dates=[[0,1,2,3,4]], index_col=0)
+		#units are in the second row, read_ndbc drops them
+		df = read_ndbc(link, na_values=['MM'])
 
-		#units are in the second row drop them
-		df.drop(df.index[0], inplace=True)
-
-		#convert the dates to datetimes
-		df.index = pd.to_datetime(df.index,format="%Y %m %d %H %M")
-
-		#convert to floats
-		cols = ['DEPTH','OTMP','COND','SAL']
-		df[cols] = df[cols].astype(float)
-
-		
 		return df
 
 
@@ -249,43 +177,18 @@ class realtime:
 			data frame containing the spectral data. index is the date
 			and the columns are:
 
-			HO, SwH, SwP, WWH, WWP, SwD, WWD, STEEPNESS, AVP, MWD
-
-			OR
-
 			WVHT  SwH  SwP  WWH  WWP SwD WWD  STEEPNESS  APD MWD
 
-
+			Files that still use H0 and AVP come out with WVHT and APD.
 		"""
 
 		params = 'spec'
-		base = 'http://www.ndbc.noaa.gov/data/realtime2/'
+		base = ndbc('data/realtime2/')
 		link = base + str(self.buoy) + '.' + params
 
-		#combine the first five date columns YY MM DD hh mm and make index
-		df = pd.read_csv(link, delim_whitespace=True, na_values='MM', 
-		parse_dates=[[0,1,2,3,4]], index_col=0)
-
-		try:
-			#units are in the second row drop them
-			#df.columns = df.columns + '('+ df.iloc[0] + ')'
-			df.drop(df.index[0], inplace=True)
-
-			#convert the dates to datetimes
-			df.index = pd.to_datetime(df.index,format="%Y %m %d %H %M")
-
-			#convert to floats
-			cols = ['WVHT','SwH','SwP','WWH','WWP','APD','MWD']
-			df[cols] = df[cols].astype(float)
-		except:
-
-			#convert the dates to datetimes
-			df.index = pd.to_datetime(df.index,format="%Y %m %d %H %M")
-
-			#convert to floats
-			cols = ['H0','SwH','SwP','WWH','WWP','AVP','MWD']
-			df[cols] = df[cols].astype(float)
-			
+		#read_ndbc looks the format up from the header, so files that still
+		#use H0 and AVP come out with WVHT and APD
+		df = read_ndbc(link, na_values=['MM'])
 
 		return df
 
@@ -309,22 +212,11 @@ class realtime:
 
 		"""
 		params = 'supl'
-		base = 'http://www.ndbc.noaa.gov/data/realtime2/'
+		base = ndbc('data/realtime2/')
 		link = base + str(self.buoy) + '.' + params
 
-		#combine the first five date columns YY MM DD hh mm and make index
-		df = pd.read_csv(link, delim_whitespace=True, na_values='MM',
-			parse_dates=[[0,1,2,3,4]], index_col=0)
-
-		#units are in the second row drop them
-		df.drop(df.index[0], inplace=True)
-
-		#convert the dates to datetimes
-		df.index = pd.to_datetime(df.index,format="%Y %m %d %H %M")
-
-		#convert to floats
-		cols = ['PRES','PTIME','WSPD','WDIR','WTIME']
-		df[cols] = df[cols].astype(float)
+		#units are in the second row, read_ndbc drops them
+		df = read_ndbc(link, na_values=['MM'])
 
 		return df
 
@@ -343,24 +235,12 @@ class realtime:
 
 
 		params = 'swdir'
-		base = 'http://www.ndbc.noaa.gov/data/realtime2/'
+		base = ndbc('data/realtime2/')
 		link = base + str(self.buoy) + '.' + params
 
-		#combine the first five date columns YY MM DD hh mm and make index
-		df = pd.read_csv(link,delim_whitespace=True,skiprows=1,na_values=999,
-			header=None, parse_dates=[[0,1,2,3,4]], index_col=0)
-
-		#convert the dates to datetimes
-		df.index = pd.to_datetime(df.index,format="%Y %m %d %H %M")
-
-		specs = df.iloc[:,0::2]
-		freqs = df.iloc[0,1::2]
-
-		specs.columns=freqs
-
-		#remove the parenthesis from the column index
-		specs.columns = [cname.replace('(','').replace(')','') 
-			for cname in specs.columns]
+		#read_spectral takes the frequencies out of the rows and drops
+		#the separation frequency
+		specs = read_spectral(link, na_values=[999])
 
 		return specs
 
@@ -376,24 +256,12 @@ class realtime:
 			the table indicate how much energy is at each spectrum.
 		"""
 		params = 'swdir2'
-		base = 'http://www.ndbc.noaa.gov/data/realtime2/'
+		base = ndbc('data/realtime2/')
 		link = base + str(self.buoy) + '.' + params
 
-		#combine the first five date columns YY MM DD hh mm and make index
-		df = pd.read_csv(link,delim_whitespace=True,skiprows=1,
-			header=None, parse_dates=[[0,1,2,3,4]], index_col=0)
-
-		#convert the dates to datetimes
-		df.index = pd.to_datetime(df.index,format="%Y %m %d %H %M")
-
-		specs = df.iloc[:,0::2]
-		freqs = df.iloc[0,1::2]
-
-		specs.columns=freqs
-
-		#remove the parenthesis from the column index
-		specs.columns = [cname.replace('(','').replace(')','') 
-			for cname in specs.columns]
+		#read_spectral takes the frequencies out of the rows and drops
+		#the separation frequency
+		specs = read_spectral(link)
 
 		return specs
 
@@ -411,24 +279,12 @@ class realtime:
 
 
 		params = 'swr1'
-		base = 'http://www.ndbc.noaa.gov/data/realtime2/'
+		base = ndbc('data/realtime2/')
 		link = base + str(self.buoy) + '.' + params
 
-		#combine the first five date columns YY MM DD hh mm and make index
-		df = pd.read_csv(link,delim_whitespace=True,skiprows=1,
-			header=None, parse_dates=[[0,1,2,3,4]], index_col=0)
-
-		#convert the dates to datetimes
-		df.index = pd.to_datetime(df.index,format="%Y %m %d %H %M")
-
-		specs = df.iloc[:,0::2]
-		freqs = df.iloc[0,1::2]
-
-		specs.columns=freqs
-
-		#remove the parenthesis from the column index
-		specs.columns = [cname.replace('(','').replace(')','') 
-			for cname in specs.columns]
+		#read_spectral takes the frequencies out of the rows and drops
+		#the separation frequency
+		specs = read_spectral(link)
 
 		return specs
 
@@ -445,76 +301,39 @@ class realtime:
 		"""
 
 		params = 'swr2'
-		base = 'http://www.ndbc.noaa.gov/data/realtime2/'
+		base = ndbc('data/realtime2/')
 		link = base + str(self.buoy) + '.' + params
 
-		#combine the first five date columns YY MM DD hh mm and make index
-		df = pd.read_csv(link,delim_whitespace=True,skiprows=1,
-			header=None, parse_dates=[[0,1,2,3,4]], index_col=0)
-
-		#convert the dates to datetimes
-		df.index = pd.to_datetime(df.index,format="%Y %m %d %H %M")
-
-		specs = df.iloc[:,0::2]
-		freqs = df.iloc[0,1::2]
-
-		specs.columns=freqs
-
-		#remove the parenthesis from the column index
-		specs.columns = [cname.replace('(','').replace(')','') 
-			for cname in specs.columns]
+		#read_spectral takes the frequencies out of the rows and drops
+		#the separation frequency
+		specs = read_spectral(link)
 
 		return specs
 
 	def get_txt(self):
 		"""
-		Retrieve standard Meteorological data. NDBC seems to be updating
-		the data with different column names, so this metric can return 
-		two possible data frames with different column names:
+		Retrieve standard Meteorological data. NDBC has used different
+		column names over the years, the old ones are renamed to the
+		current ones.
 
 		Returns
 		-------
 
 		df : pandas dataframe
-			Index is the date and the columns can be:
+			Index is the date and the columns are:
 
 			['WDIR','WSPD','GST','WVHT','DPD','APD','MWD',
 			'PRES','ATMP','WTMP','DEWP','VIS','PTDY','TIDE']
 
-			or
-
-			['WD','WSPD','GST','WVHT','DPD','APD','MWD','BARO',
-			'ATMP','WTMP','DEWP','VIS','PTDY','TIDE']
-
 		"""
 
 		params = 'txt'
-		base = 'http://www.ndbc.noaa.gov/data/realtime2/'
+		base = ndbc('data/realtime2/')
 		link = base + str(self.buoy) + '.' + params
 
-		#combine the first five date columns YY MM DD hh mm and make index
-		df = pd.read_csv(link, delim_whitespace=True, na_values='MM', 
-			parse_dates=[[0,1,2,3,4]], index_col=0)
-
-		try:
-			#first column is units, so drop it
-			df.drop(df.index[0], inplace=True)
-			#convert the dates to datetimes
-			df.index = pd.to_datetime(df.index,format="%Y %m %d %H %M")
-
-			#convert to floats
-			cols = ['WDIR','WSPD','GST','WVHT','DPD','APD','MWD',
-			'PRES','ATMP','WTMP','DEWP','VIS','PTDY','TIDE']
-			df[cols] = df[cols].astype(float)
-		except:
-
-			#convert the dates to datetimes
-			df.index = pd.to_datetime(df.index,format="%Y %m %d %H %M")
-
-			#convert to floats
-			cols = ['WD','WSPD','GST','WVHT','DPD','APD','MWD','BARO',
-			'ATMP','WTMP','DEWP','VIS','PTDY','TIDE']
-			df[cols] = df[cols].astype(float)
+		#read_ndbc looks the format up from the header, so files that still
+		#use WD and BARO come out with WDIR and PRES
+		df = read_ndbc(link, na_values=['MM'])
 		return df
 
 ################################################
@@ -530,61 +349,80 @@ class get_months(formatter):
 		self.buoy = buoy
 		self.year = year
 
-	def get_stand_meteo(self):
-		#see what is on the NDBC so we only pull the years that are available
-		links = []
-
-		#need to also retrieve jan, feb, march, etc.
-		month = ['Jan','Feb','Mar','Apr','May','Jun',
-				'Jul','Aug','Sep','Oct','Nov','Dec']
-		k = [1,2,3,4,5,6,7,8,9,'a','b','c'] #for the links
-
-		#NDBC sometimes lags the new months in january and feb
-		#Might need to define a year on init
-		if not self.year:
-			self.year = str(datetime.date.today().year)
-
-			if datetime.date.month <= 2:
-				print "using" + self.year + "to get the months. Might be wrong!"
-
-		#for contstructing links
-		base = 'http://www.ndbc.noaa.gov/view_text_file.php?filename='
-		base2 = 'http://www.ndbc.noaa.gov/data/stdmet/'
-		mid = '.txt.gz&dir=data/stdmet/'
-
-		for ii in range(len(month)):
-			
-			#links can come in 2 formats
-			link = base + str(self.buoy) + str(k[ii]) + self.year + mid + str(month[ii]) +'/'
-			link2 = base2 + month[ii] + '/' + str(self.buoy) + '.txt'
-			
-			try:
-				urllib2.urlopen(link)
-				links.append(link)
-
-			except:
-				print(str(month[ii]) + '2015' + ' not in records')
-				print link
-
-			#need to try the second link
-			try: 
-				urllib2.urlopen(link2)
-				links.append(link2)
-				print(link2 + 'was found in records')
-			except:
-				pass
-
-
-		# start grabbing some data
-		df=pd.DataFrame() 
-
-		for L in links:
-			self.link=L
-			new_df = self.format_stand_meteo()
-			print 'Link : ' + L
-			df = df.append(new_df)
+	def plan_stand_meteo(self, index=None, year_range=None):
+		"""
+		Labels and links of the monthly files to download. Only the months
+		that the availability index lists are included. Without a year,
+		these are the months that are not in a yearly file yet, and a month
+		the NDBC may not have zipped yet gets a tuple of links, see
+		buoypy.historic_data.get_stand_meteo.
 
-		return df
+		Parameters
+		----------
+		index : availability
+			Index of the files on the NDBC. Defaults to the one in ~/.buoypy
+		year_range : tuple
+			(start, stop) inclusive. Without a year, months of other
+			years are skipped.
+		"""
+
+		if index is None:
+			index = availability()
+
+		if self.year:
+			months = [(month, file_link(fname, 'data/stdmet/' + month + '/'))
+				for month, fname in index.months(self.buoy, year=self.year).items()]
+		else:
+			#NDBC lags the yearly files, so in the first months of a year
+			#last year's months are still monthly files too
+			months = [(name, links[0] if len(links) == 1 else links)
+				for name, links in resolve_months(self.buoy, index)]
+
+			#the labels end in the year, ex: 'Jan2016'
+			if year_range:
+				start, stop = year_range
+				months = [(month, link) for month, link in months
+					if start <= int(month[3:]) <= stop]
+
+		return [month for month, _ in months], [link for _, link in months]
+
+	def iter_stand_meteo(self, index=None, year_range=None, workers=1,
+			scheduler=None):
+		"""
+		Yield the monthly standard meteorological data one month at a time.
+		The months are fetched like buoypy.historic_data.iter_stand_meteo
+		does, workers at a time with retries.
+
+		Parameters
+		----------
+		index, year_range
+			See plan_stand_meteo.
+		workers : int
+			Number of months to download and parse at the same time.
+		scheduler : scheduler
+			See buoypy.historic_data.iter_stand_meteo.
+		"""
+
+		plan = self.plan_stand_meteo(index, year_range)
+		H = historic_data(self.buoy, self.year)
+
+		for month, df in H._iter_named(workers, index, scheduler, plan):
+			yield df
+
+	def get_stand_meteo(self, index=None, workers=1, scheduler=None):
+		"""
+		Get all the monthly standard meteorological data in one data frame,
+		oldest first. A time that is in more than one month is kept once.
+		See iter_stand_meteo.
+		"""
+
+		dfs = list(self.iter_stand_meteo(index, workers=workers,
+			scheduler=scheduler))
+
+		if not dfs:
+			return pd.DataFrame()
+
+		return merge_months(dfs)
 
 ################################################
 ################################################
@@ -623,62 +461,11 @@ class get_historic(formatter):
 
 
 		if not link:
-			base = 'http://www.ndbc.noaa.gov/view_text_file.php?filename='
-			link = base + str(self.buoy) + 'h' + str(self.year) + '.txt.gz&dir=data/historical/stdmet/'
-
-		#combine the first five date columns YY MM DD hh and make index
-		df = pd.read_csv(link,delim_whitespace=True,na_values=[99,999,9999,99.,999.,9999.])
+			fname = str(self.buoy) + 'h' + str(self.year) + '.txt.gz'
+			link = file_link(fname, 'data/historical/stdmet/')
 
-		#2007 and on format
-		if df.iloc[0,0] =='#yr':
-
-
-			df = df.rename(columns={'#YY': 'YY'}) #get rid of hash
-
-			#make the indices
-			date_str = df.YY + ' ' + df.MM+ ' ' + df.DD + ' ' + df.hh + ' ' + df.mm
-			df.drop(0,inplace=True) #first row is units, so drop them
-			ind = pd.to_datetime(date_str.drop(0),format="%Y %m %d %H %M")
-
-			df.index = ind
-
-			#drop useless columns and rename the ones we want
-			df.drop(['YY','MM','DD','hh','mm'],axis=1,inplace=True)
-			df.columns = ['WDIR', 'WSPD', 'GST', 'WVHT', 'DPD', 'APD', 'MWD', 'PRES',
-				'ATMP', 'WTMP', 'DEWP', 'VIS', 'TIDE']
-
-
-		#before 2006 to 2000
-		else:
-			date_str = df.YYYY.astype('str') + ' ' + df.MM.astype('str') + \
-				' ' + df.DD.astype('str') + ' ' + df.hh.astype('str')
-
-			ind = pd.to_datetime(date_str,format="%Y %m %d %H")
-
-			df.index = ind
-
-			#drop useless columns and rename the ones we want
-			#######################
-			'''FIX MEEEEE!!!!!!!
-			Get rid of the try except
-			some have minute column'''
-
-			#this is hacky and bad
-			try:
-				df.drop(['YYYY','MM','DD','hh','mm'],axis=1,inplace=True)
-				df.columns = ['WDIR', 'WSPD', 'GST', 'WVHT', 'DPD', 'APD', 'MWD', 'PRES',
-				'ATMP', 'WTMP', 'DEWP', 'VIS', 'TIDE']
-
-			except:
-				df.drop(['YYYY','MM','DD','hh'],axis=1,inplace=True)
-				df.columns = ['WDIR', 'WSPD', 'GST', 'WVHT', 'DPD', 'APD', 'MWD', 'PRES',
-				'ATMP', 'WTMP', 'DEWP', 'VIS', 'TIDE']
-
-
-		# all data should be floats
-		df = df.astype('float')
-		nvals = [99,999,9999,99.0,999.0,9999.0]
-		df.replace(nvals,np.nan,inplace=True)
+		#read_ndbc looks the format up from the header and unzips .gz files
+		df = read_ndbc(link)
 
 		return df
 
@@ -688,82 +475,43 @@ class get_historic(formatter):
 
 class makecall(get_historic,get_months):
 
-	def __init__(self,year_range):
+	def __init__(self, buoy, year_range):
+		self.buoy = buoy
+		self.year = None
 		self.year_range = year_range
 
 
-	def get_all_stand_meteo(self):
+	def iter_all_stand_meteo(self, index=None, workers=1, scheduler=None):
 		"""
-		Retrieves all the standard meterological data. Calls get_stand_meteo.
-		It also checks to make sure that the years that were requested are
-		available. Data is not available for the same years at all the buoys.
-
-		Returns
-		-------
-		df : pandas dataframe
-			Contains all the data from all the years that were specified
-			in year_range.
+		Yield the standard meterological data one year or month at a time.
+		Only the years and months that the availability index lists for
+		this buoy are downloaded. Data is not available for the same years at
+		all the buoys. The files are the ones of
+		buoypy.historic_data.plan_stand_meteo and are fetched the same way.
 		"""
 
-		start_yr,stop_yr = self.year_range
-
-		#see what is on the NDBC so we only pull the years that are available
-		links = []
-		for ii in range(start,stop+1):
-
-			base = 'http://www.ndbc.noaa.gov/view_text_file.php?filename='
-			end = '.txt.gz&dir=data/historical/stdmet/'
-			link = base + str(self.buoy) + 'h' + str(ii) + end
-
-			try:
-				urllib2.urlopen(link)
-				links.append(link)
-
-			except:
-				print(str(ii) + ' not in records')
-
-		#need to also retrieve jan, feb, march, etc.
-		month = ['Jan','Feb','Mar','Apr','May','Jun',
-			'Jul','Aug','Sep','Oct','Nov','Dec']
-		k = [1,2,3,4,5,6,7,8,9,'a','b','c'] #for the links
-
-		for ii in range(len(month)):
-			mid = '.txt.gz&dir=data/stdmet/'
-			link = base + str(self.buoy) + str(k[ii]) + '2015' + mid + str(month[ii]) +'/'
-
-			try:
-				urllib2.urlopen(link)
-				links.append(link)
-
-			except:
-				print(str(month[ii]) + '2015' + ' not in records')
-				print link
-
-
-		# start grabbing some data
-		df=pd.DataFrame() #initialize empty df
-
-		for L in links:
-
-			new_df = self.get_stand_meteo(link=L)
-			print 'Link : ' + L
-			df = df.append(new_df)
-
-		return df
-
-
-
-
-
-
-
-
-
+		H = historic_data(self.buoy, None, self.year_range)
 
+		for name, df in H._iter_named(workers, index, scheduler):
+			yield df
 
 
+	def get_all_stand_meteo(self, index=None, workers=1, scheduler=None):
+		"""
+		Retrieves all the standard meterological data. See
+		iter_all_stand_meteo.
 
+		Returns
+		-------
+		df : pandas dataframe
+			Contains all the data from all the years that were specified
+			in year_range, oldest first. Rows of a month that are also in a
+			yearly file are kept once.
+		"""
 
+		dfs = list(self.iter_all_stand_meteo(index, workers, scheduler))
 
+		if not dfs:
+			return pd.DataFrame()
 
-#
\ No newline at end of file
+		return merge_months(dfs)
@@ -0,0 +1,354 @@
+"""
+Local index of the files that are on the NDBC.
+
+The NDBC does not say which years and months a buoy has data for. The
+only way to find out is to look at the directory listings:
+
+http://www.ndbc.noaa.gov/data/historical/stdmet/
+http://www.ndbc.noaa.gov/data/stdmet/Jan/
+
+The index reads these listings once, maps station, product, year and
+month to a file name and keeps the result on disk. It is refreshed when
+it is older than ttl seconds. The bulk fetchers use it to plan exactly
+which files to download.
+
+Example:
+import buoypy as bp
+
+idx = bp.availability()
+idx.years(41013)  #[1988, 1989, ...]
+idx.months(41013) #{'Jan': '4101312016.txt.gz', ...}
+"""
+
+import os
+import re
+import json
+import time
+import datetime
+
+try:
+    from urllib.request import urlopen
+    from urllib.parse import urlsplit
+except ImportError:
+    from urllib2 import urlopen
+    from urlparse import urlsplit
+
+
+#set BUOYPY_NDBC to point buoypy at a mirror or a local stand in server
+NDBC = os.environ.get('BUOYPY_NDBC', 'http://www.ndbc.noaa.gov/')
+
+MONTHS = ['Jan','Feb','Mar','Apr','May','Jun',
+    'Jul','Aug','Sep','Oct','Nov','Dec']
+
+#the monthly files use one character for the month
+MONTH_CODES = ['1','2','3','4','5','6','7','8','9','a','b','c']
+
+
+class availability:
+    """
+    Which years and months are on the NDBC for each station.
+
+    Parameters
+    ----------
+    path : string
+        File the index is kept in. Defaults to ~/.buoypy/availability.json
+    ttl : float
+        Number of seconds before the listings are downloaded again.
+    """
+
+    def __init__(self, path=None, ttl=24*3600):
+
+        if path is None:
+            path = os.path.join(os.path.expanduser('~'), '.buoypy',
+                'availability.json')
+
+        self.path = path
+        self.ttl = ttl
+        self.files = {}
+        self.updated = {}
+
+        self.load()
+
+    def load(self):
+        """
+        Read the index from disk. A missing or broken file gives an empty
+        index.
+        """
+
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+        except (IOError, ValueError):
+            return
+
+        self.files = saved.get('files', {})
+        self.updated = saved.get('updated', {})
+
+    def save(self):
+        """
+        Write the index to disk.
+        """
+
+        folder = os.path.dirname(self.path)
+        if folder and not os.path.isdir(folder):
+            os.makedirs(folder)
+
+        #write to a temp file first so readers never see half an index
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'files': self.files, 'updated': self.updated}, f)
+
+        os.replace(tmp, self.path)
+
+    def stale(self, product='stdmet'):
+        """
+        True when the listings for product are older than the ttl.
+        """
+
+        updated = self.updated.get(product)
+
+        return updated is None or time.time() - updated > self.ttl
+
+    def refresh(self, product='stdmet'):
+        """
+        Download the directory listings for product and rebuild its part
+        of the index.
+
+        Parameters
+        ----------
+        product : string
+            NDBC data set, ex: 'stdmet'
+        """
+
+        stations = {}
+
+        link = ndbc('data/historical/{}/'.format(product))
+        for station, year in re.findall(r'href="([0-9a-z]+)h(\d{4})\.txt\.gz"',
+                _listing(link)):
+
+            entry = stations.setdefault(station, {'years': {}, 'months': {}})
+            entry['years'][year] = '{}h{}.txt.gz'.format(station, year)
+
+        this_year = str(datetime.date.today().year)
+
+        for mon, k in zip(MONTHS, MONTH_CODES):
+
+            link = ndbc('data/{}/{}/'.format(product, mon))
+            try:
+                page = _listing(link)
+            except IOError:
+                #months that have not happened yet have no folder
+                continue
+
+            #ex: 4101312016.txt.gz is January 2016 for 41013
+            pattern = r'href="([0-9a-z]+){}(\d{{4}})\.txt\.gz"'.format(k)
+            found = re.findall(pattern, page)
+
+            #some folders only have 41013.txt, which is this year
+            if not found:
+                found = [(name, this_year) for name in
+                    re.findall(r'href="([0-9a-z]+)\.txt"', page)]
+                fname = '{}.txt'
+            else:
+                fname = '{}' + k + '{}.txt.gz'
+
+            for station, year in found:
+
+                entry = stations.setdefault(station,
+                    {'years': {}, 'months': {}})
+                entry['months'].setdefault(year, {})[mon] = \
+                    fname.format(station, year)
+
+        self.files[product] = stations
+        self.updated[product] = time.time()
+        self.save()
+
+    def station(self, buoy, product='stdmet'):
+        """
+        All the files for one station. Refreshes the index first if it is
+        stale.
+
+        Returns
+        -------
+        entry : dict
+            {'years': {year: file}, 'months': {year: {month: file}}}
+        """
+
+        if self.stale(product):
+            self.refresh(product)
+
+        stations = self.files.get(product, {})
+
+        return stations.get(str(buoy).lower(), {'years': {}, 'months': {}})
+
+    def years(self, buoy, product='stdmet', year_range=None):
+        """
+        Sorted list of the years that have a yearly file.
+
+        Parameters
+        ----------
+        buoy : string
+            Buoy number ex: '41013' is off wilmington, nc
+        year_range : tuple
+            (start, stop) inclusive. Years outside it are left out.
+        """
+
+        years = sorted(int(y) for y in self.station(buoy, product)['years'])
+
+        if year_range:
+            start, stop = year_range
+            years = [y for y in years if start <= y <= stop]
+
+        return years
+
+    def months(self, buoy, product='stdmet', year=None):
+        """
+        Monthly files for a year, in calendar order. Before a year is
+        complete the NDBC keeps the data in these files.
+
+        Parameters
+        ----------
+        year : int
+            Defaults to the latest year that has monthly files.
+
+        Returns
+        -------
+        months : dict
+            month name -> file name
+        """
+
+        monthly = self.station(buoy, product)['months']
+        if not monthly:
+            return {}
+
+        if year is None:
+            year = max(monthly)
+
+        found = monthly.get(str(year), {})
+
+        return dict((mon, found[mon]) for mon in MONTHS if mon in found)
+
+
+def resolve_months(buoy, index=None, today=None, product='stdmet'):
+    """
+    Monthly files that hold data that is not in a yearly file yet.
+
+    The NDBC keeps the months of the current year in data/stdmet/<Mon>/
+    and moves them into one yearly file some time in the next year. Until
+    that file is out, the months of last year are still only in the
+    monthly folders. Months of a year that has a yearly file are left
+    out.
+
+    Parameters
+    ----------
+    buoy : string
+        Buoy number ex: '41013' is off wilmington, nc
+    index : availability or False
+        Index of the files on the NDBC. None uses the index kept in
+        ~/.buoypy. False lists January up to last month without looking,
+        with two links for each month: the .gz file and the plain .txt
+        the NDBC keeps for months it has not zipped yet.
+    today : datetime.date
+        Defaults to today.
+
+    Returns
+    -------
+    months : list
+        (label, links) in calendar order, ex: ('Jan2016', (link,)).
+        The first link that exists holds the month.
+    """
+
+    if today is None:
+        today = datetime.date.today()
+
+    if index is None:
+        index = availability()
+
+    if index is False:
+
+        #the most recent month with a file is last month
+        last = today.replace(day=1) - datetime.timedelta(days=1)
+
+        months = []
+        for mon, k in zip(MONTHS[:last.month], MONTH_CODES):
+            folder = 'data/{}/{}/'.format(product, mon)
+            links = (file_link('{}{}{}.txt.gz'.format(buoy, k, last.year),
+                folder), file_link('{}.txt'.format(buoy), folder))
+            months.append((mon + str(last.year), links))
+
+        return months
+
+    station = index.station(buoy, product)
+
+    months = []
+    for year in (today.year - 1, today.year):
+
+        #already in the yearly archive
+        if str(year) in station['years']:
+            continue
+
+        for mon, fname in index.months(buoy, product, year).items():
+            link = file_link(fname, 'data/{}/{}/'.format(product, mon))
+            months.append((mon + str(year), (link,)))
+
+    return months
+
+
+def file_link(fname, folder, viewer=False):
+    """
+    Link to a file from the index.
+
+    Parameters
+    ----------
+    fname : string
+        File name from the index, ex: '41013h2015.txt.gz'
+    folder : string
+        Folder on the NDBC, ex: 'data/historical/stdmet/'
+    viewer : bool
+        Link gzipped files through the NDBC text viewer, which unzips them
+        on the server. The default links the .gz file itself, which is
+        about a fifth of the size.
+    """
+
+    if viewer and fname.endswith('.gz'):
+        return ndbc('view_text_file.php?filename={}&dir={}'.format(
+            fname, folder))
+
+    return ndbc(folder + fname)
+
+
+def viewer_link(link):
+    """
+    NDBC text viewer link for a direct link to a gzipped file. Other links
+    and local paths are given back as they are.
+    """
+
+    parts = urlsplit(link)
+    if not parts.netloc or not parts.path.endswith('.gz') or parts.query:
+        return link
+
+    folder, fname = parts.path.lstrip('/').rsplit('/', 1)
+
+    return '{}://{}/view_text_file.php?filename={}&dir={}/'.format(
+        parts.scheme, parts.netloc, fname, folder)
+
+
+def ndbc(path=''):
+    """
+    Link to path on the NDBC. The base is looked up on every call, so
+    changing buoypy.index.NDBC redirects links made after the change.
+    """
+
+    return NDBC + path
+
+
+def _listing(link):
+    """
+    Text of an NDBC directory listing.
+    """
+
+    response = urlopen(link)
+    try:
+        return response.read().decode('latin-1')
+    finally:
+        response.close()
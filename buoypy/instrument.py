@@ -0,0 +1,331 @@
+"""
+Timing and byte counts for each phase of a download and parse.
+
+Phase       What is timed
+-----       -------------
+network     downloading, bytes is the size of the body
+gzip        decompressing, bytes is the size after decompressing
+tokenize    splitting the text into columns, rows is the number of rows
+dates       turning the date columns into datetimes
+cast        turning the value columns into floats
+dtype       applying a dtype_policy
+
+When a link is streamed straight into the parser, reading the body
+happens while tokenizing. The time spent waiting on the network is then
+counted under network and also inside tokenize.
+
+Nothing is recorded until a hook is added, and the checks cost one list
+lookup per phase, so the calls can stay in place in production.
+
+Example:
+import buoypy as bp
+
+with bp.recording() as stats:
+    bp.historic_data(41013, 2015).get_stand_meteo()
+
+stats.totals()
+print(stats.to_prometheus())
+"""
+
+import io
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+
+#functions called with every finished record
+_hooks = []
+
+
+class record:
+    """
+    One timed phase.
+
+    Attributes
+    ----------
+    phase : string
+        Name of the phase, ex: 'tokenize'
+    url : string
+        Link or path that was being worked on. None if unknown.
+    seconds : float
+    bytes : int
+    rows : int
+    """
+
+    __slots__ = ('phase', 'url', 'seconds', 'bytes', 'rows')
+
+    def __init__(self, phase, url=None):
+
+        self.phase = phase
+        self.url = url
+        self.seconds = 0.
+        self.bytes = 0
+        self.rows = 0
+
+
+class _timer:
+
+    __slots__ = ('record', 'start')
+
+    def __init__(self, phase, url):
+
+        self.record = record(phase, url)
+
+    def __enter__(self):
+
+        self.start = time.perf_counter()
+        return self.record
+
+    def __exit__(self, *exc):
+
+        self.record.seconds = time.perf_counter() - self.start
+        emit(self.record)
+
+
+class _null:
+    """
+    Stand in for _timer when nothing is listening.
+    """
+
+    record = record(None)
+
+    def __enter__(self):
+
+        return self.record
+
+    def __exit__(self, *exc):
+
+        pass
+
+
+_NULL = _null()
+
+
+def enabled():
+
+    return bool(_hooks)
+
+
+def phase(name, url=None):
+    """
+    Context manager that times a phase. Set bytes and rows on the record
+    it gives to count them.
+
+    Example:
+    with phase('tokenize', link) as r:
+        df = pd.read_csv(...)
+        r.rows = len(df)
+    """
+
+    if not _hooks:
+        return _NULL
+
+    return _timer(name, url)
+
+
+def emit(rec):
+    """
+    Pass a finished record to every hook.
+    """
+
+    for hook in list(_hooks):
+        hook(rec)
+
+
+def add_hook(func):
+    """
+    Call func(record) at the end of every phase.
+    """
+
+    _hooks.append(func)
+
+
+def remove_hook(func):
+
+    if func in _hooks:
+        _hooks.remove(func)
+
+
+@contextmanager
+def recording(stats=None):
+    """
+    Collect the phases run inside the with block.
+
+    Parameters
+    ----------
+    stats : phase_stats
+        Adds to an existing one. A new one is made if None.
+
+    Yields
+    ------
+    stats : phase_stats
+    """
+
+    if stats is None:
+        stats = phase_stats()
+
+    add_hook(stats)
+    try:
+        yield stats
+    finally:
+        remove_hook(stats)
+
+
+def logging_hook(logger, level=20):
+    """
+    Hook that writes every record to logger as one line of json.
+
+    Example:
+    bp.add_hook(bp.logging_hook(logging.getLogger('buoypy')))
+    """
+
+    def hook(rec):
+        logger.log(level, json.dumps(_as_dict(rec)))
+
+    return hook
+
+
+def _as_dict(rec):
+
+    return {'phase': rec.phase, 'url': rec.url, 'seconds': rec.seconds,
+        'bytes': rec.bytes, 'rows': rec.rows}
+
+
+class phase_stats:
+    """
+    Running totals of the records, by phase and url. Can be used as a
+    hook from any number of threads.
+    """
+
+    def __init__(self):
+
+        self.entries = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, rec):
+
+        key = (rec.phase, rec.url)
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = self.entries[key] = [0, 0., 0, 0]
+            entry[0] += 1
+            entry[1] += rec.seconds
+            entry[2] += rec.bytes
+            entry[3] += rec.rows
+
+    def totals(self, by_url=False):
+        """
+        Totals of each phase.
+
+        Parameters
+        ----------
+        by_url : bool
+            Keep the urls apart.
+
+        Returns
+        -------
+        totals : dict
+            phase or (phase, url) -> {'calls', 'seconds', 'bytes', 'rows'}
+        """
+
+        out = {}
+        with self._lock:
+            for (name, url), entry in self.entries.items():
+
+                key = (name, url) if by_url else name
+                total = out.setdefault(key, {'calls': 0, 'seconds': 0.,
+                    'bytes': 0, 'rows': 0})
+
+                for field, value in zip(('calls', 'seconds', 'bytes',
+                        'rows'), entry):
+                    total[field] += value
+
+        return out
+
+    def to_prometheus(self, by_url=False, prefix='buoypy_phase'):
+        """
+        Totals in the Prometheus text format.
+        """
+
+        totals = self.totals(by_url)
+
+        lines = []
+        for field in ('calls', 'seconds', 'bytes', 'rows'):
+
+            name = '{}_{}_total'.format(prefix, field)
+            lines.append('# TYPE {} counter'.format(name))
+
+            for key in sorted(totals, key=str):
+                if by_url:
+                    labels = 'phase="{}",url="{}"'.format(key[0],
+                        _escape(key[1]))
+                else:
+                    labels = 'phase="{}"'.format(key)
+
+                lines.append('{}{{{}}} {}'.format(name, labels,
+                    totals[key][field]))
+
+        return '\n'.join(lines) + '\n'
+
+    def to_log(self):
+        """
+        One line of json for each phase and url.
+        """
+
+        lines = []
+        for (name, url), total in sorted(self.totals(True).items(), key=str):
+            total = dict(total, phase=name, url=url)
+            lines.append(json.dumps(total, sort_keys=True))
+
+        return '\n'.join(lines)
+
+    def reset(self):
+
+        with self._lock:
+            self.entries = {}
+
+
+def _escape(text):
+
+    if text is None:
+        return ''
+
+    return str(text).replace('\\', '\\\\').replace('"', '\\"')
+
+
+class timed_reader(io.RawIOBase):
+    """
+    Wraps a response so the time spent reading it is recorded as the
+    network phase once it is closed.
+    """
+
+    def __init__(self, raw, url):
+
+        self.raw = raw
+        self.rec = record('network', url)
+
+    def readable(self):
+
+        return True
+
+    def readinto(self, b):
+
+        start = time.perf_counter()
+        data = self.raw.read(len(b))
+        self.rec.seconds += time.perf_counter() - start
+
+        n = len(data)
+        b[:n] = data
+        self.rec.bytes += n
+
+        return n
+
+    def close(self):
+
+        if not self.closed:
+            self.raw.close()
+            emit(self.rec)
+
+        io.RawIOBase.close(self)
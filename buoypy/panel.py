@@ -0,0 +1,248 @@
+"""
+Many stations on one time grid.
+
+The stations do not report at the same times. Realtime files of one buoy
+are stamped :40 and of another :50, and the historical files go from
+hourly to 10 minute data. build_panel puts every station on a shared grid
+by taking, for each grid time, the nearest (or the last, or the next)
+report within a tolerance. All stations are matched at once: the report
+times of every station are sorted together as int64 keys and the grid is
+looked up in them with one searchsorted, so there are no per station
+merges.
+
+The result is a float32 array shaped (time, station, variable) and a
+mask that is True where a value was found.
+
+Example:
+import buoypy as bp
+
+data, failures = bp.realtime_many(['41013', '41108', '41110'], ['txt'])
+P = bp.build_panel(dict((b, d['txt']) for b, d in data.items()),
+    freq='h', tolerance='30min')
+
+P.data.shape     #(time, station, variable)
+P.mask.shape     #same, False where there was no report
+P['WVHT']        #(time, station) view
+P.to_frame('WVHT')
+"""
+
+import numpy as np
+import pandas as pd
+from pandas.tseries.frequencies import to_offset
+
+
+DIRECTIONS = ('nearest', 'backward', 'forward')
+
+
+class panel:
+    """
+    Stations on a shared time grid.
+
+    Parameters
+    ----------
+    data : numpy array (time, station, variable)
+        float32 values. NaN where mask is False.
+    mask : numpy array (time, station, variable)
+        True where a value was found.
+    time : pandas DatetimeIndex
+        The grid, sorted oldest first.
+    stations : list
+        Names along the second axis.
+    variables : list
+        Names along the last axis.
+    """
+
+    def __init__(self, data, mask, time, stations, variables):
+
+        self.data = data
+        self.mask = mask
+        self.time = time
+        self.stations = list(stations)
+        self.variables = list(variables)
+
+    def __getitem__(self, var):
+        """
+        (time, station) view of one variable.
+        """
+
+        return self.data[:, :, self.variables.index(var)]
+
+    def __len__(self):
+
+        return len(self.time)
+
+    def to_frame(self, var):
+        """
+        One variable as a data frame with the dates as the index and the
+        stations as the columns.
+        """
+
+        return pd.DataFrame(self[var], index=self.time, columns=self.stations)
+
+
+def build_panel(frames, freq='10min', tolerance=None, direction='nearest',
+        variables=None, times=None):
+    """
+    Align many stations on one time grid.
+
+    Parameters
+    ----------
+    frames : dict
+        station -> dataframe with the dates as the index, ex: the frames
+        of realtime_many or get_all_stand_meteo. The rows do not need to
+        be sorted.
+    freq : string
+        Spacing of the grid, ex: '10min' or 'h'. The grid runs from the
+        first to the last report of any station.
+    tolerance : string or pd.Timedelta
+        Furthest a report can be from a grid time. Defaults to half of
+        freq for 'nearest' and freq for the others.
+    direction : string
+        'nearest' report, 'backward' for the last one at or before the
+        grid time (an as-of join) or 'forward' for the first one at or
+        after it. A tie goes to the earlier report.
+    variables : list
+        Columns to keep. Defaults to every numeric column, in the order
+        they are first seen.
+    times : pandas DatetimeIndex
+        Grid to use instead of one made from freq.
+
+    Returns
+    -------
+    P : panel
+    """
+
+    if direction not in DIRECTIONS:
+        raise ValueError('direction must be one of {}, not {!r}'.format(
+            DIRECTIONS, direction))
+
+    stations = list(frames)
+
+    if variables is None:
+        variables = []
+        for df in frames.values():
+            variables.extend(c for c in df.columns if c not in variables and
+                df[c].dtype.kind in 'iuf')
+
+    #every report of every station in one table
+    t = [_ns(df.index) for df in frames.values()]
+    n = np.array([len(x) for x in t], dtype=np.int64)
+    t = np.concatenate(t) if len(t) else np.zeros(0, dtype=np.int64)
+    s = np.repeat(np.arange(len(stations), dtype=np.int64), n)
+
+    values = np.full((len(t) + 1, len(variables)), np.nan, dtype=np.float32)
+    start = 0
+    for df, k in zip(frames.values(), n):
+        for j, var in enumerate(variables):
+            if var in df.columns and df[var].dtype.kind in 'iuf':
+                values[start:start + k, j] = df[var].to_numpy(
+                    dtype=np.float32, na_value=np.nan)
+        start += k
+
+    if times is None:
+        times = _grid(t, freq)
+    times = pd.DatetimeIndex(times)
+    grid = _ns(times)
+
+    if tolerance is None:
+        tolerance = pd.Timedelta(to_offset(freq))
+        if direction == 'nearest':
+            tolerance = tolerance / 2
+    tolerance = pd.Timedelta(tolerance).value
+
+    rows = _match(t, s, grid, len(stations), direction, tolerance)
+
+    #the last row of values is all NaN and stands in for no match
+    rows[rows < 0] = len(t)
+
+    data = values[rows.T]
+    mask = ~np.isnan(data)
+
+    return panel(data, mask, times, stations, variables)
+
+
+def _match(t, s, grid, n_stations, direction, tolerance):
+    """
+    Report that goes with every station and grid time.
+
+    The times of the grid and of the reports are ranked together, which
+    makes station * n_ranks + rank a key that sorts by station and then
+    by time and does not overflow. The grid keys of all stations are
+    looked up in the sorted report keys in one go.
+
+    Returns
+    -------
+    rows : numpy array (station, time)
+        Index into t, -1 where there is no report within the tolerance.
+    """
+
+    G = len(grid)
+    rows = np.full((n_stations, G), -1, dtype=np.int64)
+    if not len(t) or not G:
+        return rows
+
+    ranks = np.unique(np.concatenate([grid, t]), return_inverse=True)[1]
+    ranks = ranks.reshape(-1)
+    span = ranks.max() + 1
+
+    keys = s * span + ranks[G:]
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+
+    station = np.arange(n_stations, dtype=np.int64)[:, None]
+    q = (station * span + ranks[:G]).reshape(-1)
+
+    #last report at or before each grid time and first one at or after
+    before = np.searchsorted(keys, q, side='right') - 1
+    after = np.searchsorted(keys, q, side='left')
+
+    q_station = np.repeat(station[:, 0], G)
+    q_time = np.tile(grid, n_stations)
+
+    best = np.full(len(q), -1, dtype=np.int64)
+    gap = np.full(len(q), np.iinfo(np.int64).max, dtype=np.int64)
+
+    if direction in ('nearest', 'backward'):
+        ok = before >= 0
+        i = order[before[ok]]
+        ok[ok] = s[i] == q_station[ok]
+        i = order[before[ok]]
+        best[ok] = i
+        gap[ok] = q_time[ok] - t[i]
+
+    if direction in ('nearest', 'forward'):
+        ok = after < len(keys)
+        i = order[after[ok]]
+        ok[ok] = s[i] == q_station[ok]
+        i = order[after[ok]]
+        d = t[i] - q_time[ok]
+        closer = d < gap[ok]
+        best[np.flatnonzero(ok)[closer]] = i[closer]
+        gap[np.flatnonzero(ok)[closer]] = d[closer]
+
+    best[gap > tolerance] = -1
+
+    return best.reshape(n_stations, G)
+
+
+def _grid(t, freq):
+    """
+    Grid from the first to the last report, on whole steps of freq.
+    """
+
+    if not len(t):
+        return pd.DatetimeIndex([])
+
+    first = pd.Timestamp(t.min()).floor(freq)
+    last = pd.Timestamp(t.max()).ceil(freq)
+
+    return pd.date_range(first, last, freq=freq)
+
+
+def _ns(index):
+    """
+    Dates as int64 nanoseconds.
+    """
+
+    return np.asarray(pd.DatetimeIndex(index).values.astype('datetime64[ns]')
+        .view(np.int64))
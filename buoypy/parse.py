@@ -0,0 +1,777 @@
+"""
+Parsing engine shared by all the NDBC text files.
+
+Every NDBC file is whitespace separated. The first line holds the column
+names, the 2007 and on files have a second line with the units and the
+first four or five columns are the date (year month day hour minute).
+
+The date columns are read as integers and turned into datetime64 values
+with numpy arithmetic. There is no string concatenation and no second
+pass through pd.to_datetime.
+
+The layout of a file is looked up from its first line in FORMATS, a
+registry of the headers the NDBC has used over the years. Each entry
+knows the dtype and the missing data values of every column and the
+current name of columns that were renamed (WD is now WDIR, BAR and BARO
+are PRES, H0 is WVHT, AVP is APD), so every file is parsed once, straight
+into its final dtypes, and comes out with the same names.
+"""
+
+import io
+import os
+import zlib
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+try:
+    from urllib.request import urlopen
+except ImportError:
+    from urllib2 import urlopen
+
+from .instrument import phase, enabled, emit, record, timed_reader
+
+
+def open_source(source):
+    """
+    Binary file object for a link, a path or something that is already
+    file like. Lines can be read from it one at a time and it can peek at
+    the next line without using it up. Gzipped data is decompressed as it
+    is read.
+    """
+
+    url = _url(source)
+
+    if isinstance(source, io.BufferedReader):
+        f = source
+
+    elif hasattr(source, 'read'):
+        f = io.BufferedReader(source)
+
+    elif '://' not in source:
+        f = open(source, 'rb')
+
+    else:
+        if not enabled():
+            source = urlopen(source)
+        else:
+            start = perf_counter()
+            source = timed_reader(urlopen(source), source)
+            source.rec.seconds = perf_counter() - start
+
+        f = io.BufferedReader(source)
+
+    if f.peek(2)[:2] == GZIP_MAGIC:
+        f = io.BufferedReader(gunzip(f, url), gunzip.chunk)
+
+    return f
+
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+class gunzip(io.RawIOBase):
+    """
+    Decompresses a gzip stream as it is read, so the whole text is never
+    in memory. Closing it closes the stream.
+
+    Parameters
+    ----------
+    raw : file
+        Binary file object with the compressed data.
+    url : string
+        Name used in the instrument records.
+    """
+
+    chunk = 2**16
+
+    def __init__(self, raw, url=None):
+
+        self.raw = raw
+        self._z = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self._out = b''
+        self._pos = 0
+        self._rec = record('gzip', url) if enabled() else None
+
+    def readable(self):
+
+        return True
+
+    def readinto(self, b):
+
+        while self._pos == len(self._out):
+
+            if self._z.eof:
+                #a gzip file can be several members one after another
+                data = self._z.unused_data or self.raw.read(self.chunk)
+                if not data:
+                    return 0
+                self._z = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            else:
+                data = self.raw.read(self.chunk)
+                if not data:
+                    raise EOFError('compressed file ended before the '
+                        'end-of-stream marker was reached')
+
+            start = perf_counter()
+            self._out = self._z.decompress(data)
+            self._pos = 0
+            if self._rec is not None:
+                self._rec.seconds += perf_counter() - start
+                self._rec.bytes += len(self._out)
+
+        n = min(len(b), len(self._out) - self._pos)
+        b[:n] = self._out[self._pos:self._pos + n]
+        self._pos += n
+
+        return n
+
+    def close(self):
+
+        if not self.closed:
+            self.raw.close()
+            if self._rec is not None:
+                emit(self._rec)
+
+        io.RawIOBase.close(self)
+
+
+def read_header(f):
+    """
+    Read the header lines off of f.
+
+    Returns
+    -------
+    names : list
+        Column names with the leading hash removed.
+    units : list or None
+        The units line of the 2007 and on format.
+    """
+
+    names = f.readline().decode('latin-1').lstrip('#').split()
+
+    units = None
+    if f.peek(1)[:1] == b'#':
+        units = f.readline().decode('latin-1').lstrip('#').split()
+
+    return names, units
+
+
+def ndbc_time(year, month, day, hour, minute=None):
+    """
+    Turn integer date columns into a DatetimeIndex. Two digit years are
+    taken to be in the 1900s.
+
+    Parameters
+    ----------
+    year, month, day, hour, minute : array like
+        Integer columns. minute can be None for files without it.
+
+    Returns
+    -------
+    index : pandas DatetimeIndex
+    """
+
+    year = np.asarray(year, dtype=np.int64)
+    year = np.where(year < 100, year + 1900, year)
+
+    t = (year - 1970).astype('datetime64[Y]').astype('datetime64[M]')
+    t = t + (np.asarray(month, dtype=np.int64) - 1).astype('timedelta64[M]')
+    t = t.astype('datetime64[D]')
+    t = t + (np.asarray(day, dtype=np.int64) - 1).astype('timedelta64[D]')
+
+    minutes = np.asarray(hour, dtype=np.int64) * 60
+    if minute is not None:
+        minutes = minutes + np.asarray(minute, dtype=np.int64)
+
+    t = t.astype('datetime64[m]') + minutes.astype('timedelta64[m]')
+
+    return pd.DatetimeIndex(t.astype('datetime64[ns]'))
+
+
+def n_date_cols(names):
+    """
+    Number of leading date columns: 5 with a minute column, 4 without.
+    """
+
+    if len(names) > 4 and names[4] == 'mm':
+        return 5
+
+    return 4
+
+
+#old names of the variables -> the names the NDBC uses now
+RENAMES = {'WD': 'WDIR', 'BAR': 'PRES', 'BARO': 'PRES', 'H0': 'WVHT',
+    'AVP': 'APD'}
+
+#values the historical stdmet files use for missing data
+STDMET_NA = {'WDIR': 999, 'WSPD': 99, 'GST': 99, 'WVHT': 99, 'DPD': 99,
+    'APD': 99, 'MWD': 999, 'PRES': 9999, 'ATMP': 999, 'WTMP': 999,
+    'DEWP': 999, 'VIS': 99, 'TIDE': 99}
+
+
+class ndbc_format:
+    """
+    One layout of an NDBC file.
+
+    Parameters
+    ----------
+    name : string
+        ex: 'stdmet_2007'. None for a header that is not registered.
+    header : list
+        Column names of the first line, without the hash.
+    units : bool
+        A units line follows the names.
+    na : dict or list
+        column -> value that means missing data, or a list of values for
+        every value column.
+    text : list
+        Columns that hold text. The others are numbers.
+    typed : bool
+        Read the value columns straight into their dtypes. Headers that
+        are not registered leave pandas to work them out.
+    """
+
+    def __init__(self, name, header, units=True, na=None, text=(),
+            typed=True):
+
+        self.name = name
+        self.header = tuple(header)
+        self.units = units
+        self.nd = n_date_cols(self.header)
+        self.names = list(self.header[:self.nd]) + [RENAMES.get(c, c)
+            for c in self.header[self.nd:]]
+        self.na = na
+        self.text = tuple(text)
+        self.typed = typed
+
+    def __repr__(self):
+
+        return 'ndbc_format({!r})'.format(self.name)
+
+    def dtypes(self, float_dtype=float):
+        """
+        dtype of each column for pd.read_csv.
+        """
+
+        dtypes = dict((c, np.int64) for c in self.names[:self.nd])
+
+        if self.typed:
+            for c in self.names[self.nd:]:
+                dtypes[c] = str if c in self.text else float_dtype
+
+        return dtypes
+
+    def na_values(self, na_values=None):
+        """
+        Missing data values of each value column for pd.read_csv. none
+        for the date columns. na_values replaces the ones of the format.
+        """
+
+        if na_values is None:
+            na_values = self.na
+
+        if na_values is None:
+            return None
+
+        out = {}
+        for c in self.names[self.nd:]:
+            values = na_values.get(c) if isinstance(na_values, dict) \
+                else na_values
+            if values is not None:
+                out[c] = _na_forms(values)
+
+        return out
+
+
+def _na_forms(values):
+    """
+    A number as it may be written in a file, ex: 99 as '99' and '99.0'.
+    """
+
+    if not isinstance(values, (list, tuple)):
+        values = [values]
+
+    out = []
+    for v in values:
+        out.append(v)
+        if isinstance(v, (int, float)) and float(v) == int(v):
+            out.extend([int(v), float(v)])
+
+    return out
+
+
+#first line of a file -> its format
+FORMATS = {}
+
+
+def register(fmt):
+    """
+    Add a format to the registry, so files with its header are read
+    with it.
+    """
+
+    FORMATS[fmt.header] = fmt
+
+    return fmt
+
+
+_REALTIME_TXT = '#YY MM DD hh mm WDIR WSPD GST WVHT DPD APD MWD PRES ATMP ' \
+    'WTMP DEWP VIS PTDY TIDE'
+_REALTIME_SPEC = '#YY MM DD hh mm WVHT SwH SwP WWH WWP SwD WWD STEEPNESS APD MWD'
+
+for _fmt in [
+        ndbc_format('stdmet_1970', 'YY MM DD hh WD WSPD GST WVHT DPD APD MWD '
+            'BAR ATMP WTMP DEWP VIS'.split(), False, STDMET_NA),
+        ndbc_format('stdmet_1999', 'YYYY MM DD hh WD WSPD GST WVHT DPD APD MWD '
+            'BAR ATMP WTMP DEWP VIS TIDE'.split(), False, STDMET_NA),
+        ndbc_format('stdmet_2005', 'YYYY MM DD hh mm WD WSPD GST WVHT DPD APD '
+            'MWD BAR ATMP WTMP DEWP VIS TIDE'.split(), False, STDMET_NA),
+        ndbc_format('stdmet_2007', 'YY MM DD hh mm WDIR WSPD GST WVHT DPD APD '
+            'MWD PRES ATMP WTMP DEWP VIS TIDE'.split(), True, STDMET_NA),
+        ndbc_format('txt', _REALTIME_TXT.lstrip('#').split(), True, ['MM']),
+        ndbc_format('txt_old', _REALTIME_TXT.lstrip('#').replace('WDIR', 'WD')
+            .replace('PRES', 'BARO').split(), True, ['MM']),
+        ndbc_format('spec', _REALTIME_SPEC.lstrip('#').split(), True, ['MM'],
+            ['SwD', 'WWD', 'STEEPNESS']),
+        ndbc_format('spec_old', _REALTIME_SPEC.lstrip('#').replace('WVHT', 'H0')
+            .replace('APD', 'AVP').split(), True, ['MM'],
+            ['SwD', 'WWD', 'STEEPNESS']),
+        ndbc_format('supl', 'YY MM DD hh mm PRES PTIME WSPD WDIR WTIME'.split(),
+            True, ['MM']),
+        ndbc_format('ocean', 'YY MM DD hh mm DEPTH OTMP COND SAL O2% O2PPM '
+            'CLCON TURB PH EH'.split(), True, ['MM'])]:
+    register(_fmt)
+
+
+def sniff(f):
+    """
+    Read the header lines off of f and look up the format of the file.
+    A header that is not in FORMATS gets a format of its own, with the
+    value columns left for pandas to work out.
+
+    Returns
+    -------
+    fmt : ndbc_format
+    """
+
+    names, units = read_header(f)
+
+    fmt = FORMATS.get(tuple(names))
+    if fmt is None:
+        fmt = ndbc_format(None, names, units is not None, typed=False)
+
+    return fmt
+
+
+def sniff_format(source):
+    """
+    Format of an NDBC file from its first lines. Only the start of the
+    file is read.
+
+    Parameters
+    ----------
+    source : string or file
+        Link, path or binary file object.
+
+    Returns
+    -------
+    fmt : ndbc_format
+    """
+
+    f = open_source(source)
+    try:
+        return sniff(f)
+    finally:
+        f.close()
+
+
+def read_ndbc(source, na_values=None, chunksize=None, max_memory=None,
+        float_dtype=float):
+    """
+    Read an NDBC file with one column per variable, ex: the .txt, .spec
+    and historical stdmet files.
+
+    Parameters
+    ----------
+    source : string or file
+        Link, path or binary file object.
+    na_values : list or dict
+        Values that mean missing data, for every value column or by
+        column. They are not applied to the date columns. None uses the
+        ones of the format, ex: 99 for WVHT in the historical files.
+    chunksize : int
+        Parse this many rows at a time and copy each piece into arrays
+        that hold the whole file, see iter_ndbc. The text of the whole
+        file is never tokenized at once.
+    max_memory : int
+        Bytes the parser may use for each piece. Sets chunksize from the
+        number of columns.
+    float_dtype : dtype
+        dtype of the numeric columns, ex: np.float32
+
+    Returns
+    -------
+    df : pandas dataframe
+        Index is the date and the columns are named from the header, with
+        old names replaced by the current ones. The units line is
+        dropped. Numeric columns are floats.
+    """
+
+    if chunksize is not None or max_memory is not None:
+        return _read_ndbc_chunks(source, na_values, chunksize, max_memory,
+            float_dtype)
+
+    url = _url(source)
+
+    f = open_source(source)
+    try:
+        with phase('tokenize', url) as r:
+            fmt = sniff(f)
+
+            df = pd.read_csv(f, header=None, names=fmt.names,
+                dtype=fmt.dtypes(float_dtype),
+                na_values=fmt.na_values(na_values), **CSV_OPTIONS)
+            r.rows = len(df)
+    finally:
+        f.close()
+
+    return _finish(df, fmt.nd, float_dtype, url)
+
+
+#the columns are split on single spaces with the runs of spaces skipped,
+#which tokenizes about a third faster than a regex separator. latin-1
+#skips the slow utf-8 decoding, the files are plain ascii
+CSV_OPTIONS = dict(sep=' ', skipinitialspace=True, index_col=False,
+    encoding='latin-1')
+
+
+def _finish(df, nd, float_dtype, url):
+    """
+    Move the date columns into the index and cast the numeric columns.
+    """
+
+    with phase('dates', url):
+        dates = [df.iloc[:, ii].values for ii in range(nd)]
+        df = df.iloc[:, nd:]
+        df.index = ndbc_time(*dates)
+
+    #registered formats are read in their dtypes already
+    numeric = [c for c in df.columns if df[c].dtype.kind in 'iuf' and
+        df[c].dtype != float_dtype]
+    if numeric:
+        with phase('cast', url):
+            df[numeric] = df[numeric].astype(float_dtype)
+
+    return df
+
+
+#bytes the parser uses for each value of a piece, measured with
+#tracemalloc on stdmet files
+CELL_BYTES = 24
+
+
+def iter_ndbc(source, na_values=None, chunksize=None, max_memory=None,
+        float_dtype=float):
+    """
+    Read an NDBC file a piece at a time. Each piece has its dates in the
+    index and its numeric columns already cast, so no piece is ever held
+    as text.
+
+    Parameters
+    ----------
+    source : string or file
+        Link, path or binary file object.
+    na_values : list
+        Values that mean missing data.
+    chunksize : int
+        Rows in each piece. Defaults to 65536.
+    max_memory : int
+        Bytes the parser may use for each piece. Sets chunksize from the
+        number of columns.
+    float_dtype : dtype
+        dtype of the numeric columns, ex: np.float32
+
+    Yields
+    ------
+    df : pandas dataframe
+        Up to chunksize rows, in file order. A file without rows gives one
+        empty frame.
+    """
+
+    f = open_source(source)
+    try:
+        fmt = sniff(f)
+        for df in _chunks(f, fmt, na_values, chunksize, max_memory,
+                float_dtype, _url(source)):
+            yield df
+    finally:
+        f.close()
+
+
+def _chunks(f, fmt, na_values, chunksize, max_memory, float_dtype, url):
+
+    nd = fmt.nd
+
+    if chunksize is None:
+        chunksize = 2**16
+        if max_memory is not None:
+            chunksize = max(int(max_memory // (CELL_BYTES * len(fmt.names))),
+                1)
+
+    reader = pd.read_csv(f, header=None, names=fmt.names,
+        dtype=fmt.dtypes(float_dtype), na_values=fmt.na_values(na_values),
+        chunksize=chunksize, **CSV_OPTIONS)
+
+    while True:
+        with phase('tokenize', url) as r:
+            df = next(reader, None)
+            if df is not None:
+                r.rows = len(df)
+
+        if df is None:
+            break
+
+        yield _finish(df, nd, float_dtype, url)
+
+
+def _read_ndbc_chunks(source, na_values, chunksize, max_memory,
+        float_dtype):
+    """
+    read_ndbc one piece at a time. The pieces are copied into arrays
+    sized from the length of the file, so the result is built without a
+    final concatenation.
+    """
+
+    url = _url(source)
+
+    f = open_source(source)
+    try:
+        #the header is laid out like the rows, so its length is the
+        #length of a row
+        line = f.peek(4096).split(b'\n', 1)[0]
+        size = _size(f)
+        rows = 0
+        if size is not None:
+            rows = int(size // max(len(line) + 1, 1) * 1.05)
+
+        fmt = sniff(f)
+
+        n = 0
+        index = None
+        cols = {}
+        text = {}
+        for df in _chunks(f, fmt, na_values, chunksize, max_memory,
+                float_dtype, url):
+
+            if index is None:
+                index = np.empty(max(rows, len(df)), dtype='datetime64[ns]')
+                for c in df.columns:
+                    if df[c].dtype.kind == 'f':
+                        cols[c] = np.empty(len(index), dtype=df[c].dtype)
+                    else:
+                        text[c] = []
+
+            if n + len(df) > len(index):
+                grow = max(n + len(df), len(index) * 3 // 2)
+                index = _grow(index, n, grow)
+                for c in cols:
+                    cols[c] = _grow(cols[c], n, grow)
+
+            index[n:n + len(df)] = df.index.values
+            for c in df.columns:
+
+                #a column that was all missing in the first pieces can
+                #turn out to be text
+                if c in cols and df[c].dtype != cols[c].dtype:
+                    text[c] = [pd.Series(cols.pop(c)[:n])]
+
+                if c in cols:
+                    cols[c][n:n + len(df)] = df[c].values
+                else:
+                    text[c].append(df[c].reset_index(drop=True))
+
+            n += len(df)
+    finally:
+        f.close()
+
+    #the few text columns are joined at the end
+    for c in text:
+        text[c] = pd.concat(text[c], ignore_index=True).values
+
+    return pd.DataFrame(dict((c, cols[c][:n] if c in cols else text[c])
+        for c in df.columns), index=pd.DatetimeIndex(index[:n]), copy=False)
+
+
+def _grow(a, n, size):
+
+    out = np.empty(size, dtype=a.dtype)
+    out[:n] = a[:n]
+
+    return out
+
+
+def _size(f):
+    """
+    Size in bytes of the file under f, None if it is not known.
+    """
+
+    try:
+        return os.fstat(f.raw.fileno()).st_size
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def _url(source):
+    """
+    Name of a source for the instrument records.
+    """
+
+    if isinstance(source, str):
+        return source
+
+    return getattr(source, 'name', None)
+
+
+def _read_spectral(source, na_values=None):
+    """
+    Read an NDBC spectral file where every value is followed by its
+    frequency in parentheses. Gives the dates, the frequency labels and
+    the values.
+    """
+
+    url = _url(source)
+
+    f = open_source(source)
+    try:
+        with phase('tokenize', url) as r:
+            names, _ = read_header(f)
+
+            #the raw spectral data has the separation frequency up front
+            skip = 1 if 'Sep_Freq' in names else 0
+
+            df = pd.read_csv(f, sep=r'\s+', header=None,
+                na_values=na_values, encoding='latin-1')
+            r.rows = len(df)
+    finally:
+        f.close()
+
+    nd = n_date_cols(names)
+    with phase('dates', url):
+        time = ndbc_time(*[df.iloc[:, ii].values for ii in range(nd)])
+
+    with phase('cast', url):
+        values = df.iloc[:, nd + skip::2].values.astype(float)
+
+    #remove the parenthesis from the frequencies
+    labels = [str(cname).strip('()') for cname in df.iloc[0, nd + skip + 1::2]]
+
+    return time, labels, values
+
+
+def read_spectral_arrays(source, na_values=None):
+    """
+    Read an NDBC spectral file as numpy arrays, ex: the .data_spec and
+    .swdir files. The separation frequency of the raw spectral data is
+    dropped.
+
+    Parameters
+    ----------
+    source : string or file
+        Link, path or binary file object.
+    na_values : list
+        Values that mean missing data.
+
+    Returns
+    -------
+    time : pandas DatetimeIndex
+        Date of each row.
+    freq : numpy array
+        Frequencies (Hz) taken from the first row.
+    values : numpy array (time, frequency)
+        Value at each frequency.
+    """
+
+    time, labels, values = _read_spectral(source, na_values)
+
+    return time, np.array(labels, dtype=float), values
+
+
+def read_spectral(source, na_values=None):
+    """
+    Read an NDBC spectral file into a data frame, ex: the .data_spec and
+    .swdir files. The separation frequency of the raw spectral data is
+    dropped.
+
+    Parameters
+    ----------
+    source : string or file
+        Link, path or binary file object.
+    na_values : list
+        Values that mean missing data.
+
+    Returns
+    -------
+    df : pandas dataframe
+        Index is the date and the columns are the frequencies as strings,
+        taken from the first row.
+    """
+
+    time, labels, values = _read_spectral(source, na_values)
+
+    return pd.DataFrame(values, index=time, columns=labels)
+
+
+#hhmm times that fit in a small integer
+HHMM = ['PTIME', 'WTIME']
+
+
+def apply_dtype_policy(df, policy=None):
+    """
+    Store the columns of a parsed frame in smaller dtypes.
+
+    Parameters
+    ----------
+    df : pandas dataframe
+        Parsed NDBC data.
+    policy : string
+        None or 'float64' leaves the frame as is. 'compact' stores the
+        measurements as float32 (the NDBC reports at most two decimals),
+        text columns such as compass directions and steepness as
+        categoricals and the hhmm times as nullable Int16.
+
+    Returns
+    -------
+    df : pandas dataframe
+    """
+
+    if policy is None or policy == 'float64':
+        return df
+
+    if policy != 'compact':
+        raise ValueError('unknown dtype_policy {!r}'.format(policy))
+
+    with phase('dtype') as r:
+        r.rows = len(df)
+        return _compact(df)
+
+
+def _compact(df):
+
+    types = {}
+    for c in df.columns:
+
+        kind = df[c].dtype.kind
+        if c in HHMM and kind == 'f':
+            types[c] = 'Int16'
+        elif kind == 'f':
+            types[c] = np.float32
+        elif kind not in 'iub':
+            types[c] = 'category'
+
+    for c in types:
+        if types[c] == 'Int16':
+            df[c] = df[c].round()
+
+    return df.astype(types)
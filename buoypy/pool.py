@@ -0,0 +1,200 @@
+"""
+Shared keep-alive HTTP connections.
+
+pd.read_csv(url) opens a new connection for every file. When hundreds of
+files are pulled from the same host, the TCP and TLS handshakes cost more
+than the files themselves. connection_pool keeps the connections open
+between requests and limits how many requests run against one host at
+the same time.
+
+Example:
+import buoypy as bp
+
+pool = bp.connection_pool(per_host=4)
+body = pool.get('http://www.ndbc.noaa.gov/data/realtime2/41013.txt')
+"""
+
+import socket
+import threading
+
+try:
+    from http.client import HTTPConnection, HTTPSConnection, \
+        RemoteDisconnected
+    from urllib.parse import urlsplit, urljoin
+    from urllib.error import HTTPError
+
+    #what a kept-alive connection the server already closed raises
+    STALE_ERRORS = (RemoteDisconnected, ConnectionResetError,
+        ConnectionAbortedError, BrokenPipeError)
+except ImportError:
+    from httplib import HTTPConnection, HTTPSConnection, BadStatusLine
+    from urlparse import urlsplit, urljoin
+    from urllib2 import HTTPError
+
+    STALE_ERRORS = (BadStatusLine, socket.error)
+
+
+class connection_pool:
+    """
+    Keep-alive connections shared between threads.
+
+    Parameters
+    ----------
+    per_host : int
+        Most requests that run against one host at the same time.
+    timeout : float
+        Seconds to wait for the server.
+    """
+
+    def __init__(self, per_host=4, timeout=60):
+
+        self.per_host = per_host
+        self.timeout = timeout
+
+        self._lock = threading.Lock()
+        self._idle = {}
+        self._limits = {}
+
+    def _limit(self, key):
+
+        with self._lock:
+            if key not in self._limits:
+                self._limits[key] = threading.BoundedSemaphore(self.per_host)
+            return self._limits[key]
+
+    def _checkout(self, key):
+        """
+        An idle connection to the host, or a new one.
+
+        Returns
+        -------
+        conn : HTTPConnection
+        reused : bool
+            The connection was kept alive from an earlier request.
+        """
+
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if idle:
+                return idle.pop(), True
+
+        scheme, netloc = key
+        if scheme == 'https':
+            return HTTPSConnection(netloc, timeout=self.timeout), False
+
+        return HTTPConnection(netloc, timeout=self.timeout), False
+
+    def _checkin(self, key, conn):
+
+        with self._lock:
+            self._idle.setdefault(key, []).append(conn)
+
+    def get(self, url, redirects=5):
+        """
+        Bytes of url. Follows redirects.
+
+        Parameters
+        ----------
+        url : string
+            Link to download.
+
+        Returns
+        -------
+        body : bytes
+
+        Raises
+        ------
+        HTTPError
+            For any status of 400 and above, ex: 404 when the file is not
+            on the NDBC.
+        """
+
+        return self.open(url, redirects=redirects)[2]
+
+    def open(self, url, headers=None, redirects=5):
+        """
+        Status, headers and bytes of url. Follows redirects. Used for
+        conditional requests, where a 304 has no body.
+
+        Parameters
+        ----------
+        url : string
+            Link to download.
+        headers : dict
+            Request headers, ex: {'If-None-Match': etag}
+
+        Returns
+        -------
+        status : int
+        headers : http.client.HTTPMessage
+        body : bytes
+
+        Raises
+        ------
+        HTTPError
+            For any status of 400 and above.
+        """
+
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+
+        with self._limit(key):
+            status, reason, response_headers, body = self._request(key, path,
+                headers or {})
+
+        if status in (301, 302, 303, 307, 308) and redirects > 0:
+            return self.open(urljoin(url, response_headers.get('Location')),
+                headers, redirects - 1)
+
+        if status >= 400:
+            raise HTTPError(url, status, reason, response_headers, None)
+
+        return status, response_headers, body
+
+    def _request(self, key, path, headers):
+        """
+        Send one GET over a pooled connection. A kept-alive connection the
+        server already closed is dropped and the GET sent again. Any other
+        error, ex: a timeout, is raised, the scheduler decides whether to
+        ask again.
+        """
+
+        while True:
+
+            conn, reused = self._checkout(key)
+            try:
+                conn.request('GET', path, headers=headers)
+                response = conn.getresponse()
+                body = response.read()
+
+            except STALE_ERRORS as e:
+                conn.close()
+                if not reused or isinstance(e, socket.timeout):
+                    raise
+                continue
+
+            except Exception:
+                conn.close()
+                raise
+
+            if response.will_close:
+                conn.close()
+            else:
+                self._checkin(key, conn)
+
+            return response.status, response.reason, response.msg, body
+
+    def close(self):
+        """
+        Close all the idle connections.
+        """
+
+        with self._lock:
+            for idle in self._idle.values():
+                for conn in idle:
+                    conn.close()
+            self._idle = {}
@@ -0,0 +1,341 @@
+"""
+Request scheduling for the bulk fetchers.
+
+A failed download used to mean "not in records", whatever the reason. The
+scheduler sorts the failures out:
+
+Outcome     Cause                                       What happens
+-------     -----                                       ------------
+missing     404 or 410, or a local file that is absent  no retry
+transient   503, 429, 5xx, timeouts, refused, reset,     retried with jittered
+            dropped or cut short connections             exponential backoff
+failed      any other http, file or parse error, or a    no retry
+            transient error that was still failing
+            after the last retry
+
+Other exceptions, ex: a TypeError in a parser, are bugs and are raised
+instead of being written down as a lost file.
+
+The number of requests in flight is adapted the way TCP adapts its
+window (additive increase, multiplicative decrease). Every success adds
+about one request per round. A transient error, or an answer slower than
+target_latency, halves it. Every link gets an entry in the ledger, so a
+backfill can tell which years were really missing and which were lost.
+
+Example:
+import buoypy as bp
+
+S = bp.scheduler(workers=4, max_workers=16)
+H = bp.historic_data(41013, 2015, (1990, 2015))
+df = H.get_all_stand_meteo(scheduler=S)
+
+S.summary()  #{'ok': 26, 'missing': 0, 'failed': 0, 'retries': 3, ...}
+S.failed()   #links that were lost
+"""
+
+import time
+import zlib
+import random
+import socket
+import threading
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from urllib.error import HTTPError, URLError
+    from http.client import HTTPException
+except ImportError:
+    from urllib2 import HTTPError, URLError
+    from httplib import HTTPException
+
+try:
+    FileNotFound = FileNotFoundError
+    CONNECTION_ERRORS = (ConnectionError, TimeoutError, socket.timeout)
+except NameError:
+    FileNotFound = IOError
+    CONNECTION_ERRORS = (socket.timeout,)
+
+#what a download or a parse raises. The scheduler sorts these out with
+#classify, anything else is raised
+FETCH_ERRORS = (EnvironmentError, HTTPException, EOFError, zlib.error,
+    ValueError)
+
+
+#http status codes that are worth asking again for
+TRANSIENT_CODES = (408, 425, 429, 500, 502, 503, 504)
+
+MISSING_CODES = (404, 410)
+
+
+def classify(error):
+    """
+    'missing', 'transient' or 'failed' for an exception raised by a
+    download.
+    """
+
+    if isinstance(error, HTTPError):
+        if error.code in MISSING_CODES:
+            return 'missing'
+        if error.code in TRANSIENT_CODES:
+            return 'transient'
+        return 'failed'
+
+    if isinstance(error, FileNotFound):
+        return 'missing'
+
+    #urlopen wraps the socket error of a connection that did not work
+    if isinstance(error, URLError):
+        reason = error.reason
+        return classify(reason) if isinstance(reason, Exception) else 'failed'
+
+    #HTTPException is a connection that was dropped or sent garbage and
+    #EOFError is a gzip stream that was cut short. other OSErrors, ex: a
+    #full disk or no permission, will not go away by asking again
+    if isinstance(error, CONNECTION_ERRORS + (HTTPException, EOFError)):
+        return 'transient'
+
+    return 'failed'
+
+
+def retry_after(error):
+    """
+    Seconds the server asked us to wait, None if it did not say.
+    """
+
+    headers = getattr(error, 'headers', None)
+    if headers is None:
+        return None
+
+    try:
+        return float(headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+class outcome:
+    """
+    Ledger entry for one link.
+
+    Attributes
+    ----------
+    status : string
+        'ok', 'missing' or 'failed'
+    attempts : int
+    seconds : float
+        Time from the first attempt to the last answer, backoff included.
+    error : exception
+        The last error. None when status is 'ok'.
+    """
+
+    __slots__ = ('status', 'attempts', 'seconds', 'error')
+
+    def __init__(self, status, attempts, seconds, error=None):
+
+        self.status = status
+        self.attempts = attempts
+        self.seconds = seconds
+        self.error = error
+
+    def __repr__(self):
+
+        return 'outcome({!r}, attempts={}, seconds={:.2f}, error={!r})'.format(
+            self.status, self.attempts, self.seconds, self.error)
+
+
+class scheduler:
+    """
+    Runs downloads with retries and an adaptive number of requests in
+    flight.
+
+    Parameters
+    ----------
+    workers : int
+        Requests in flight to start with.
+    min_workers, max_workers : int
+        Bounds on the requests in flight. max_workers defaults to workers,
+        so the scheduler only backs off from it.
+    retries : int
+        Extra attempts for a transient error.
+    backoff : float
+        Seconds of the first backoff. Each retry can wait up to twice as
+        long as the last one, with a random share of it (full jitter).
+        A Retry-After from the server is used when it is longer.
+    max_backoff : float
+        Longest wait between two attempts.
+    target_latency : float
+        Seconds. Answers slower than this count as a sign of overload.
+        None only looks at errors.
+    """
+
+    def __init__(self, workers=4, min_workers=1, max_workers=None, retries=4,
+            backoff=0.5, max_backoff=60., target_latency=None):
+
+        if max_workers is None:
+            max_workers = workers
+
+        self.min_workers = min_workers
+        self.max_workers = max(max_workers, min_workers)
+        self.limit = float(min(max(workers, min_workers), self.max_workers))
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.target_latency = target_latency
+
+        self.ledger = OrderedDict()
+        self.n_retries = 0
+
+        self._active = 0
+        self._last_decrease = 0.
+        self._cond = threading.Condition()
+
+    @property
+    def workers(self):
+        """
+        Requests allowed in flight right now.
+        """
+
+        return max(int(self.limit), self.min_workers)
+
+    def _acquire(self):
+
+        with self._cond:
+            while self._active >= self.workers:
+                self._cond.wait()
+            self._active += 1
+
+    def _release(self):
+
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    def _increase(self):
+
+        with self._cond:
+            self.limit = min(self.limit + 1. / self.limit, self.max_workers)
+            self._cond.notify_all()
+
+    def _decrease(self, started):
+
+        with self._cond:
+            #many requests fail together when the server is overloaded,
+            #only the first of them after the last cut counts
+            if started < self._last_decrease:
+                return
+            self.limit = max(self.limit / 2., self.min_workers)
+            self._last_decrease = time.time()
+
+    def _wait(self, attempt, error):
+
+        wait = random.uniform(0, min(self.max_backoff,
+            self.backoff * 2 ** attempt))
+
+        asked = retry_after(error)
+        if asked is not None:
+            wait = max(wait, min(asked, self.max_backoff))
+
+        time.sleep(wait)
+
+    def call(self, func, item):
+        """
+        func(item) with retries. Records the outcome in the ledger.
+
+        Returns
+        -------
+        result
+            What func gave, None if it did not succeed.
+        """
+
+        first = time.time()
+        attempt = 0
+        while True:
+
+            self._acquire()
+            started = time.time()
+            try:
+                result = func(item)
+                error = None
+            except FETCH_ERRORS as e:
+                error = e
+            finally:
+                self._release()
+
+            attempt += 1
+            latency = time.time() - started
+
+            if error is None:
+                if self.target_latency and latency > self.target_latency:
+                    self._decrease(started)
+                else:
+                    self._increase()
+
+                self._record(item, outcome('ok', attempt, time.time() - first))
+                return result
+
+            kind = classify(error)
+
+            if kind == 'transient':
+                self._decrease(started)
+
+                if attempt <= self.retries:
+                    with self._cond:
+                        self.n_retries += 1
+                    self._wait(attempt - 1, error)
+                    continue
+
+                kind = 'failed'
+
+            self._record(item, outcome(kind, attempt, time.time() - first,
+                error))
+            return None
+
+    def _record(self, item, entry):
+
+        with self._cond:
+            self.ledger[item] = entry
+
+    def map(self, func, items):
+        """
+        Yield func(item) for every item, in the order of items. Items that
+        did not succeed give None, see the ledger for why. At most
+        max_workers results are held at once.
+        """
+
+        items = list(items)
+        if not items:
+            return
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+
+            pending = deque()
+            for item in items:
+                pending.append(pool.submit(self.call, func, item))
+
+                if len(pending) >= self.max_workers:
+                    yield pending.popleft().result()
+
+            while pending:
+                yield pending.popleft().result()
+
+    def failed(self):
+        """
+        Items that were lost, ones that are missing on the NDBC are not
+        included.
+        """
+
+        return [item for item, o in self.ledger.items() if o.status == 'failed']
+
+    def summary(self):
+        """
+        Counts of the outcomes, the retries made and the current number
+        of requests in flight.
+        """
+
+        counts = {'ok': 0, 'missing': 0, 'failed': 0}
+        for o in self.ledger.values():
+            counts[o.status] += 1
+
+        counts['retries'] = self.n_retries
+        counts['workers'] = self.workers
+
+        return counts
@@ -0,0 +1,518 @@
+"""
+Tools for the spectral wave products.
+
+The NDBC splits the directional wave spectrum over five files:
+
+File            Variable
+----            --------
+.data_spec      spec    energy density (m^2/Hz)
+.swdir          alpha1  mean wave direction (degT)
+.swdir2         alpha2  principal wave direction (degT)
+.swr1           r1      first normalized polar coordinate
+.swr2           r2      second normalized polar coordinate
+
+spectral_cube loads all five into one float32 array shaped
+(time, frequency, variable) with a shared numeric frequency axis.
+
+Example:
+import buoypy as bp
+
+cube = bp.realtime(41013).spectral_cube()
+cube.data.shape                      #(time, frequency, 5)
+cube['r1']                           #(time, frequency) view
+cube.sel(time=slice('2016-02-01', None), freq=slice(0.05, 0.25))
+
+E, theta = cube.directional(directions=360, method='mem')
+E.shape                              #(time, frequency, direction)
+
+bp.spectral_moments(bp.realtime(41013).data_spec())  #Hm0, Tp, Tm01, ...
+"""
+
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from .parse import read_spectral_arrays
+
+
+#realtime2 extension -> variable name
+PRODUCTS = [('data_spec', 'spec'), ('swdir', 'alpha1'), ('swdir2', 'alpha2'),
+    ('swr1', 'r1'), ('swr2', 'r2')]
+
+VARIABLES = [var for _, var in PRODUCTS]
+
+
+class spectral_cube:
+    """
+    The five spectral products on one time and frequency axis.
+
+    Parameters
+    ----------
+    data : numpy array (time, frequency, variable)
+        Values. Missing values are NaN.
+    time : pandas DatetimeIndex
+        Sorted oldest first.
+    freq : numpy array
+        Frequencies (Hz), sorted ascending.
+    variables : list
+        Names along the last axis.
+    """
+
+    def __init__(self, data, time, freq, variables=VARIABLES):
+
+        self.data = data
+        self.time = time
+        self.freq = freq
+        self.variables = list(variables)
+
+    def __getitem__(self, var):
+        """
+        (time, frequency) view of one variable.
+        """
+
+        return self.data[:, :, self.variables.index(var)]
+
+    def __len__(self):
+
+        return len(self.time)
+
+    def sel(self, time=None, freq=None):
+        """
+        Cut out a time and frequency range. The result shares memory with
+        this cube, nothing is copied.
+
+        Parameters
+        ----------
+        time : slice
+            Start and stop dates, either can be None. Both ends are
+            included.
+        freq : slice
+            Lowest and highest frequency (Hz), either can be None. Both
+            ends are included.
+
+        Returns
+        -------
+        cube : spectral_cube
+        """
+
+        it = _bounds(self.time.values, time, pd.Timestamp)
+        jf = _bounds(self.freq, freq, float)
+
+        return spectral_cube(self.data[it, jf], self.time[it], self.freq[jf],
+            self.variables)
+
+    def directional(self, directions=360, method='fourier', max_memory=2**26,
+            out=None):
+        """
+        Directional wave spectrum E(f, theta) of every time step. See
+        directional_spectrum.
+        """
+
+        return directional_spectrum(self, directions, method, max_memory,
+            out)
+
+    def moments(self, bands=None, max_missing=None):
+        """
+        Wave parameters of every time step from spec. See
+        spectral_moments.
+        """
+
+        return spectral_moments(self.to_frame('spec'), bands, max_missing)
+
+    def to_frame(self, var):
+        """
+        One variable as a data frame with the dates as the index and the
+        frequencies as the columns.
+        """
+
+        return pd.DataFrame(self[var], index=self.time, columns=self.freq)
+
+
+def _bounds(axis, s, convert):
+    """
+    Turn a slice of labels into a slice of positions on a sorted axis.
+    """
+
+    if s is None:
+        return slice(None)
+
+    start, stop = 0, len(axis)
+
+    if s.start is not None:
+        start = np.searchsorted(axis, _value(convert(s.start)), side='left')
+    if s.stop is not None:
+        stop = np.searchsorted(axis, _value(convert(s.stop)), side='right')
+
+    return slice(start, stop)
+
+
+def _value(x):
+
+    if isinstance(x, pd.Timestamp):
+        return x.to_datetime64()
+
+    return x
+
+
+def build_cube(arrays, variables=VARIABLES):
+    """
+    Put the spectral products on a shared time and frequency axis.
+
+    Parameters
+    ----------
+    arrays : list
+        (time, freq, values) for each variable, as given by
+        read_spectral_arrays. Rows may be in any order and the products
+        may cover different dates and frequencies.
+    variables : list
+        Name of each entry in arrays.
+
+    Returns
+    -------
+    cube : spectral_cube
+        Dates or frequencies missing from a product are NaN.
+    """
+
+    times = np.unique(np.concatenate([t.values for t, _, _ in arrays]))
+
+    #the frequencies are printed with a few decimals, round away the noise
+    freqs = np.unique(np.concatenate([np.round(f, 5) for _, f, _ in arrays]))
+
+    data = np.full((len(times), len(freqs), len(arrays)), np.nan,
+        dtype=np.float32)
+
+    for k, (t, f, values) in enumerate(arrays):
+
+        it = np.searchsorted(times, t.values)
+        jf = np.searchsorted(freqs, np.round(f, 5))
+
+        data[it[:, None], jf[None, :], k] = values
+
+    return spectral_cube(data, pd.DatetimeIndex(times), freqs, variables)
+
+
+def load_cube(sources, na_values=(999, 999.0)):
+    """
+    Read the five spectral products and build a spectral_cube.
+
+    Parameters
+    ----------
+    sources : dict
+        realtime2 extension -> link, path or file, ex:
+        {'data_spec': '41013.data_spec', 'swdir': '41013.swdir', ...}
+    na_values : list or tuple
+        Values that mean missing data.
+
+    Returns
+    -------
+    cube : spectral_cube
+    """
+
+    arrays = []
+    variables = []
+    for ext, var in PRODUCTS:
+
+        if ext not in sources:
+            continue
+
+        arrays.append(read_spectral_arrays(sources[ext], na_values))
+        variables.append(var)
+
+    return build_cube(arrays, variables)
+
+
+#directional methods, see directional_spectrum
+METHODS = ('fourier', 'mem')
+
+
+def direction_grid(directions=360):
+    """
+    Directions (degrees) of a directional spectrum.
+
+    Parameters
+    ----------
+    directions : int or array
+        Number of evenly spaced directions starting at 0, or the
+        directions themselves.
+    """
+
+    if np.ndim(directions) == 0:
+        return np.arange(int(directions)) * (360. / int(directions))
+
+    return np.asarray(directions, dtype=np.float64)
+
+
+def iter_directional_spectrum(cube, directions=360, method='fourier',
+        max_memory=2**26):
+    """
+    Directional wave spectrum a block of time steps at a time.
+
+    The spreading function of each frequency is rebuilt from the first
+    four Fourier coefficients the buoy measures:
+
+    a1 = r1 cos(alpha1)    b1 = r1 sin(alpha1)
+    a2 = r2 cos(2 alpha2)  b2 = r2 sin(2 alpha2)
+
+    'fourier' is the truncated series of Longuet-Higgins et al. (1963),
+    the one the NDBC documents. It is smooth but broad, and can dip
+    below zero opposite the peak:
+
+    D(theta) = 1/pi (1/2 + a1 cos + b1 sin + a2 cos 2 + b2 sin 2 theta)
+
+    'mem' is the maximum entropy method of Lygre and Krogstad (1986),
+    which gives narrower peaks that are never negative, but can split a
+    broad peak in two when r2 is small next to r1.
+
+    Both are a weighted sum of 1, cos theta, sin theta, cos 2 theta and
+    sin 2 theta, so every block is one matrix product of (rows, 5)
+    coefficients with a (5, direction) basis that is built once.
+
+    Parameters
+    ----------
+    cube : spectral_cube
+        Needs the spec, alpha1, alpha2, r1 and r2 variables.
+    directions : int or array
+        See direction_grid.
+    method : string
+        'fourier' or 'mem'.
+    max_memory : int
+        Bytes the blocks may use while they are worked on. Sets the
+        number of time steps in each block.
+
+    Yields
+    ------
+    rows : slice
+        Time steps of the block.
+    E : numpy array (time, frequency, direction)
+        float32 energy density (m^2/Hz/deg), with the direction in the
+        same convention as alpha1 and alpha2: where the waves come from,
+        degrees clockwise from true north. NaN where an input is missing.
+    """
+
+    if method not in METHODS:
+        raise ValueError('method must be one of {}, not {!r}'.format(
+            METHODS, method))
+
+    theta = np.radians(direction_grid(directions))
+    basis = np.stack([np.ones_like(theta), np.cos(theta), np.sin(theta),
+        np.cos(2 * theta), np.sin(2 * theta)])
+
+    nt, nf = len(cube.time), len(cube.freq)
+    nd = len(theta)
+
+    #float64 product and float32 result of each cell
+    step = max(int(max_memory // (nf * nd * 12)), 1)
+
+    for start in range(0, nt, step):
+
+        rows = slice(start, min(start + step, nt))
+        block = cube.data[rows].astype(np.float64)
+
+        scale, coef = _coefficients(block, cube.variables, method)
+
+        E = np.matmul(coef.reshape(-1, 5), basis)
+        if method == 'mem':
+            np.divide(1., E, out=E)
+        E *= scale.reshape(-1, 1)
+
+        yield rows, E.reshape(block.shape[0], nf, nd).astype(np.float32)
+
+
+def directional_spectrum(cube, directions=360, method='fourier',
+        max_memory=2**26, out=None):
+    """
+    Directional wave spectrum E(f, theta) of every time step at once. See
+    iter_directional_spectrum for the methods.
+
+    Parameters
+    ----------
+    cube : spectral_cube
+        Needs the spec, alpha1, alpha2, r1 and r2 variables.
+    directions : int or array
+        See direction_grid.
+    method : string
+        'fourier' or 'mem'.
+    max_memory : int
+        Bytes the work may use on top of the result.
+    out : numpy array
+        float32 array shaped (time, frequency, direction) to write into,
+        ex: a np.memmap when the result does not fit in memory.
+
+    Returns
+    -------
+    E : numpy array (time, frequency, direction)
+        Energy density (m^2/Hz/deg). Summing over the directions and
+        multiplying by the step in degrees gives back spec.
+    theta : numpy array
+        Directions (degrees).
+    """
+
+    theta = direction_grid(directions)
+
+    shape = (len(cube.time), len(cube.freq), len(theta))
+    if out is None:
+        out = np.empty(shape, dtype=np.float32)
+    elif out.shape != shape:
+        raise ValueError('out is shaped {}, not {}'.format(out.shape, shape))
+
+    for rows, E in iter_directional_spectrum(cube, theta, method, max_memory):
+        out[rows] = E
+
+    return out, theta
+
+
+def _coefficients(block, variables, method):
+    """
+    Scale and (time, frequency, 5) basis weights of a block of the cube.
+    For 'mem' the weights are those of the denominator.
+    """
+
+    S, alpha1, alpha2, r1, r2 = [block[:, :, variables.index(v)]
+        for v in ('spec', 'alpha1', 'alpha2', 'r1', 'r2')]
+
+    alpha1 = np.radians(alpha1)
+    alpha2 = np.radians(alpha2)
+
+    c1 = r1 * np.exp(1j * alpha1)
+    c2 = r2 * np.exp(2j * alpha2)
+
+    if method == 'fourier':
+        #1/pi per radian is 1/180 per degree
+        coef = np.stack([np.full(S.shape, .5), c1.real, c1.imag, c2.real,
+            c2.imag], axis=-1)
+        return S / 180., coef
+
+    #D = 1/(2 pi) (1 - phi1 c1* - phi2 c2*) / |1 - phi1 z - phi2 z^2|^2
+    #with z = exp(-i theta)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        phi1 = (c1 - c2 * np.conj(c1)) / (1 - np.abs(c1) ** 2)
+    phi2 = c2 - c1 * phi1
+
+    numerator = (1 - phi1 * np.conj(c1) - phi2 * np.conj(c2)).real
+
+    #|1 - phi1 z - phi2 z^2|^2 = c0 + 2 Re(u z) + 2 Re(v z^2)
+    u = np.conj(phi1) * phi2 - phi1
+    v = -phi2
+    c0 = 1 + np.abs(phi1) ** 2 + np.abs(phi2) ** 2
+
+    coef = np.stack([c0, 2 * u.real, 2 * u.imag, 2 * v.real, 2 * v.imag],
+        axis=-1)
+
+    #1/(2 pi) per radian is 1/360 per degree
+    return S * numerator / 360., coef
+
+
+#values at or above this in the spectral files mean missing data
+MISSING = 999.
+
+
+def spectral_moments(spec, bands=None, max_missing=None):
+    """
+    Wave parameters of every spectrum at once.
+
+    The spectra are integrated over frequency with the trapezoid rule.
+    All the integrals are one matrix product of the spectra with a
+    weight matrix that is kept for each frequency layout, so calling this
+    again on the same buoy does not build it again.
+
+    Parameter   Meaning
+    ---------   -------
+    Hm0         4 sqrt(m0), significant wave height (m)
+    Tp          1 / frequency of the highest bin (sec)
+    Tm01        m0 / m1, mean period (sec)
+    Tm02        sqrt(m0 / m2), zero crossing period (sec)
+    Qp          2 / m0^2 int f S(f)^2 df, Goda's peakedness
+
+    where mn = int f^n S(f) df.
+
+    Parameters
+    ----------
+    spec : pandas dataframe or spectral_cube
+        Energy density (m^2/Hz) with the dates as the index and the
+        frequencies as the columns, ex: realtime.data_spec() or
+        read_spectral on a historical file.
+    bands : dict
+        name -> (low, high) frequencies (Hz). Adds the energy (m^2) of
+        the bins with low <= f < high under each name, ex:
+        {'swell': (0, 0.1), 'sea': (0.1, 1)}
+    max_missing : int
+        Missing bins (NaN, or 999 when the file was read without
+        na_values) a spectrum may have. They count as no energy. Spectra
+        with more are NaN. None allows any number, so the few 999 bins
+        at the ends of realtime spectra do not blank the time step, and
+        only spectra with every bin missing are NaN. 0 keeps only the
+        complete spectra.
+
+    Returns
+    -------
+    df : pandas dataframe
+        Index is the date, columns are Hm0, Tp, Tm01, Tm02, Qp and the
+        bands.
+    """
+
+    if isinstance(spec, spectral_cube):
+        spec = spec.to_frame('spec')
+
+    freq = np.round(np.asarray(spec.columns, dtype=np.float64), 5)
+    names = list(bands) if bands else []
+
+    W = _weights(tuple(freq), tuple(tuple(bands[n]) for n in names))
+
+    S = np.array(spec.values, dtype=np.float64)
+    missing = ~(S < MISSING)
+    S[missing] = 0.
+
+    m = S.dot(W)
+    m0, m1, m2 = m[:, 0], m[:, 1], m[:, 2]
+
+    #f S^2 uses the weights of m1
+    q = np.square(S).dot(W[:, 1])
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        out = {'Hm0': 4 * np.sqrt(m0),
+            'Tp': 1. / freq[np.argmax(S, axis=1)] if len(S) else m0,
+            'Tm01': m0 / m1,
+            'Tm02': np.sqrt(m0 / m2),
+            'Qp': 2 * q / np.square(m0)}
+
+    for k, name in enumerate(names):
+        out[name] = m[:, 3 + k]
+
+    df = pd.DataFrame(out, index=spec.index,
+        columns=['Hm0', 'Tp', 'Tm01', 'Tm02', 'Qp'] + names)
+
+    #a flat spectrum has no peak
+    df.loc[~(m0 > 0), ['Tp', 'Tm01', 'Tm02', 'Qp']] = np.nan
+    if max_missing is None:
+        df.loc[missing.all(axis=1)] = np.nan
+    else:
+        df.loc[missing.sum(axis=1) > max_missing] = np.nan
+
+    return df
+
+
+@lru_cache(maxsize=64)
+def _weights(freq, bands):
+    """
+    (frequency, 3 + bands) integration weights of m0, m1, m2 and each
+    band for one frequency layout.
+    """
+
+    f = np.array(freq)
+
+    #trapezoid rule, every bin gets half of the spacing on either side
+    w = np.zeros(len(f))
+    if len(f) > 1:
+        d = np.diff(f) / 2.
+        w[:-1] += d
+        w[1:] += d
+
+    columns = [w, w * f, w * f ** 2]
+    for low, high in bands:
+        columns.append(w * ((f >= low) & (f < high)))
+
+    W = np.stack(columns, axis=1)
+    W.flags.writeable = False
+
+    return W
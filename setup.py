@@ -5,6 +5,8 @@ setup(
 	author='Nick Cortale',
 	version='0.0.1',
 	description='buoypy scrapes the National Data Buoy Center and dumps it into pandas dataframes.',
-	packages=['buoypy']
+	packages=['buoypy'],
+	extras_require={'parquet': ['pyarrow']},
+	entry_points={'console_scripts': ['buoypy = buoypy.cli:main']},
 
 )
\ No newline at end of file
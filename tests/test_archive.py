@@ -0,0 +1,111 @@
+"""
+Both archive kinds written and read back, directly and through read_data.
+
+Run from the top of the repository with python -m pytest tests
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import buoypy as bp
+
+
+def history():
+
+    index = pd.date_range('2014-12-31', '2016-01-02', freq='h').as_unit('ns')
+    rng = np.random.default_rng(0)
+
+    return pd.DataFrame({'WVHT': rng.random(len(index)),
+        'DPD': rng.random(len(index)), 'APD': rng.random(len(index))},
+        index=index)
+
+
+def archives(tmp_path):
+
+    return {'archive': bp.archive(str(tmp_path / 'a')),
+        'mapped_archive': bp.mapped_archive(str(tmp_path / 'm'))}
+
+
+@pytest.mark.parametrize('kind', ['archive', 'mapped_archive'])
+def test_read_data(tmp_path, kind):
+
+    df = history()
+    A = archives(tmp_path)[kind]
+    A.write('41013', df)
+
+    R = bp.read_data('41013', archive=A)
+    out = R.get_stand_meteo()
+    pd.testing.assert_frame_equal(out, df, check_freq=False)
+
+    R = bp.read_data('41013', year_range=(2015, 2015), archive=A)
+    out = R.get_stand_meteo(columns=['DPD', 'WVHT'], start='2015-03-01',
+        end='2016-06-01')
+    expected = df.loc['2015-03-01':'2015-12-31 23:00', ['DPD', 'WVHT']]
+    pd.testing.assert_frame_equal(out, expected, check_freq=False)
+
+
+@pytest.mark.parametrize('kind', ['archive', 'mapped_archive'])
+def test_start_and_end(tmp_path, kind):
+
+    df = history()
+    A = archives(tmp_path)[kind]
+    A.write('41013', df)
+
+    out = A.read('41013', start='2015-06-01 12:00', end='2015-06-02')
+    assert out.index[0] == pd.Timestamp('2015-06-01 12:00')
+    assert out.index[-1] == pd.Timestamp('2015-06-01 23:00')
+
+    assert not len(A.read('41013', start='2016-01-02', end='2016-01-01'))
+
+
+@pytest.mark.parametrize('kind', ['archive', 'mapped_archive'])
+def test_new_rows_replace_old(tmp_path, kind):
+
+    df = history()
+    A = archives(tmp_path)[kind]
+    A.write('41013', df)
+
+    newer = df.iloc[100:110] + 1
+    A.write('41013', newer)
+
+    out = A.read('41013')
+    assert len(out) == len(df)
+    pd.testing.assert_frame_equal(out.iloc[100:110], newer, check_freq=False)
+
+
+def test_numpy_partitions_hold_no_pickles(tmp_path):
+
+    df = history().iloc[:48]
+    df['STEEPNESS'] = pd.Series(['STEEP', None] * 24, index=df.index,
+        dtype=object)
+    df['MWD'] = pd.Categorical(['S', 'SSE'] * 24)
+    df['PTIME'] = pd.array([1240, None] * 24, dtype='Int16')
+
+    A = bp.archive(str(tmp_path), engine='numpy')
+    A.write('41013', df)
+
+    folder = tmp_path / '41013' / '2014'
+    for name in folder.iterdir():
+        if name.suffix == '.npy':
+            assert np.load(str(name), allow_pickle=False).dtype != object
+
+    out = A.read('41013')
+    assert list(out.columns) == list(df.columns)
+    assert out['STEEPNESS'].iloc[0] == 'STEEP'
+    assert pd.isna(out['STEEPNESS'].iloc[1])
+    assert out['MWD'].tolist()[:2] == ['S', 'SSE']
+    assert out['PTIME'].iloc[0] == 1240
+    assert pd.isna(out['PTIME'].iloc[1])
+
+
+def test_numpy_partition_with_a_pickle_is_refused(tmp_path):
+
+    A = bp.archive(str(tmp_path), engine='numpy')
+    A.write('41013', history().iloc[:48])
+
+    np.save(str(tmp_path / '41013' / '2014' / 'WVHT.npy'),
+        np.array([{'a': 1}], dtype=object))
+
+    with pytest.raises(ValueError):
+        A.read('41013')
@@ -0,0 +1,53 @@
+"""
+The response cache used from several threads at once.
+
+Run from the top of the repository with python -m pytest tests
+"""
+
+import os
+import threading
+import time
+
+from buoypy.cache import http_cache
+
+URL = 'http://www.ndbc.noaa.gov/data/realtime2/41013.txt'
+BODY = b'#YY  MM DD hh mm WDIR WSPD\n' * 1000
+
+
+class fake_pool:
+    """
+    Answers like the NDBC, a 304 when the ETag matches.
+    """
+
+    def open(self, url, headers=None):
+
+        time.sleep(0.001)
+        if (headers or {}).get('If-None-Match') == '"1"':
+            return 304, {'ETag': '"1"'}, b''
+
+        return 200, {'ETag': '"1"'}, BODY
+
+
+def test_threads_share_the_cache(tmp_path):
+
+    cache = http_cache(str(tmp_path))
+    pool = fake_pool()
+    bodies = []
+
+    def work():
+        for _ in range(20):
+            bodies.append(cache.get(URL, pool=pool))
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(bodies) == 160
+    assert all(b == BODY for b in bodies)
+    assert cache.hits + cache.misses == 160
+    assert cache.hits > 0
+
+    assert not [f for f in os.listdir(str(tmp_path)) if f.endswith('.tmp')]
+    assert cache.get(URL, pool=pool) == BODY
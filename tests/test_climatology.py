@@ -0,0 +1,142 @@
+"""
+Day of year rollups checked against pandas on the same values.
+
+Run from the top of the repository with python -m pytest tests
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import buoypy as bp
+from buoypy.climatology import day_slots, file_span
+
+Q = [0.05, 0.25, 0.5, 0.75, 0.95]
+
+
+def hourly(years, seed=0):
+    """
+    Wave heights with a yearly cycle and a long upper tail, ex: WVHT.
+    """
+
+    rng = np.random.default_rng(seed)
+    t = pd.date_range('2000-01-01', '{}-12-31 23:00'.format(1999 + years),
+        freq='h')
+    doy = t.dayofyear.values
+    x = np.exp(rng.normal(0, 0.5, len(t))) * \
+        (1 + 0.5 * np.cos(2 * np.pi * doy / 365))
+
+    return pd.DataFrame({'WVHT': x}, index=t)
+
+
+def add_months(C, buoy, df):
+
+    for month, rows in df.groupby(df.index.strftime('%Y-%m')):
+        C.add(buoy, rows, period=month, save=False)
+
+
+def exact(df, column):
+
+    slots = day_slots(df.index) + 1
+
+    return df[column].groupby(slots).quantile(Q).unstack().reindex(
+        range(1, 367))
+
+
+def relative_error(df, C, buoy, column):
+
+    err = (C.bands(buoy, column) - exact(df, column)).abs() / \
+        exact(df, column)
+
+    #February 29th only has the leap years in it
+    return err.drop(60)
+
+
+def test_bands_exact_for_small_days(tmp_path):
+
+    #24 values a day are all kept as centroids of their own
+    df = hourly(1)
+    C = bp.climatology(str(tmp_path))
+    add_months(C, 'x', df)
+
+    np.testing.assert_allclose(C.bands('x', 'WVHT'), exact(df, 'WVHT'),
+        rtol=1e-12)
+
+
+def test_bands_accuracy(tmp_path):
+
+    #240 values a day, added one month at a time as write_data does
+    df = hourly(10)
+    C = bp.climatology(str(tmp_path))
+    add_months(C, 'x', df)
+
+    err = relative_error(df, C, 'x', 'WVHT')
+
+    assert err.mean().max() < 0.01
+    assert err[0.5].max() < 0.03
+    assert err[[0.25, 0.75]].max().max() < 0.03
+    assert err[[0.05, 0.95]].max().max() < 0.07
+
+
+def test_stats_match_pandas(tmp_path):
+
+    df = hourly(3)
+    C = bp.climatology(str(tmp_path))
+    add_months(C, 'x', df)
+
+    slots = day_slots(df.index) + 1
+    expected = df['WVHT'].groupby(slots).agg(['count', 'mean', 'std', 'min',
+        'max'])
+
+    pd.testing.assert_frame_equal(C.stats('x', 'WVHT'), expected,
+        check_names=False, check_index_type=False, check_dtype=False)
+
+
+def test_merge_matches_one_store(tmp_path):
+
+    df = hourly(4)
+    A = bp.climatology(str(tmp_path / 'a'))
+    B = bp.climatology(str(tmp_path / 'b'))
+    C = bp.climatology(str(tmp_path / 'c'))
+
+    add_months(A, 'x', df[df.index.year < 2002])
+    add_months(B, 'x', df[df.index.year >= 2002])
+    add_months(C, 'x', df)
+    A.merge('x', B)
+
+    pd.testing.assert_frame_equal(A.stats('x', 'WVHT'), C.stats('x', 'WVHT'))
+    assert relative_error(df, A, 'x', 'WVHT').max().max() < 0.07
+
+
+def test_add_again_is_skipped(tmp_path):
+
+    df = hourly(1)
+    C = bp.climatology(str(tmp_path))
+
+    assert C.add('x', df) == len(df)
+    assert C.add('x', df) == 0
+    assert C.stats('x', 'WVHT')['count'].sum() == len(df)
+
+
+def test_period_drops_rows_of_the_next_file(tmp_path):
+
+    #a yearly file that runs into the first hour of the next year
+    t = pd.date_range('2015-12-31 22:00', '2016-01-01 00:00', freq='h')
+    df = pd.DataFrame({'WVHT': [1., 2., 3.]}, index=t)
+
+    C = bp.climatology(str(tmp_path))
+    assert C.add('x', df, period='2015') == 2
+    assert C.months('x') == ['2015-12']
+
+    #the month of the lone row is still added by its own file
+    assert C.add('x', df.iloc[2:], period='Jan2016') == 1
+    assert C.months('x') == ['2015-12', '2016-01']
+
+
+@pytest.mark.parametrize('period, start, stop', [
+    ('2015', '2015-01-01', '2016-01-01'),
+    ('Jan2016', '2016-01-01', '2016-02-01'),
+    ('2016-12', '2016-12-01', '2017-01-01')])
+def test_file_span(period, start, stop):
+
+    assert file_span(period) == (pd.Timestamp(start), pd.Timestamp(stop))
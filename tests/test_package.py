@@ -0,0 +1,62 @@
+"""
+The package loads its names lazily, so the command line tool starts fast.
+
+Run from the top of the repository with python -m pytest tests
+"""
+
+import os
+import subprocess
+import sys
+
+import buoypy as bp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run(code):
+    """
+    Run code in a fresh interpreter, pandas is already loaded in this one.
+    """
+
+    return subprocess.check_output([sys.executable, '-c', code], cwd=ROOT,
+        universal_newlines=True).strip()
+
+
+def test_cli_does_not_import_pandas():
+
+    out = run("import sys, buoypy.cli; print('pandas' in sys.modules, "
+        "'numpy' in sys.modules)")
+
+    assert out == 'False False'
+
+
+def test_help_does_not_import_pandas():
+
+    out = run("import sys\n"
+        "from buoypy.cli import main\n"
+        "try:\n"
+        "    main(['--help'])\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        "print('pandas' in sys.modules)")
+
+    assert out.splitlines()[-1] == 'False'
+
+
+def test_star_import_gives_all():
+
+    names = {}
+    exec('from buoypy import *', names)
+    names.pop('__builtins__')
+
+    assert sorted(names) == sorted(bp.__all__)
+
+
+def test_classes_are_not_hidden_by_submodules():
+
+    out = run("import buoypy.archive, buoypy.panel\n"
+        "import buoypy as bp\n"
+        "print(isinstance(bp.archive, type), isinstance(bp.panel, type), "
+        "isinstance(bp.climatology, type), isinstance(bp.database, type))")
+
+    assert out == 'True True True True'
@@ -0,0 +1,113 @@
+"""
+build_panel checked against a pd.merge_asof of each station on its own.
+
+Run from the top of the repository with python -m pytest tests
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import buoypy as bp
+from buoypy.panel import DIRECTIONS
+
+COLUMNS = list('ABCD')
+
+
+def stations(n=12, seed=0):
+    """
+    Hourly and 10 minute stations with their own offsets, gaps, missing
+    values and a text column, newest row first like the realtime files.
+    """
+
+    rng = np.random.default_rng(seed)
+
+    frames = {}
+    for k in range(n):
+        freq = '10min' if k % 3 else 'h'
+        offset = int(rng.integers(0, 10 if freq == '10min' else 60))
+        index = pd.date_range('2016-01-01', '2016-01-10', freq=freq) + \
+            pd.Timedelta(minutes=offset)
+        index = index[rng.random(len(index)) > 0.1][::-1]
+
+        df = pd.DataFrame(rng.normal(size=(len(index), len(COLUMNS))),
+            index=index, columns=COLUMNS)
+        df.iloc[rng.random(len(index)) < 0.05, 2] = np.nan
+        df['TEXT'] = 'x'
+        frames['s{}'.format(k)] = df
+
+    return frames
+
+
+def merge_asof(df, times, direction, tolerance):
+
+    left = pd.DataFrame({'t': times.astype('datetime64[ns]')})
+    right = df[COLUMNS].sort_index()
+    right.index = right.index.astype('datetime64[ns]')
+    right = right.rename_axis('t').reset_index()
+
+    out = pd.merge_asof(left, right, on='t', direction=direction,
+        tolerance=pd.Timedelta(tolerance))
+
+    return out[COLUMNS].to_numpy(np.float32)
+
+
+@pytest.mark.parametrize('direction', DIRECTIONS)
+def test_matches_merge_asof(direction):
+
+    frames = stations()
+    P = bp.build_panel(frames, freq='h', tolerance='30min',
+        direction=direction)
+
+    assert P.data.shape == (len(P.time), len(frames), len(COLUMNS))
+    assert P.variables == COLUMNS
+    assert P.mask.mean() > 0.5
+
+    for j, df in enumerate(frames.values()):
+        expected = merge_asof(df, P.time, direction, '30min')
+        np.testing.assert_array_equal(P.mask[:, j], ~np.isnan(expected))
+        np.testing.assert_array_equal(P.data[:, j], expected)
+
+
+@pytest.mark.parametrize('direction', DIRECTIONS)
+def test_given_times(direction):
+
+    frames = stations(4, seed=1)
+    times = pd.date_range('2016-01-03 00:05', periods=50, freq='17min')
+    P = bp.build_panel(frames, tolerance='12min', direction=direction,
+        times=times)
+
+    assert (P.time == times).all()
+    for j, df in enumerate(frames.values()):
+        np.testing.assert_array_equal(P.data[:, j],
+            merge_asof(df, times, direction, '12min'))
+
+
+def test_tie_goes_to_earlier_report():
+
+    index = pd.DatetimeIndex(['2016-01-01 00:50', '2016-01-01 01:10'])
+    frames = {'a': pd.DataFrame({'A': [1., 2.]}, index=index)}
+
+    P = bp.build_panel(frames, times=pd.DatetimeIndex(['2016-01-01 01:00']),
+        tolerance='10min')
+
+    assert P['A'][0, 0] == 1.
+
+
+def test_station_without_variable_is_masked():
+
+    index = pd.date_range('2016-01-01', periods=3, freq='h')
+    frames = {'a': pd.DataFrame({'A': [1., 2., 3.]}, index=index),
+        'b': pd.DataFrame({'B': [4., 5., 6.]}, index=index)}
+
+    P = bp.build_panel(frames, freq='h')
+
+    assert P.variables == ['A', 'B']
+    assert not P.mask[:, 1, 0].any()
+    assert P.to_frame('B')['b'].tolist() == [4., 5., 6.]
+
+
+def test_bad_direction():
+
+    with pytest.raises(ValueError):
+        bp.build_panel({}, direction='sideways')
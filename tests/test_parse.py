@@ -0,0 +1,125 @@
+"""
+Every registered NDBC header is sniffed and read into the current names.
+
+Run from the top of the repository with python -m pytest tests
+"""
+
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from buoypy import parse
+from buoypy.parse import FORMATS, RENAMES, read_ndbc, sniff_format
+
+
+def ndbc_file(fmt, rows):
+    """
+    Text of a file in the layout of fmt, laid out like the NDBC ones:
+    a hash in front of the names in the formats with a units line.
+    """
+
+    lines = [' '.join(fmt.header)]
+    if fmt.units:
+        lines = ['#' + lines[0], '#' + ' '.join('u' for _ in fmt.header)]
+
+    lines.extend(' '.join(str(v) for v in row) for row in rows)
+
+    return ('\n'.join(lines) + '\n').encode('latin-1')
+
+
+def dates(fmt):
+
+    year = '15' if fmt.header[0] == 'YY' and not fmt.units else '2015'
+
+    return [year, '01', '02', '03'] + (['40'] if fmt.nd == 5 else [])
+
+
+def values(fmt, value):
+
+    return [value if c not in fmt.text else 'SSE'
+        for c in fmt.names[fmt.nd:]]
+
+
+@pytest.mark.parametrize('fmt', list(FORMATS.values()),
+    ids=lambda fmt: fmt.name)
+def test_every_format_is_sniffed_and_read(fmt):
+
+    data = ndbc_file(fmt, [dates(fmt) + values(fmt, '1.5')])
+
+    assert sniff_format(io.BytesIO(data)) is fmt
+
+    df = read_ndbc(io.BytesIO(data), float_dtype=np.float32)
+
+    #old names come out as the current ones
+    assert list(df.columns) == fmt.names[fmt.nd:]
+    assert not set(df.columns) & set(RENAMES)
+
+    year = 1915 if fmt.header[0] == 'YY' and not fmt.units else 2015
+    minute = 40 if fmt.nd == 5 else 0
+    assert df.index[0] == pd.Timestamp(year, 1, 2, 3, minute)
+
+    for c in df.columns:
+        if c in fmt.text:
+            assert df[c].iloc[0] == 'SSE'
+        else:
+            assert df[c].dtype == np.float32
+            assert df[c].iloc[0] == 1.5
+
+
+@pytest.mark.parametrize('name', ['stdmet_1970', 'stdmet_1999',
+    'stdmet_2005', 'stdmet_2007'])
+def test_stdmet_missing_values_by_column(name):
+
+    fmt = [f for f in FORMATS.values() if f.name == name][0]
+
+    #a real 99 degree wind and the 999 that means no wind direction
+    calm = dict((c, 1) for c in fmt.names[fmt.nd:])
+    calm.update(WDIR=99, PRES=1013.2)
+    gone = dict((c, parse.STDMET_NA[c]) for c in fmt.names[fmt.nd:])
+
+    data = ndbc_file(fmt, [dates(fmt) + [calm[c] for c in fmt.names[fmt.nd:]],
+        dates(fmt) + ['{:.1f}'.format(gone[c]) for c in fmt.names[fmt.nd:]]])
+    df = read_ndbc(io.BytesIO(data))
+
+    assert df['WDIR'].iloc[0] == 99
+    assert df['PRES'].iloc[0] == 1013.2
+    assert df.iloc[1].isna().all()
+
+
+@pytest.mark.parametrize('name', ['txt', 'txt_old', 'spec', 'spec_old'])
+def test_realtime_mm_is_missing(name):
+
+    fmt = [f for f in FORMATS.values() if f.name == name][0]
+    data = ndbc_file(fmt, [dates(fmt) + values(fmt, 'MM')])
+
+    df = read_ndbc(io.BytesIO(data))
+
+    numeric = [c for c in df.columns if c not in fmt.text]
+    assert df[numeric].iloc[0].isna().all()
+
+
+def test_chunks_match_whole_file():
+
+    fmt = [f for f in FORMATS.values() if f.name == 'stdmet_2007'][0]
+    rows = [['2015', '01', '{:02d}'.format(d), '{:02d}'.format(h), '00'] +
+        values(fmt, '{:.1f}'.format(d + h / 10.)) for d in range(1, 29)
+        for h in range(24)]
+    data = ndbc_file(fmt, rows)
+
+    pd.testing.assert_frame_equal(read_ndbc(io.BytesIO(data), chunksize=50),
+        read_ndbc(io.BytesIO(data)), check_freq=False)
+
+
+def test_unregistered_header_is_read():
+
+    data = b'#YY MM DD hh mm NEW1 NEW2\n2015 01 02 03 40 1.5 abc\n'
+
+    fmt = sniff_format(io.BytesIO(data))
+    assert fmt.name is None
+
+    df = read_ndbc(io.BytesIO(data))
+    assert list(df.columns) == ['NEW1', 'NEW2']
+    assert df['NEW1'].iloc[0] == 1.5
+    assert df['NEW2'].iloc[0] == 'abc'
@@ -0,0 +1,105 @@
+"""
+When the connection pool sends a GET again, and when it gives up.
+
+Run from the top of the repository with python -m pytest tests
+"""
+
+import socket
+import threading
+
+import pytest
+
+from buoypy.pool import connection_pool
+
+RESPONSE = (b'HTTP/1.1 200 OK\r\nContent-Length: 2\r\n'
+    b'Connection: keep-alive\r\n\r\nok')
+
+
+class server:
+    """
+    Accepts connections on localhost and hands each one to handle.
+    """
+
+    def __init__(self, handle):
+
+        self.handle = handle
+        self.accepted = 0
+
+        self.sock = socket.socket()
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(8)
+        self.url = 'http://127.0.0.1:{}/x.txt'.format(
+            self.sock.getsockname()[1])
+
+        self._conns = []
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            self.accepted += 1
+            self._conns.append(conn)
+            threading.Thread(target=self.handle, args=(conn,),
+                daemon=True).start()
+
+    def close(self):
+
+        self.sock.close()
+        for conn in self._conns:
+            conn.close()
+
+
+def answer_once(conn):
+
+    #answers as if the connection stays open, then closes it, like a
+    #server whose keep-alive timed out between two requests
+    conn.recv(65536)
+    conn.sendall(RESPONSE)
+    conn.close()
+
+
+def never_answer(conn):
+
+    conn.recv(65536)
+
+
+def test_stale_connection_is_replaced():
+
+    S = server(answer_once)
+    pool = connection_pool(timeout=5)
+    try:
+        assert pool.get(S.url) == b'ok'
+        assert pool.get(S.url) == b'ok'
+        assert S.accepted == 2
+    finally:
+        pool.close()
+        S.close()
+
+
+def test_timeout_is_not_retried():
+
+    S = server(never_answer)
+    pool = connection_pool(timeout=0.2)
+    try:
+        with pytest.raises(socket.timeout):
+            pool.get(S.url)
+        assert S.accepted == 1
+    finally:
+        pool.close()
+        S.close()
+
+
+def test_refused_connection_is_not_retried():
+
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+
+    pool = connection_pool(timeout=5)
+    with pytest.raises(ConnectionRefusedError):
+        pool.get('http://127.0.0.1:{}/x.txt'.format(port))
@@ -0,0 +1,87 @@
+"""
+Which errors the scheduler retries, gives up on or raises.
+
+Run from the top of the repository with python -m pytest tests
+"""
+
+import errno
+import socket
+import zlib
+from http.client import RemoteDisconnected
+from urllib.error import HTTPError, URLError
+
+import pytest
+
+from buoypy.schedule import classify, scheduler
+
+
+def http(code):
+
+    return HTTPError('http://x/y', code, 'status', {}, None)
+
+
+@pytest.mark.parametrize('error, kind', [
+    (http(404), 'missing'),
+    (http(410), 'missing'),
+    (FileNotFoundError(errno.ENOENT, 'gone'), 'missing'),
+    (http(503), 'transient'),
+    (http(429), 'transient'),
+    (socket.timeout('timed out'), 'transient'),
+    (ConnectionResetError(), 'transient'),
+    (ConnectionRefusedError(), 'transient'),
+    (RemoteDisconnected('closed'), 'transient'),
+    (EOFError('cut short'), 'transient'),
+    (URLError(ConnectionRefusedError()), 'transient'),
+    (URLError(socket.timeout('timed out')), 'transient'),
+    (http(403), 'failed'),
+    (PermissionError(errno.EACCES, 'no'), 'failed'),
+    (OSError(errno.ENOSPC, 'disk full'), 'failed'),
+    (URLError('unknown url type: x'), 'failed'),
+    (zlib.error('bad'), 'failed'),
+    (ValueError('bad row'), 'failed')])
+def test_classify(error, kind):
+
+    assert classify(error) == kind
+
+
+def fails_with(error):
+
+    calls = []
+
+    def func(item):
+        calls.append(item)
+        raise error
+
+    return func, calls
+
+
+def test_permanent_errors_are_not_retried():
+
+    S = scheduler(workers=1, retries=3, backoff=0)
+    func, calls = fails_with(PermissionError(errno.EACCES, 'no'))
+
+    assert S.call(func, 'a') is None
+    assert len(calls) == 1
+    assert S.ledger['a'].status == 'failed'
+
+
+def test_transient_errors_are_retried():
+
+    S = scheduler(workers=1, retries=2, backoff=0)
+    func, calls = fails_with(ConnectionResetError())
+
+    assert S.call(func, 'a') is None
+    assert len(calls) == 3
+    assert S.ledger['a'].status == 'failed'
+
+
+def test_bugs_are_raised():
+
+    S = scheduler(workers=1, retries=2, backoff=0)
+    func, calls = fails_with(KeyError('WVHT'))
+
+    with pytest.raises(KeyError):
+        list(S.map(func, ['a']))
+
+    assert len(calls) == 1
+    assert 'a' not in S.ledger